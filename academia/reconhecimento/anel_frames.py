@@ -0,0 +1,124 @@
+"""
+Anel de frames em memória compartilhada (multiprocessing.shared_memory).
+
+Um processo de captura por câmera escreve no anel; os workers de
+inferência pegam o slot mais recente (np.ndarray sobre o buffer
+compartilhado) e copiam antes de usar. Cada slot tem um número de
+sequência: o leitor confere a sequência depois da cópia e descarta
+leituras que foram sobrescritas no meio do caminho.
+
+Sem Django aqui: o módulo é importado pelos processos filhos.
+"""
+from multiprocessing import shared_memory
+
+import numpy as np
+
+SLOTS_PADRAO = 4
+
+# Cabeçalho: [ultima_sequencia, fim, seq_slot_0, ..., seq_slot_n-1]
+_CAB_ULTIMA = 0
+_CAB_FIM = 1
+_CAB_SLOTS = 2
+
+
+class AnelFrames:
+    """Ring buffer de frames BGR de tamanho fixo em memória compartilhada"""
+
+    def __init__(self, nome=None, largura=640, altura=480, slots=SLOTS_PADRAO, criar=True):
+        self.largura = largura
+        self.altura = altura
+        self.slots = slots
+
+        tam_cabecalho = (_CAB_SLOTS + slots) * 8
+        tam_frames = slots * altura * largura * 3
+
+        if criar:
+            self.shm = shared_memory.SharedMemory(name=nome, create=True,
+                                                  size=tam_cabecalho + tam_frames)
+        else:
+            # Filhos usam o resource_tracker do pai: quem apaga é o criador
+            self.shm = shared_memory.SharedMemory(name=nome)
+        self.nome = self.shm.name
+        self.criador = criar
+
+        self._cab = np.ndarray((_CAB_SLOTS + slots,), dtype=np.int64, buffer=self.shm.buf)
+        self._frames = np.ndarray((slots, altura, largura, 3), dtype=np.uint8,
+                                  buffer=self.shm.buf, offset=tam_cabecalho)
+        if criar:
+            self._cab[:] = 0
+
+        self._ultima_lida = 0
+        self.descartes = 0      # leituras sobrescritas durante o uso
+        self.pulados = 0        # frames que nenhum leitor chegou a ver
+
+    # ----- escrita (processo de captura) -----
+
+    def escrever(self, frame):
+        if frame.shape[:2] != (self.altura, self.largura):
+            import cv2
+            frame = cv2.resize(frame, (self.largura, self.altura))
+
+        seq = int(self._cab[_CAB_ULTIMA]) + 1
+        slot = seq % self.slots
+        self._cab[_CAB_SLOTS + slot] = -1       # slot em escrita
+        self._frames[slot][...] = frame
+        self._cab[_CAB_SLOTS + slot] = seq
+        self._cab[_CAB_ULTIMA] = seq
+
+    def marcar_fim(self):
+        self._cab[_CAB_FIM] = 1
+
+    # ----- leitura (workers) -----
+
+    def finalizado(self):
+        return bool(self._cab[_CAB_FIM]) and int(self._cab[_CAB_ULTIMA]) <= self._ultima_lida
+
+    def ler_ultimo(self):
+        """(seq, view) do frame mais recente ainda não lido, ou (None, None)"""
+        seq = int(self._cab[_CAB_ULTIMA])
+        if seq <= self._ultima_lida:
+            return None, None
+
+        slot = seq % self.slots
+        if int(self._cab[_CAB_SLOTS + slot]) != seq:
+            return None, None
+
+        self.pulados += seq - self._ultima_lida - 1
+        self._ultima_lida = seq
+        return seq, self._frames[slot]
+
+    def valido(self, seq):
+        """True se o slot de `seq` não foi sobrescrito desde a leitura"""
+        if int(self._cab[_CAB_SLOTS + seq % self.slots]) == seq:
+            return True
+        self.descartes += 1
+        return False
+
+    def fechar(self):
+        # Solta as views antes de fechar o mapeamento
+        self._cab = None
+        self._frames = None
+        self.shm.close()
+        if self.criador:
+            self.shm.unlink()
+
+
+def processo_captura(nome_anel, spec_fonte, largura, altura, slots, parar):
+    """Alvo do multiprocessing.Process: lê a fonte e escreve no anel"""
+    from academia.reconhecimento.fontes import abrir_fonte
+
+    anel = AnelFrames(nome_anel, largura, altura, slots, criar=False)
+    fonte = abrir_fonte(spec_fonte, tempo_real=True, fps_imagens=25)
+    try:
+        if not fonte.isOpened():
+            print(f"[ERRO] Camera {spec_fonte} nao acessivel!")
+            return
+        while not parar.is_set():
+            ret, frame = fonte.read()
+            if not ret:
+                break
+            anel.escrever(frame)
+    finally:
+        anel.marcar_fim()
+        fonte.release()
+        anel.fechar()
@@ -0,0 +1,445 @@
+"""
+Avaliação do reconhecimento com validação cruzada sobre o dataset/.
+
+    python academia/reconhecimento/avaliacao.py                    # 5 folds, backend do settings
+    python academia/reconhecimento/avaliacao.py --holdout 0.2 --backend fisher
+    python academia/reconhecimento/avaliacao.py --folds 10 --impostores 2 --workers 4
+    python academia/reconhecimento/avaliacao.py --prototipos 3   # custo da galeria compacta
+    python academia/reconhecimento/avaliacao.py --impostores 1 --aplicar-limiares
+
+Ao contrário da VALIDACAO INTERNA do treina.py (que prediz amostras do
+próprio treino), cada fold treina sem as amostras que testa. As faces vêm do
+mesmo cache do treino (manifesto.py) e os folds rodam em paralelo num pool
+de processos.
+
+Tentativas e taxas, para um limiar t (distância < t = aceita):
+  - genuína: amostra de um cliente que está na galeria do fold
+  - impostora: amostra de um cliente deixado fora da galeria (--impostores)
+  - FRR(t) = genuínas que não entram como elas mesmas / genuínas
+  - FAR(t) = tentativas aceitas com a identidade errada / todas as tentativas
+
+Os limiares avaliados são os que o treino gravaria no modelo (calibrados em
+parametros.json, senão os padrões do backend). O relatório também traz os
+limiares calibrados nestas tentativas para o FAR alvo (calibrar_limiares);
+--aplicar-limiares os grava em parametros.json para o próximo treino.
+
+O relatório JSON vai para benchmark/avaliacoes/ (ou --json) e o anterior do
+mesmo backend é usado para mostrar a variação.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import hashlib
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+if sys.platform == 'win32':
+    import codecs
+    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
+    sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, 'strict')
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'academia.settings')
+import django
+django.setup()
+
+from django.conf import settings
+from academia.reconhecimento import reconhece
+from academia.reconhecimento.treina import carregar_imagens, dataset_dir
+from academia.reconhecimento.manifesto import escanear_dataset
+from academia.reconhecimento.reconhecedores import criar_reconhecedor, BACKENDS, BACKEND_PADRAO
+from academia.reconhecimento.parametros import (
+    parametros_do_backend, ler_limiares, gravar_limiares, PARAMETROS_PATH,
+)
+from academia.reconhecimento.galeria import config_prototipos, METODOS
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+SAIDA_PADRAO = BASE_DIR / 'benchmark' / 'avaliacoes'
+
+DESCONHECIDO = -1
+PONTOS_CURVA = 50
+# FAR tolerado no limiar aceitavel calibrado (calibrar_limiares)
+FAR_ALVO = 0.01
+NOMES_LIMIARES = ('excelente', 'bom', 'aceitavel')
+
+
+# ============================================================
+# DIVISAO EM FOLDS
+# ============================================================
+
+def dividir_folds(ids, folds, semente=0):
+    """Fold de cada amostra, estratificado por cliente (cada cliente espalhado por todos os folds)"""
+    rng = np.random.default_rng(semente)
+    fold = np.empty(len(ids), dtype=np.int32)
+    for client_id in np.unique(ids):
+        indices = np.flatnonzero(ids == client_id)
+        rng.shuffle(indices)
+        # Começa num fold aleatório: clientes pequenos não caem todos no fold 0
+        fold[indices] = (np.arange(len(indices)) + rng.integers(folds)) % folds
+    return fold
+
+
+def dividir_holdout(ids, fracao, semente=0):
+    """Um fold só: `fracao` das amostras de cada cliente (ao menos 1) vai para teste"""
+    rng = np.random.default_rng(semente)
+    fold = np.ones(len(ids), dtype=np.int32)   # 1 = treino
+    for client_id in np.unique(ids):
+        indices = np.flatnonzero(ids == client_id)
+        if len(indices) < 2:
+            continue
+        rng.shuffle(indices)
+        fold[indices[:max(1, int(round(len(indices) * fracao)))]] = 0
+    return fold
+
+
+def impostores_do_fold(clientes, numero_fold, impostores):
+    """Clientes fora da galeria no fold (rodízio: cada cliente é impostor em algum fold)"""
+    if not impostores:
+        return set()
+    inicio = (numero_fold * impostores) % len(clientes)
+    return {clientes[(inicio + i) % len(clientes)] for i in range(impostores)}
+
+
+# ============================================================
+# FOLD (processo do pool)
+# ============================================================
+
+_faces = None
+_ids = None
+
+
+def _iniciar_worker(faces, ids):
+    # Uma cópia das faces por processo, não uma por fold
+    global _faces, _ids
+    _faces, _ids = faces, ids
+
+
+def avaliar_fold(backend, numero_fold, treino, teste, fora_da_galeria, parametros=None, prototipos=None):
+    """Treina sem o fold e prediz cada amostra dele: {tentativas, treino_s, erro}"""
+    galeria = [i for i in treino if _ids[i] not in fora_da_galeria]
+    recognizer = criar_reconhecedor(backend, parametros)
+    try:
+        inicio = time.perf_counter()
+        recognizer.train([_faces[i] for i in galeria], _ids[galeria].tolist())
+        if prototipos:
+            recognizer.compactar_galeria(prototipos['por_cliente'], prototipos['metodo'])
+        treino_s = time.perf_counter() - inicio
+    except (ImportError, cv2.error) as e:
+        return {'fold': numero_fold, 'erro': str(e).strip().splitlines()[-1]}
+
+    tentativas = []
+    for i in teste:
+        inicio = time.perf_counter()
+        previsto, distancia = recognizer.predict(_faces[i])
+        ms = (time.perf_counter() - inicio) * 1000
+        real = int(_ids[i])
+        tentativas.append((real, int(previsto), float(distancia), ms, real in fora_da_galeria))
+
+    return {'fold': numero_fold, 'tentativas': tentativas, 'treino_s': treino_s,
+            'galeria': recognizer.tamanho_galeria()}
+
+
+# ============================================================
+# METRICAS
+# ============================================================
+
+def taxas(reais, previstos, distancias, impostora, limiar):
+    """(FAR, FRR) no limiar"""
+    aceitas = distancias < limiar
+    erradas = aceitas & (previstos != reais)
+    genuinas = ~impostora
+    far = erradas.sum() / len(reais) if len(reais) else 0.0
+    frr = (genuinas & ~(aceitas & (previstos == reais))).sum() / genuinas.sum() if genuinas.any() else 0.0
+    return float(far), float(frr)
+
+
+def curva_far_frr(reais, previstos, distancias, impostora, limiares_fixos):
+    maximo = float(np.percentile(distancias, 99.5)) if len(distancias) else 1.0
+    grade = np.unique(np.concatenate([np.linspace(0, maximo * 1.05, PONTOS_CURVA), limiares_fixos]))
+    curva = []
+    for limiar in grade:
+        far, frr = taxas(reais, previstos, distancias, impostora, limiar)
+        curva.append({'limiar': round(float(limiar), 3), 'far': round(far, 5), 'frr': round(frr, 5)})
+
+    # EER: ponto da grade onde FAR e FRR mais se aproximam
+    eer = min(curva, key=lambda p: abs(p['far'] - p['frr']))
+    return curva, {'limiar': eer['limiar'], 'taxa': round((eer['far'] + eer['frr']) / 2, 5)}
+
+
+def calibrar_limiares(reais, previstos, distancias, impostora, padrao, far_alvo=FAR_ALVO):
+    """
+    (excelente, bom, aceitavel) com o aceitavel no maior limiar de FAR <=
+    far_alvo; excelente e bom mantêm a proporção dos limiares `padrao` do
+    backend. None se nenhuma tentativa poderia entrar com a identidade errada.
+    """
+    erradas = np.sort(distancias[impostora | (previstos != reais)])
+    if not len(erradas):
+        return None
+    # distancia < limiar = aceita: o limiar é a primeira errada além das toleradas
+    toleradas = int(far_alvo * len(reais))
+    aceitavel = float(erradas[min(toleradas, len(erradas) - 1)])
+    return tuple(float(np.floor(aceitavel * l / padrao[-1] * 1000) / 1000) for l in padrao)
+
+
+def matriz_confusao(reais, previstos, distancias, limiar, clientes):
+    """Linhas = real, colunas = previsto; acima do limiar (ou impostor) = DESCONHECIDO"""
+    rotulos = list(clientes) + [DESCONHECIDO]
+    posicao = {rotulo: i for i, rotulo in enumerate(rotulos)}
+    matriz = np.zeros((len(rotulos), len(rotulos)), dtype=np.int64)
+    previstos_limiar = np.where(distancias < limiar, previstos, DESCONHECIDO)
+    for real, previsto in zip(reais, previstos_limiar):
+        matriz[posicao.get(int(real), posicao[DESCONHECIDO]), posicao.get(int(previsto), posicao[DESCONHECIDO])] += 1
+    return {'rotulos': rotulos, 'valores': matriz.tolist()}
+
+
+def percentis(valores):
+    if not valores:
+        return {}
+    p50, p95, p99 = np.percentile(valores, [50, 95, 99])
+    return {'media': round(float(np.mean(valores)), 3), 'p50': round(float(p50), 3),
+            'p95': round(float(p95), 3), 'p99': round(float(p99), 3)}
+
+
+# ============================================================
+# AVALIACAO
+# ============================================================
+
+def avaliar(backend, folds=5, holdout=None, impostores=0, workers=None, semente=0, prototipos=None,
+            far_alvo=FAR_ALVO):
+    parametros = parametros_do_backend(backend)
+    if prototipos and not BACKENDS[backend].suporta_prototipos:
+        print(f"[AVISO] Backend {backend} nao tem galeria compactavel; ignorando --prototipos")
+        prototipos = None
+    arquivos = escanear_dataset(dataset_dir)
+    faces, ids, stats = carregar_imagens(arquivos, workers)
+    if not faces:
+        print("[ERRO] Nenhuma face valida no dataset!")
+        return None
+
+    ids = np.asarray(ids, dtype=np.int64)
+    clientes = sorted(int(c) for c in np.unique(ids))
+    minimo_na_galeria = 2 if backend == 'fisher' else 1
+    if len(clientes) - impostores < minimo_na_galeria:
+        print(f"[ERRO] --impostores {impostores} deixa a galeria sem clientes suficientes ({len(clientes)} no dataset)")
+        return None
+
+    if holdout:
+        fold = dividir_holdout(ids, holdout, semente)
+        divisoes = [(0, np.flatnonzero(fold == 1), np.flatnonzero(fold == 0))]
+    else:
+        fold = dividir_folds(ids, folds, semente)
+        divisoes = [(f, np.flatnonzero(fold != f), np.flatnonzero(fold == f)) for f in range(folds)]
+
+    trabalhos = [(backend, numero, treino, teste, impostores_do_fold(clientes, numero, impostores),
+                  parametros, prototipos)
+                 for numero, treino, teste in divisoes]
+    workers = min(workers or os.cpu_count() or 1, len(trabalhos))
+    print(f"\n[INFO] Avaliando {backend}: {len(faces)} amostras de {len(clientes)} cliente(s), "
+          f"{'holdout ' + str(holdout) if holdout else str(folds) + ' folds'}, "
+          f"{impostores} impostor(es) por fold, {workers} processo(s)"
+          + (f", galeria compacta {prototipos}" if prototipos else ''))
+    if workers > 1:
+        print("[INFO] Folds em paralelo disputam a CPU: para latencia limpa use --workers 1")
+
+    faces = np.stack(faces)
+    if workers == 1:
+        _iniciar_worker(faces, ids)
+        resultados = [avaliar_fold(*trabalho) for trabalho in trabalhos]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker,
+                                 initargs=(faces, ids)) as pool:
+            resultados = list(pool.map(avaliar_fold, *zip(*trabalhos)))
+
+    erros = [r for r in resultados if 'erro' in r]
+    for r in erros:
+        print(f"[ERRO] Fold {r['fold']}: {r['erro']}")
+    resultados = [r for r in resultados if 'erro' not in r]
+    if not resultados:
+        return None
+
+    tentativas = [t for r in resultados for t in r['tentativas']]
+    reais = np.array([t[0] for t in tentativas])
+    previstos = np.array([t[1] for t in tentativas])
+    distancias = np.array([t[2] for t in tentativas])
+    latencias = [t[3] for t in tentativas]
+    impostora = np.array([t[4] for t in tentativas], dtype=bool)
+    reais_com_desconhecido = np.where(impostora, DESCONHECIDO, reais)
+
+    padrao = reconhece.limiares_do_modelo(criar_reconhecedor(backend))
+    limiares = ler_limiares(backend) or padrao
+    por_limiar = []
+    for nome, limiar in zip(NOMES_LIMIARES, limiares):
+        far, frr = taxas(reais, previstos, distancias, impostora, limiar)
+        por_limiar.append({'nome': nome, 'limiar': limiar, 'far': round(far, 5), 'frr': round(frr, 5)})
+    curva, eer = curva_far_frr(reais, previstos, distancias, impostora, limiares)
+    calibrados = calibrar_limiares(reais, previstos, distancias, impostora, padrao, far_alvo)
+    calibracao = None
+    if calibrados:
+        far, frr = taxas(reais, previstos, distancias, impostora, calibrados[-1])
+        calibracao = {'far_alvo': far_alvo, 'limiares': list(calibrados),
+                      'far': round(far, 5), 'frr': round(frr, 5)}
+
+    genuinas = ~impostora
+    return {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'backend': backend,
+        'parametros': parametros,
+        'prototipos': prototipos,
+        'modo': f'holdout {holdout}' if holdout else f'{folds} folds',
+        'semente': semente,
+        'dataset': {
+            'amostras': int(len(ids)),
+            'clientes': len(clientes),
+            # Mesmas fotos com o mesmo conteúdo = mesma assinatura
+            'assinatura': hashlib.blake2b(json.dumps(sorted((k, v[2]) for k, v in arquivos.items())).encode(),
+                                          digest_size=16).hexdigest(),
+        },
+        'folds_ok': len(resultados),
+        'folds_com_erro': [{'fold': r['fold'], 'erro': r['erro']} for r in erros],
+        'tentativas': {'genuinas': int(genuinas.sum()), 'impostoras': int(impostora.sum())},
+        'acuracia_top1': round(float((previstos[genuinas] == reais[genuinas]).mean()), 5) if genuinas.any() else None,
+        'limiares': por_limiar,
+        'calibracao': calibracao,
+        'eer': eer,
+        'curva_far_frr': curva,
+        'matriz_confusao': matriz_confusao(reais_com_desconhecido, previstos, distancias, limiares[-1], clientes),
+        'latencia_predict_ms': percentis(latencias),
+        'treino_s': percentis([r['treino_s'] for r in resultados]),
+        'galeria_media': round(float(np.mean([r['galeria'] for r in resultados])), 1),
+    }
+
+
+# ============================================================
+# RELATORIO
+# ============================================================
+
+def relatorio_anterior(saida_dir, backend, atual=None):
+    """Último relatório do mesmo backend na pasta (para comparar)"""
+    candidatos = sorted(Path(saida_dir).glob(f'*-{backend}.json'))
+    candidatos = [c for c in candidatos if atual is None or c.resolve() != Path(atual).resolve()]
+    if not candidatos:
+        return None
+    with open(candidatos[-1], encoding='utf-8') as f:
+        return json.load(f)
+
+
+def imprimir_relatorio(relatorio, anterior=None):
+    print(f"\n{'='*70}")
+    print(f"AVALIACAO DO RECONHECIMENTO - {relatorio['backend']} ({relatorio['modo']})")
+    print(f"{'='*70}")
+    d = relatorio['dataset']
+    t = relatorio['tentativas']
+    print(f"Dataset: {d['amostras']} amostras, {d['clientes']} clientes (assinatura {d['assinatura'][:12]})")
+    print(f"Tentativas: {t['genuinas']} genuinas, {t['impostoras']} impostoras")
+    if relatorio.get('parametros'):
+        print(f"Parametros: {relatorio['parametros']}")
+    if relatorio.get('prototipos'):
+        print(f"Galeria compacta: ate {relatorio['prototipos']['por_cliente']} prototipo(s) "
+              f"({relatorio['prototipos']['metodo']}) por cliente")
+    if relatorio['acuracia_top1'] is not None:
+        print(f"Acuracia top-1 (sem limiar): {relatorio['acuracia_top1'] * 100:.2f}%")
+
+    print(f"\n{'Limiar':12s} {'valor':>8s} {'FAR':>8s} {'FRR':>8s}")
+    for l in relatorio['limiares']:
+        print(f"{l['nome']:12s} {l['limiar']:8.2f} {l['far'] * 100:7.2f}% {l['frr'] * 100:7.2f}%")
+    print(f"{'EER':12s} {relatorio['eer']['limiar']:8.2f} {relatorio['eer']['taxa'] * 100:7.2f}%")
+    calibracao = relatorio.get('calibracao')
+    if calibracao:
+        print(f"\nCalibrados para FAR <= {calibracao['far_alvo'] * 100:g}%: {tuple(calibracao['limiares'])} "
+              f"(aceitavel: FAR {calibracao['far'] * 100:.2f}% | FRR {calibracao['frr'] * 100:.2f}%)")
+    else:
+        print("\nSem tentativas que entrariam com a identidade errada: nada a calibrar (use --impostores)")
+
+    lat = relatorio['latencia_predict_ms']
+    print(f"\nPredict: p50 {lat['p50']:.2f} ms | p95 {lat['p95']:.2f} ms | p99 {lat['p99']:.2f} ms "
+          f"(galeria media {relatorio['galeria_media']})")
+    print(f"Treino por fold: p50 {relatorio['treino_s']['p50']:.2f} s")
+
+    matriz = relatorio['matriz_confusao']
+    if len(matriz['rotulos']) <= 16:
+        rotulos = ['?' if r == DESCONHECIDO else str(r) for r in matriz['rotulos']]
+        print("\nMatriz de confusao (linha = real, coluna = previsto, ? = desconhecido):")
+        print('       ' + ''.join(f"{r:>6s}" for r in rotulos))
+        for rotulo, linha in zip(rotulos, matriz['valores']):
+            print(f"{rotulo:>6s} " + ''.join(f"{v:6d}" for v in linha))
+
+    if anterior:
+        print(f"\nVariacao desde {anterior['data']}:")
+        if anterior.get('acuracia_top1') is not None and relatorio['acuracia_top1'] is not None:
+            delta = (relatorio['acuracia_top1'] - anterior['acuracia_top1']) * 100
+            print(f"  acuracia top-1 {delta:+.2f} pp")
+        for atual, antes in zip(relatorio['limiares'], anterior.get('limiares', [])):
+            print(f"  {atual['nome']:10s} FAR {(atual['far'] - antes['far']) * 100:+.2f} pp | "
+                  f"FRR {(atual['frr'] - antes['frr']) * 100:+.2f} pp")
+        print(f"  predict p95 {lat['p95'] - anterior['latencia_predict_ms']['p95']:+.2f} ms")
+    print(f"{'='*70}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Validacao cruzada do reconhecimento (FAR/FRR, confusao, latencia)')
+    parser.add_argument('--backend', choices=sorted(BACKENDS),
+                        default=getattr(settings, 'RECONHECIMENTO_BACKEND', BACKEND_PADRAO))
+    divisao = parser.add_mutually_exclusive_group()
+    divisao.add_argument('--folds', type=int, default=5, help='k do k-fold (padrao: 5)')
+    divisao.add_argument('--holdout', type=float, help='Fracao de teste de cada cliente (ex.: 0.2)')
+    parser.add_argument('--impostores', type=int, default=0,
+                        help='Clientes deixados fora da galeria em cada fold (tentativas impostoras)')
+    parser.add_argument('--workers', type=int, help='Processos (padrao: nucleos da CPU)')
+    parser.add_argument('--prototipos', type=int,
+                        help='Avalia a galeria compacta: ate N prototipos por cliente (galeria.py)')
+    parser.add_argument('--metodo-prototipos', choices=METODOS, default='medoide')
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--far-alvo', type=float, default=FAR_ALVO,
+                        help=f'FAR tolerado no limiar aceitavel calibrado (padrao: {FAR_ALVO})')
+    parser.add_argument('--aplicar-limiares', action='store_true',
+                        help='Grava os limiares calibrados em parametros.json (o proximo treino os usa)')
+    parser.add_argument('--json', help=f'Arquivo do relatorio (padrao: {SAIDA_PADRAO}/<data>-<backend>.json)')
+    args = parser.parse_args()
+
+    if args.folds < 2:
+        parser.error('--folds precisa ser pelo menos 2')
+    if args.holdout is not None and not 0 < args.holdout < 1:
+        parser.error('--holdout precisa estar entre 0 e 1')
+
+    if args.prototipos is not None and args.prototipos < 1:
+        parser.error('--prototipos precisa ser pelo menos 1')
+    if not 0 < args.far_alvo < 1:
+        parser.error('--far-alvo precisa estar entre 0 e 1')
+
+    relatorio = avaliar(args.backend, args.folds, args.holdout, args.impostores, args.workers, args.semente,
+                        config_prototipos(args.prototipos, args.metodo_prototipos), args.far_alvo)
+    if relatorio is None:
+        sys.exit(1)
+
+    if args.json:
+        destino = Path(args.json)
+    else:
+        destino = SAIDA_PADRAO / f"{datetime.now():%Y%m%d-%H%M%S}-{args.backend}.json"
+    anterior = relatorio_anterior(destino.parent, args.backend, atual=destino)
+    imprimir_relatorio(relatorio, anterior)
+
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    with open(destino, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, indent=2)
+    print(f"[OK] Relatorio salvo em {destino}")
+
+    if args.aplicar_limiares:
+        calibracao = relatorio['calibracao']
+        if calibracao is None:
+            print("[ERRO] Nada calibrado: rode com --impostores 1 ou mais")
+            sys.exit(1)
+        gravar_limiares(args.backend, calibracao['limiares'], far_alvo=calibracao['far_alvo'],
+                        avaliacao=str(destino), modo=relatorio['modo'], gravado_em=relatorio['data'])
+        print(f"[OK] Limiares {tuple(calibracao['limiares'])} do {args.backend} gravados em {PARAMETROS_PATH}")
+        print("[INFO] Retreine o modelo: o proximo treino sera completo com os novos limiares")
+
+
+# Guarda necessária: o pool de processos reimporta este módulo (Windows)
+if __name__ == '__main__':
+    main()
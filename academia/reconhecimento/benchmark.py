@@ -0,0 +1,555 @@
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import cv2
+import numpy as np
+from pathlib import Path
+
+if sys.platform == 'win32':
+    import codecs
+    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
+    sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, 'strict')
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'academia.settings')
+import django
+django.setup()
+
+from academia.reconhecimento import reconhece
+from academia.reconhecimento.cache_clientes import CacheClientes
+from academia.reconhecimento.fontes import abrir_fonte
+from academia.reconhecimento.pipeline import PipelineReconhecimento
+from academia.reconhecimento.modelo import ModeloRecarregavel, TRAINER_PATH
+from academia.reconhecimento.reconhecedores import (
+    criar_reconhecedor, ReconhecedorEmbeddings, BACKENDS,
+)
+from academia.reconhecimento.lbph_vetorizado import GaleriaLBPH, ReconhecedorVetorizado
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+DATASET_DIR = BASE_DIR / 'dataset'
+SAIDA_PADRAO = BASE_DIR / 'benchmark'
+
+LARGURA, ALTURA = 640, 480
+
+
+# ============================================================
+# VIDEO SINTETICO
+# ============================================================
+
+def gerar_fundo(rng):
+    """Fundo suave e aleatório (parede/recepção)"""
+    ruido = rng.random((ALTURA // 8, LARGURA // 8)) * 80 + 80
+    fundo = cv2.resize(ruido.astype(np.uint8), (LARGURA, ALTURA), interpolation=cv2.INTER_CUBIC)
+    return cv2.cvtColor(fundo, cv2.COLOR_GRAY2BGR)
+
+
+def gerar_video_sintetico(saida_dir=SAIDA_PADRAO, frames_por_id=60, frames_vazios=15,
+                          fps=25, ids=None, semente=0):
+    """
+    Gera um vídeo com cada cliente do dataset/<id>/ passando pela câmera,
+    intercalado com frames vazios, mais o gabarito (<nome>.json).
+    """
+    rng = np.random.default_rng(semente)
+    saida_dir = Path(saida_dir)
+    saida_dir.mkdir(parents=True, exist_ok=True)
+
+    pastas = sorted(
+        (p for p in DATASET_DIR.iterdir() if p.is_dir() and p.name.isdigit()),
+        key=lambda p: int(p.name)
+    )
+    if ids:
+        pastas = [p for p in pastas if int(p.name) in ids]
+
+    video_path = saida_dir / 'sintetico.avi'
+    writer = cv2.VideoWriter(str(video_path), cv2.VideoWriter_fourcc(*'MJPG'), fps, (LARGURA, ALTURA))
+    if not writer.isOpened():
+        print(f"[ERRO] Nao foi possivel criar {video_path}")
+        return None
+
+    fundo = gerar_fundo(rng)
+    gabarito = []
+    indice = 0
+
+    def escrever(frame):
+        nonlocal indice
+        writer.write(frame)
+        indice += 1
+
+    for _ in range(frames_vazios):
+        escrever(fundo.copy())
+
+    for pasta in pastas:
+        client_id = int(pasta.name)
+        imagens = sorted(pasta.glob('*.jpg'))
+        if not imagens:
+            continue
+
+        inicio = indice
+        tamanho = int(rng.integers(160, 221))
+        x0 = int(rng.integers(0, LARGURA - tamanho - 100))
+        y0 = int(rng.integers(20, ALTURA - tamanho - 20))
+        passo = float(rng.uniform(0.5, 1.5))
+
+        for n in range(frames_por_id):
+            face = cv2.imread(str(imagens[n % len(imagens)]), cv2.IMREAD_GRAYSCALE)
+            if face is None:
+                continue
+            face = cv2.resize(face, (tamanho, tamanho))
+            # Pequena variação de iluminação e ruído de sensor
+            ganho = 1 + rng.uniform(-0.08, 0.08)
+            face = np.clip(face * ganho + rng.normal(0, 3, face.shape), 0, 255).astype(np.uint8)
+
+            frame = fundo.copy()
+            x = int(x0 + n * passo)
+            y = int(y0 + 4 * np.sin(n / 6))
+            frame[y:y + tamanho, x:x + tamanho] = cv2.cvtColor(face, cv2.COLOR_GRAY2BGR)
+            escrever(frame)
+
+        gabarito.append({'id': client_id, 'inicio': inicio, 'fim': indice - 1})
+
+        for _ in range(frames_vazios):
+            escrever(fundo.copy())
+
+    writer.release()
+
+    gabarito_path = video_path.with_suffix('.json')
+    with open(gabarito_path, 'w', encoding='utf-8') as f:
+        json.dump({'fps': fps, 'frames': indice, 'segmentos': gabarito}, f, indent=2)
+
+    print(f"[OK] Video: {video_path} ({indice} frames, {len(gabarito)} clientes)")
+    print(f"[OK] Gabarito: {gabarito_path}")
+    return video_path
+
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+
+class FonteMedida:
+    """Envolve a fonte guardando o instante de captura de cada frame"""
+
+    def __init__(self, fonte):
+        self.fonte = fonte
+        self.instantes = []
+
+    def read(self):
+        ret, frame = self.fonte.read()
+        if ret:
+            self.instantes.append(time.perf_counter())
+        return ret, frame
+
+
+def executar_benchmark(fonte_spec, gabarito_path=None, rastreamento=True,
+                       intervalo_deteccao=reconhece.INTERVALO_DETECCAO,
+                       efeitos_banco=False, render=True):
+    """Reproduz a fonte pelo pipeline completo e mede cada estágio"""
+    if not TRAINER_PATH.exists():
+        print("[ERRO] Modelo nao treinado!")
+        return None
+
+    fonte = abrir_fonte(fonte_spec)
+    if not fonte.isOpened():
+        print(f"[ERRO] Fonte indisponivel: {fonte_spec}")
+        return None
+
+    gabarito = None
+    if gabarito_path is None and not str(fonte_spec).isdigit():
+        candidato = Path(fonte_spec).with_suffix('.json')
+        gabarito_path = candidato if candidato.exists() else None
+    if gabarito_path:
+        with open(gabarito_path, encoding='utf-8') as f:
+            gabarito = json.load(f)
+
+    modelo = ModeloRecarregavel(TRAINER_PATH)
+
+    cache_clientes = CacheClientes()
+    try:
+        cache_clientes.carregar()
+    except Exception as e:
+        # Em CI sem banco o benchmark roda só com IDs
+        print(f"[AVISO] Cache de clientes indisponivel ({e}); usando apenas IDs")
+
+    analisador = reconhece.criar_analisador(modelo, cache_clientes, rastreamento, intervalo_deteccao)
+    analisador.verbose = False
+    reconhece.ultimos_reconhecimentos.clear()
+
+    medida = FonteMedida(fonte)
+    indice_atual = [-1]
+    eventos = []
+
+    def inferir(frame):
+        indice_atual[0] += 1
+        resultado, novos = analisador(frame)
+        return resultado, [(indice_atual[0], evento) for evento in novos]
+
+    def efeito(item):
+        indice, evento = item
+        eventos.append({'frame': indice, 'id': evento[0], 'instante': time.perf_counter()})
+        if efeitos_banco:
+            reconhece.processar_evento(evento)
+
+    pipeline = PipelineReconhecimento(medida, inferir, efeito, descartar_frames=False)
+
+    inicio = time.perf_counter()
+    pipeline.iniciar()
+    while pipeline.ativo():
+        try:
+            resultado = pipeline.proximo_resultado(timeout=0.1)
+        except queue.Empty:
+            continue
+        if render:
+            inicio_render = time.perf_counter()
+            reconhece.desenhar_resultado(resultado)
+            pipeline.registrar_render(time.perf_counter() - inicio_render)
+    pipeline.aguardar_efeitos()
+    duracao = time.perf_counter() - inicio
+    pipeline.parar()
+    fonte.release()
+    if efeitos_banco:
+        reconhece.escritor_presencas.parar()
+
+    frames = pipeline.contadores['inferencia'].processados
+    relatorio = {
+        'fonte': str(fonte_spec),
+        'rastreamento': rastreamento,
+        'intervalo_deteccao': analisador.rastreador.intervalo_deteccao,
+        'frames': frames,
+        'duracao_s': round(duracao, 3),
+        'fps': round(frames / duracao, 2) if duracao > 0 else 0,
+        'deteccoes': analisador.rastreador.deteccoes,
+        'predicoes': analisador.predicoes,
+        'pipeline': pipeline.estatisticas(),
+        'eventos': len(eventos),
+    }
+
+    if gabarito:
+        relatorio['identidades'] = avaliar_tempo_reconhecimento(gabarito, eventos, medida.instantes)
+
+    return relatorio
+
+
+def avaliar_tempo_reconhecimento(gabarito, eventos, instantes):
+    """Tempo até o primeiro evento correto de cada segmento do gabarito"""
+    fps = gabarito.get('fps', 25)
+    resultados = []
+    for seg in gabarito['segmentos']:
+        dentro = [e for e in eventos if seg['inicio'] <= e['frame'] <= seg['fim']]
+        corretos = [e for e in dentro if e['id'] == seg['id']]
+        item = {
+            'id': seg['id'],
+            'reconhecido': bool(corretos),
+            'eventos_errados': len(dentro) - len(corretos),
+        }
+        if corretos:
+            primeiro = corretos[0]
+            item['frames_ate_reconhecer'] = primeiro['frame'] - seg['inicio']
+            item['ms_video'] = round(item['frames_ate_reconhecer'] / fps * 1000, 1)
+            if seg['inicio'] < len(instantes):
+                item['ms_pipeline'] = round((primeiro['instante'] - instantes[seg['inicio']]) * 1000, 1)
+        resultados.append(item)
+    return resultados
+
+
+def imprimir_relatorio(relatorio):
+    print(f"\n{'='*70}")
+    print("BENCHMARK DO RECONHECIMENTO")
+    print(f"{'='*70}")
+    print(f"Fonte: {relatorio['fonte']}")
+    modo = f"rastreamento (deteccao a cada {relatorio['intervalo_deteccao']})" if relatorio['rastreamento'] else "deteccao em todo frame"
+    print(f"Modo: {modo}")
+    print(f"Frames: {relatorio['frames']} em {relatorio['duracao_s']}s -> {relatorio['fps']} FPS")
+    print(f"Deteccoes: {relatorio['deteccoes']} | Predicoes: {relatorio['predicoes']} | Eventos: {relatorio['eventos']}")
+
+    print(f"\n{'Estagio':12s} {'n':>6s} {'media':>8s} {'p50':>8s} {'p95':>8s} {'p99':>8s}  (ms)")
+    for nome, e in relatorio['pipeline']['estagios'].items():
+        print(f"{nome:12s} {e['processados']:6d} {e['media_ms']:8.2f} {e['p50']:8.2f} {e['p95']:8.2f} {e['p99']:8.2f}")
+
+    print(f"\n{'Fila':12s} {'entradas':>9s} {'descartes':>10s}")
+    for nome, f in relatorio['pipeline']['filas'].items():
+        print(f"{nome:12s} {f['entradas']:9d} {f['descartados']:10d}")
+
+    if 'identidades' in relatorio:
+        print("\nTempo ate reconhecer:")
+        for item in relatorio['identidades']:
+            if item['reconhecido']:
+                print(f"  ID {item['id']:4d}: {item['frames_ate_reconhecer']:3d} frames "
+                      f"({item['ms_video']:.0f} ms de video, {item.get('ms_pipeline', 0):.0f} ms de pipeline)"
+                      f" | eventos errados: {item['eventos_errados']}")
+            else:
+                print(f"  ID {item['id']:4d}: NAO RECONHECIDO | eventos errados: {item['eventos_errados']}")
+    print(f"{'='*70}\n")
+
+
+# ============================================================
+# COMPARACAO DE BACKENDS
+# ============================================================
+
+def carregar_faces_base(limite=50):
+    """Algumas faces reais do dataset/ (200x200) para montar galerias sintéticas"""
+    faces = []
+    for arquivo in sorted(DATASET_DIR.glob('*/*.jpg')):
+        img = cv2.imread(str(arquivo), cv2.IMREAD_GRAYSCALE)
+        if img is not None:
+            faces.append(cv2.resize(img, (200, 200)))
+        if len(faces) >= limite:
+            break
+    return faces
+
+
+def variar_face(face, rng, deslocamento=6, ruido=8):
+    """Pequena variação (posição, brilho, ruído) de uma face"""
+    dx, dy = rng.integers(-deslocamento, deslocamento + 1, size=2)
+    matriz = np.float32([[1, 0, dx], [0, 1, dy]])
+    nova = cv2.warpAffine(face, matriz, face.shape[::-1], borderMode=cv2.BORDER_REFLECT)
+    nova = nova.astype(np.float32) * rng.uniform(0.85, 1.15) + rng.normal(0, ruido, face.shape)
+    return np.clip(nova, 0, 255).astype(np.uint8)
+
+
+def gerar_galeria(faces_base, clientes, amostras, rng, ruido=(20, 8)):
+    """
+    N clientes sintéticos: cada um é uma face base deformada, com k amostras.
+    `ruido` = (da face base, de cada amostra); ruído alto enche o histograma
+    LBP, que nas fotos reais tem ~1/4 dos bins ocupados.
+    """
+    faces, labels = [], []
+    for cliente in range(clientes):
+        base = variar_face(faces_base[cliente % len(faces_base)], rng, deslocamento=20, ruido=ruido[0])
+        for _ in range(amostras):
+            faces.append(variar_face(base, rng, ruido=ruido[1]))
+            labels.append(cliente + 1)
+    return faces, labels
+
+
+def medir_predict(predict, consultas):
+    tempos = []
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        predict(consulta)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    p50, p95 = np.percentile(tempos, [50, 95])
+    return round(float(p50), 3), round(float(p95), 3)
+
+
+def comparar_backends(backends=None, tamanhos=(5, 20, 50), amostras=10, consultas=30, semente=0):
+    """
+    Latência do predict em função do tamanho da galeria para cada backend.
+    LBPH e Fisherfaces comparam contra todas as amostras; embeddings contra
+    um centróide por cliente. Sem face_recognition instalado, o backend
+    embeddings mede só a busca vetorizada (centróides sintéticos).
+    """
+    rng = np.random.default_rng(semente)
+    faces_base = carregar_faces_base()
+    if not faces_base:
+        print(f"[ERRO] Nenhuma imagem em {DATASET_DIR}")
+        return None
+
+    backends = backends or list(BACKENDS)
+    saida_tmp = SAIDA_PADRAO / 'backend-tmp.yml'
+    SAIDA_PADRAO.mkdir(parents=True, exist_ok=True)
+    linhas = []
+
+    for clientes in tamanhos:
+        faces, labels = gerar_galeria(faces_base, clientes, amostras, rng)
+        indices = rng.choice(len(faces), size=min(consultas, len(faces)), replace=False)
+        amostras_consulta = [variar_face(faces[i], rng) for i in indices]
+
+        for nome in backends:
+            recognizer = criar_reconhecedor(nome)
+            linha = {'backend': nome, 'clientes': clientes, 'amostras': len(faces)}
+
+            if nome == 'fisher' and clientes < 2:
+                continue
+
+            if isinstance(recognizer, ReconhecedorEmbeddings):
+                try:
+                    inicio = time.perf_counter()
+                    recognizer.train(faces, labels)
+                    linha['treino_s'] = round(time.perf_counter() - inicio, 2)
+                    predict = recognizer.predict
+                    linha['busca'] = 'embedding dlib + centroides'
+                except ImportError:
+                    # Só a busca: centróides e consultas sintéticos de 128-d
+                    vetores = rng.normal(0, 0.1, size=(len(faces), 128)).astype(np.float32)
+                    recognizer.definir_galeria(vetores, labels)
+                    linha['treino_s'] = None
+                    consultas_vet = vetores[indices]
+                    predict_vet = iter(consultas_vet)
+                    predict = lambda _face: recognizer.predict_embedding(next(predict_vet))
+                    linha['busca'] = 'so centroides (face_recognition ausente)'
+            else:
+                inicio = time.perf_counter()
+                recognizer.train(faces, labels)
+                linha['treino_s'] = round(time.perf_counter() - inicio, 2)
+                predict = recognizer.predict
+                linha['busca'] = 'exaustiva'
+
+            linha['galeria'] = recognizer.tamanho_galeria()
+            linha['p50_ms'], linha['p95_ms'] = medir_predict(predict, amostras_consulta)
+            recognizer.write(saida_tmp)
+            linha['modelo_kb'] = round(saida_tmp.stat().st_size / 1024, 1)
+            linhas.append(linha)
+            print(f"[BACKEND] {nome:10s} clientes={clientes:4d} galeria={linha['galeria']:5d} "
+                  f"p50={linha['p50_ms']:.2f} ms")
+
+    saida_tmp.unlink(missing_ok=True)
+    return {'amostras_por_cliente': amostras, 'consultas': consultas, 'resultados': linhas}
+
+
+def imprimir_comparacao(comparacao):
+    print(f"\n{'='*86}")
+    print("COMPARACAO DE BACKENDS - LATENCIA DO PREDICT x TAMANHO DA GALERIA")
+    print(f"{'='*86}")
+    print(f"{'backend':10s} {'clientes':>8s} {'galeria':>8s} {'treino s':>9s} "
+          f"{'p50 ms':>8s} {'p95 ms':>8s} {'modelo KB':>10s}  busca")
+    for l in comparacao['resultados']:
+        treino = f"{l['treino_s']:.2f}" if l['treino_s'] is not None else '-'
+        print(f"{l['backend']:10s} {l['clientes']:8d} {l['galeria']:8d} {treino:>9s} "
+              f"{l['p50_ms']:8.2f} {l['p95_ms']:8.2f} {l['modelo_kb']:10.1f}  {l['busca']}")
+    print(f"{'='*86}\n")
+
+
+def comparar_vetorizado(tamanhos=(20, 100, 300), amostras=10, faces_por_frame=(1, 2, 4, 8),
+                        frames=20, ruido=2, semente=0):
+    """
+    Tempo por frame do LBPH do OpenCV (um predict por face) contra a busca
+    vetorizada (todas as faces do frame numa passada pela galeria mmap),
+    conferindo que os dois dão o mesmo cliente. A busca vetorizada só
+    percorre os bins ocupados da consulta, então o ganho depende da
+    densidade dos histogramas (coluna "densid."); `ruido` controla isso.
+    """
+    rng = np.random.default_rng(semente)
+    faces_base = carregar_faces_base()
+    if not faces_base:
+        print(f"[ERRO] Nenhuma imagem em {DATASET_DIR}")
+        return None
+
+    SAIDA_PADRAO.mkdir(parents=True, exist_ok=True)
+    galeria_tmp = SAIDA_PADRAO / 'galeria-tmp.snap'
+    linhas = []
+
+    for clientes in tamanhos:
+        faces, labels = gerar_galeria(faces_base, clientes, amostras, rng, ruido=(ruido, ruido))
+        recognizer = criar_reconhecedor('lbph')
+        recognizer.train(faces, labels)
+        vetores, rotulos = recognizer.vetores_amostras()
+        GaleriaLBPH.salvar(galeria_tmp, vetores, rotulos, recognizer.parametros())
+        vetorizado = ReconhecedorVetorizado(GaleriaLBPH.carregar(galeria_tmp))
+
+        for n_faces in faces_por_frame:
+            lotes = [[variar_face(faces[i], rng, ruido=ruido) for i in rng.choice(len(faces), size=n_faces)]
+                     for _ in range(frames)]
+            opencv, vetor = [], []
+            tempos_opencv = medir_predict(
+                lambda lote: opencv.extend(recognizer.predict(face) for face in lote), lotes)
+            tempos_vetor = medir_predict(lambda lote: vetor.extend(vetorizado.predict_varios(lote)), lotes)
+            linha = {
+                'clientes': clientes,
+                'galeria': len(rotulos),
+                'densidade': round(float(np.count_nonzero(vetores) / vetores.size), 3),
+                'faces_por_frame': n_faces,
+                'opencv_p50_ms': tempos_opencv[0],
+                'vetorizado_p50_ms': tempos_vetor[0],
+                'ganho': round(tempos_opencv[0] / max(tempos_vetor[0], 1e-6), 2),
+                'mesmo_cliente': sum(a[0] == b[0] for a, b in zip(opencv, vetor)) / len(opencv),
+                'dif_distancia_max': round(max(abs(a[1] - b[1]) for a, b in zip(opencv, vetor)), 6),
+            }
+            linhas.append(linha)
+            print(f"[VETORIZADO] galeria={linha['galeria']:5d} faces={n_faces} "
+                  f"opencv={linha['opencv_p50_ms']:.2f} ms vetorizado={linha['vetorizado_p50_ms']:.2f} ms")
+
+    galeria_tmp.unlink(missing_ok=True)
+    return {'amostras_por_cliente': amostras, 'frames': frames, 'ruido': ruido, 'resultados': linhas}
+
+
+def imprimir_vetorizado(comparacao):
+    print(f"\n{'='*86}")
+    print("LBPH OPENCV x BUSCA VETORIZADA - TEMPO POR FRAME (p50)")
+    print(f"{'='*86}")
+    print(f"{'galeria':>8s} {'densid.':>8s} {'faces':>6s} {'opencv ms':>10s} {'vetor. ms':>10s} {'ganho':>7s} "
+          f"{'mesmo cliente':>14s} {'dif. dist.':>11s}")
+    for l in comparacao['resultados']:
+        print(f"{l['galeria']:8d} {l['densidade']:8.3f} {l['faces_por_frame']:6d} {l['opencv_p50_ms']:10.2f} "
+              f"{l['vetorizado_p50_ms']:10.2f} {l['ganho']:6.2f}x {l['mesmo_cliente'] * 100:13.1f}% "
+              f"{l['dif_distancia_max']:11.6f}")
+    print(f"{'='*86}\n")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay e benchmark do reconhecimento sem camera')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_gerar = sub.add_parser('gerar', help='Gera video sintetico a partir do dataset/')
+    p_gerar.add_argument('--saida', default=str(SAIDA_PADRAO))
+    p_gerar.add_argument('--frames-por-id', type=int, default=60)
+    p_gerar.add_argument('--frames-vazios', type=int, default=15)
+    p_gerar.add_argument('--fps', type=int, default=25)
+    p_gerar.add_argument('--ids', type=int, nargs='*')
+
+    p_exec = sub.add_parser('executar', help='Reproduz uma fonte pelo pipeline e mede')
+    p_exec.add_argument('--fonte', default=str(SAIDA_PADRAO / 'sintetico.avi'),
+                        help='Video, pasta de imagens ou indice de webcam')
+    p_exec.add_argument('--gabarito', help='JSON com os segmentos (padrao: <fonte>.json)')
+    p_exec.add_argument('--sem-rastreamento', action='store_true')
+    p_exec.add_argument('--intervalo-deteccao', type=int, default=reconhece.INTERVALO_DETECCAO)
+    p_exec.add_argument('--efeitos-banco', action='store_true',
+                        help='Executa verificar_acesso/registrar_presenca de verdade')
+    p_exec.add_argument('--json', help='Salva o relatorio neste arquivo')
+
+    p_back = sub.add_parser('backends', help='Compara a latencia do predict dos backends')
+    p_back.add_argument('--backends', nargs='+', choices=sorted(BACKENDS))
+    p_back.add_argument('--clientes', type=int, nargs='+', default=[5, 20, 50],
+                        help='Tamanhos de galeria (numero de clientes sinteticos)')
+    p_back.add_argument('--amostras', type=int, default=10, help='Amostras por cliente')
+    p_back.add_argument('--consultas', type=int, default=30)
+    p_back.add_argument('--json', help='Salva o relatorio neste arquivo')
+
+    p_vet = sub.add_parser('vetorizado', help='Compara o LBPH do OpenCV com a busca vetorizada')
+    p_vet.add_argument('--clientes', type=int, nargs='+', default=[20, 100, 300],
+                       help='Tamanhos de galeria (numero de clientes sinteticos)')
+    p_vet.add_argument('--amostras', type=int, default=10, help='Amostras por cliente')
+    p_vet.add_argument('--faces', type=int, nargs='+', default=[1, 2, 4, 8],
+                       help='Faces por frame')
+    p_vet.add_argument('--frames', type=int, default=20)
+    p_vet.add_argument('--ruido', type=float, default=2,
+                       help='Ruido das faces sinteticas (alto = histogramas densos)')
+    p_vet.add_argument('--json', help='Salva o relatorio neste arquivo')
+
+    args = parser.parse_args()
+
+    if args.comando == 'gerar':
+        gerar_video_sintetico(args.saida, args.frames_por_id, args.frames_vazios, args.fps, args.ids)
+    elif args.comando == 'backends':
+        comparacao = comparar_backends(args.backends, args.clientes, args.amostras, args.consultas)
+        if comparacao is None:
+            sys.exit(1)
+        imprimir_comparacao(comparacao)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(comparacao, f, indent=2)
+            print(f"[OK] Relatorio salvo em {args.json}")
+    elif args.comando == 'vetorizado':
+        comparacao = comparar_vetorizado(args.clientes, args.amostras, args.faces, args.frames, args.ruido)
+        if comparacao is None:
+            sys.exit(1)
+        imprimir_vetorizado(comparacao)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(comparacao, f, indent=2)
+            print(f"[OK] Relatorio salvo em {args.json}")
+    else:
+        relatorio = executar_benchmark(
+            args.fonte, args.gabarito,
+            rastreamento=not args.sem_rastreamento,
+            intervalo_deteccao=args.intervalo_deteccao,
+            efeitos_banco=args.efeitos_banco,
+        )
+        if relatorio is None:
+            sys.exit(1)
+        imprimir_relatorio(relatorio)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(relatorio, f, indent=2)
+            print(f"[OK] Relatorio salvo em {args.json}")
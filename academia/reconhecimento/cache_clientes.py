@@ -0,0 +1,109 @@
+"""
+Cache em memória do cadastro de clientes para o reconhecimento facial.
+
+Carrega uma vez (id -> nome, status, fim do plano ativo) e depois só busca
+os clientes marcados em AlteracaoCadastro pelos signals do app gym
+(gym.acesso.LeitorMarcadores: relê uma janela de ids, porque as transações
+comitam fora de ordem).
+O loop de frames consulta apenas o dicionário, nunca o banco. Os mesmos
+dados alimentam o cache de decisões de acesso (gym.acesso.situacoes).
+
+Precisa de django.setup() antes do import (igual aos outros scripts).
+"""
+import threading
+
+from django.db import connection
+
+from gym.acesso import buscar_dados_clientes, situacoes, LeitorMarcadores, podar_marcadores
+
+INTERVALO_ATUALIZACAO = 5  # segundos entre consultas aos marcadores
+
+
+class CacheClientes:
+    """Roster de clientes em memória, atualizado em background"""
+
+    def __init__(self, intervalo=INTERVALO_ATUALIZACAO):
+        self.intervalo = intervalo
+        self._dados = {}
+        self._lock = threading.Lock()
+        self._marcadores = LeitorMarcadores()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._dados)
+
+    def carregar(self):
+        """Carga completa (na inicialização)"""
+        # Lê os marcadores ANTES dos dados para não perder alterações concorrentes
+        marcadores = LeitorMarcadores()
+        existentes = marcadores.consultar()
+        dados = buscar_dados_clientes()
+        marcadores.confirmar(existentes)
+
+        with self._lock:
+            self._dados = dados
+            self._marcadores = marcadores
+        situacoes.invalidar()
+        situacoes.preencher(dados)
+
+        podar_marcadores(forcar=True)
+        return len(dados)
+
+    def atualizar(self):
+        """Recarrega apenas os clientes com marcadores novos (idempotente)"""
+        with self._lock:
+            leitor = self._marcadores
+        marcadores = leitor.consultar()
+        with self._lock:
+            novos = leitor.novos(marcadores)
+        if not novos:
+            return 0
+
+        ids = {cliente_pk for _, cliente_pk in novos}
+        dados = buscar_dados_clientes(ids)
+
+        with self._lock:
+            for cliente_id in ids:
+                if cliente_id in dados:
+                    self._dados[cliente_id] = dados[cliente_id]
+                else:
+                    self._dados.pop(cliente_id, None)  # cliente deletado
+            # Só depois de aplicar: se a busca falhar, a próxima volta tenta de novo
+            leitor.confirmar(novos)
+        situacoes.invalidar(ids)
+        situacoes.preencher(dados)
+
+        print(f"[CACHE] {len(ids)} cliente(s) atualizado(s): {sorted(ids)}")
+        return len(ids)
+
+    def _loop(self):
+        try:
+            while not self._parar.wait(self.intervalo):
+                try:
+                    self.atualizar()
+                    # Com o reconhecimento rodando por dias a poda não fica só na partida
+                    podar_marcadores()
+                except Exception as e:
+                    print(f"[AVISO] Falha ao atualizar cache de clientes: {e}")
+        finally:
+            connection.close()
+
+    def iniciar(self):
+        """Inicia a thread de atualização incremental"""
+        self._thread = threading.Thread(target=self._loop, name='cache-clientes', daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread:
+            self._thread.join(timeout=self.intervalo + 1)
+
+    def obter(self, cliente_id):
+        """Dados do cliente ou None (sem acesso ao banco)"""
+        with self._lock:
+            return self._dados.get(cliente_id)
+
+    def nome(self, cliente_id):
+        dados = self.obter(cliente_id)
+        return dados['nome'] if dados else f"ID {cliente_id}"
@@ -15,8 +15,9 @@ import django
 django.setup()
 
 from gym.models import Cliente
+from academia.reconhecimento.motor_captura import MotorCaptura, DISTANCIA_DUPLICATA
 
-def capturar_imagens(cliente_id, num_fotos=50):
+def capturar_imagens(cliente_id, num_fotos=50, distancia=DISTANCIA_DUPLICATA):
     """Captura múltiplas fotos do cliente para treinamento"""
     
     try:
@@ -50,6 +51,8 @@ def capturar_imagens(cliente_id, num_fotos=50):
         print("[ERRO] Nao foi possivel acessar camera!")
         return
     
+    motor = MotorCaptura(dataset_dir, '{n:03d}.jpg', distancia=distancia)
+    
     count = 0
     print("[INFO] Aguardando deteccao de rosto...")
     
@@ -74,15 +77,20 @@ def capturar_imagens(cliente_id, num_fotos=50):
                 
                 face_roi = gray[y:y+h, x:x+w]
                 
-                filename = dataset_dir / f"{count+1:03d}.jpg"
-                cv2.imwrite(str(filename), face_roi)
-                
-                count += 1
-                print(f"[OK] {count:02d}/{num_fotos} capturadas", end='\r')
+                salvo, motivo = motor.oferecer(face_roi)
+                if salvo:
+                    count += 1
+                    print(f"[OK] {count:02d}/{num_fotos} capturadas", end='\r')
+                    cor = (0, 255, 0)
+                else:
+                    cor = (0, 0, 255)
                 
-                cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
+                cv2.rectangle(frame, (x, y), (x+w, y+h), cor, 2)
                 cv2.putText(frame, f"{count}/{num_fotos}", (x, y-10),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.9, cor, 2)
+                if not salvo:
+                    cv2.putText(frame, motivo.upper(), (50, 50),
+                               cv2.FONT_HERSHEY_SIMPLEX, 0.8, cor, 2)
             
             elif len(faces) == 0:
                 cv2.putText(frame, "NENHUM ROSTO", (50, 50),
@@ -99,9 +107,15 @@ def capturar_imagens(cliente_id, num_fotos=50):
     finally:
         cam.release()
         cv2.destroyAllWindows()
+        salvas, falhas = motor.fechar()
     
-    print(f"\n\n[OK] {count} fotos capturadas com sucesso!\n")
-    return count >= num_fotos * 0.8
+    for falha in falhas:
+        print(f"[ERRO] {falha}")
+    print(f"\n\n[OK] {salvas} fotos capturadas com sucesso!")
+    for linha in motor.resumo_recusas():
+        print(linha)
+    print()
+    return salvas >= num_fotos * 0.8
 
 if __name__ == '__main__':
     if len(sys.argv) < 2:
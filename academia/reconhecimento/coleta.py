@@ -15,10 +15,15 @@ import django
 django.setup()
 
 from gym.models import Cliente
+from academia.reconhecimento.motor_captura import MotorCaptura, DISTANCIA_DUPLICATA
 
 parser = argparse.ArgumentParser()
 parser.add_argument('--id', type=int, required=True, help='ID do cliente')
 parser.add_argument('--count', type=int, default=30, help='Número de imagens')
+parser.add_argument('--distancia', type=int, default=DISTANCIA_DUPLICATA,
+                    help='Distância do hash perceptual até a qual a foto é duplicata (-1 desliga)')
+parser.add_argument('--sem-qualidade', action='store_true',
+                    help='Não recusa fotos desfocadas, mal expostas ou fora de pose')
 args = parser.parse_args()
 
 client_id = args.id
@@ -39,6 +44,11 @@ if not cam.isOpened():
     print("❌ Câmera não disponível!")
     sys.exit(1)
 
+motor = MotorCaptura(client_path, f"User.{client_id}.{{n}}.jpg", distancia=args.distancia,
+                     filtrar_qualidade=not args.sem_qualidade)
+if motor.filtro.hashes:
+    print(f"[INFO] {len(motor.filtro.hashes)} foto(s) existente(s) entram no filtro de duplicatas")
+
 count = 0
 try:
     while count < count_target:
@@ -50,20 +60,31 @@ try:
         faces = face_detector.detectMultiScale(gray, 1.3, 5)
         
         for (x, y, w, h) in faces:
-            count += 1
-            filename = os.path.join(client_path, f"User.{client_id}.{count}.jpg")
-            cv2.imwrite(filename, gray[y:y+h, x:x+w])
-            cv2.rectangle(img, (x, y), (x+w, y+h), (0, 255, 0), 2)
-            print(f"[+] {count}/{count_target}")
+            if count >= count_target:
+                break
+            salvo, motivo = motor.oferecer(gray[y:y+h, x:x+w])
+            cor = (0, 255, 0) if salvo else (0, 0, 255)
+            cv2.rectangle(img, (x, y), (x+w, y+h), cor, 2)
+            if salvo:
+                count += 1
+                print(f"[+] {count}/{count_target}")
+            else:
+                cv2.putText(img, motivo, (x, y + h + 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, cor, 2)
         
         cv2.putText(img, f'{count}/{count_target}', (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
         cv2.imshow(f'Capturando Cliente {client_id}', img)
         
-        k = cv2.waitKey(100) & 0xff
+        # A gravação é em background: sem espera fixa entre frames
+        k = cv2.waitKey(1) & 0xff
         if k == 27:
             break
 finally:
     cam.release()
     cv2.destroyAllWindows()
+    salvas, falhas = motor.fechar()
 
-print(f"\n✅ {count} imagens salvas em: {client_path}")
\ No newline at end of file
+for falha in falhas:
+    print(f"[ERRO] {falha}")
+for linha in motor.resumo_recusas():
+    print(linha)
+print(f"\n✅ {salvas} imagens salvas em: {client_path}")
@@ -0,0 +1,170 @@
+"""
+Leitura e análise de qualidade das fotos do dataset/<id>/.
+
+Sem Django: roda nos processos do pool do treina.py (cada processo cria o
+seu detector). Cada foto volta com o veredito de qualidade e a face 200x200
+pronta para o treino; o processo principal junta com o que veio do cache
+(manifesto.py) e monta as contagens e mensagens com resumir_cliente.
+
+Os mesmos critérios (avaliar_recorte) barram o recorte já na captura
+(motor_captura.py), antes de ele chegar ao disco.
+"""
+import cv2
+import numpy as np
+
+TAMANHO_FACE = (200, 200)
+
+# Critérios de qualidade (medidos na face em TAMANHO_FACE)
+BRILHO_MINIMO = 50
+BRILHO_MAXIMO = 200
+CONTRASTE_MINIMO = 30
+NITIDEZ_MINIMA = 40         # variância do Laplaciano; foto tremida fica abaixo de 30
+INCLINACAO_MAXIMA = 20      # graus entre os olhos
+DESVIO_OLHOS_MAXIMO = 0.15  # meio dos olhos fora do centro (fração da largura): rosto virado
+
+_detector = None
+_detector_olhos = None
+
+
+def _obter_detector():
+    global _detector
+    if _detector is None:
+        _detector = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    return _detector
+
+
+def _obter_detector_olhos():
+    global _detector_olhos
+    if _detector_olhos is None:
+        _detector_olhos = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+    return _detector_olhos
+
+
+def problemas_exposicao(gray):
+    """Brilho (média) e contraste (desvio padrão)"""
+    problemas = []
+    brilho_medio = np.mean(gray)
+    if brilho_medio < BRILHO_MINIMO:
+        problemas.append("Muito escura")
+    elif brilho_medio > BRILHO_MAXIMO:
+        problemas.append("Muito clara")
+
+    if np.std(gray) < CONTRASTE_MINIMO:
+        problemas.append("Baixo contraste")
+    return problemas
+
+
+def nitidez(gray):
+    """Variância do Laplaciano na escala do treino (independe do tamanho do recorte)"""
+    return cv2.Laplacian(cv2.resize(gray, TAMANHO_FACE), cv2.CV_64F).var()
+
+
+def problemas_pose(face):
+    """Dois olhos na metade de cima, nivelados e centralizados (face em TAMANHO_FACE)"""
+    largura = face.shape[1]
+    olhos = _obter_detector_olhos().detectMultiScale(
+        face[:face.shape[0] * 3 // 5], 1.1, 5, minSize=(largura // 10, largura // 10)
+    )
+    if len(olhos) < 2:
+        return ["Olhos nao detectados (rosto virado ou olhos fechados)"]
+
+    # Os dois maiores: sobrancelha e narina às vezes viram "olho" pequeno
+    olhos = sorted(olhos, key=lambda o: o[2] * o[3], reverse=True)[:2]
+    (x1, y1), (x2, y2) = [(x + w / 2, y + h / 2) for x, y, w, h in olhos]
+    inclinacao = abs(np.degrees(np.arctan2(y2 - y1, abs(x2 - x1) or 1)))
+    if inclinacao > INCLINACAO_MAXIMA:
+        return [f"Cabeca inclinada ({inclinacao:.0f} graus)"]
+    if abs((x1 + x2) / 2 - largura / 2) > DESVIO_OLHOS_MAXIMO * largura:
+        return ["Rosto virado de lado"]
+    return []
+
+
+def avaliar_recorte(gray):
+    """Problemas de um recorte de rosto na captura (lista vazia = pode salvar)"""
+    problemas = problemas_exposicao(gray)
+    valor_nitidez = nitidez(gray)
+    if valor_nitidez < NITIDEZ_MINIMA:
+        problemas.append(f"Desfocada (nitidez {valor_nitidez:.0f})")
+    if not problemas:
+        # Só vale procurar os olhos numa face bem exposta e nítida
+        problemas = problemas_pose(cv2.resize(gray, TAMANHO_FACE))
+    return problemas
+
+
+def analisar_imagem(img_path):
+    """Analisa qualidade da imagem"""
+    img = cv2.imread(str(img_path), cv2.IMREAD_GRAYSCALE)
+
+    if img is None:
+        return None, "ERRO: Arquivo corrompido"
+
+    # Tenta detectar face
+    faces = _obter_detector().detectMultiScale(img, 1.1, 4)
+    tem_face = len(faces) > 0
+
+    # Classifica qualidade
+    problemas = problemas_exposicao(img)
+
+    if nitidez(img) < NITIDEZ_MINIMA:
+        problemas.append("Desfocada")
+
+    if not tem_face:
+        problemas.append("Sem face detectada")
+
+    qualidade = "OK" if not problemas else " | ".join(problemas)
+
+    return img, qualidade
+
+
+def resumir_cliente(client_id, registros):
+    """Contagens e mensagens de um cliente a partir de [(arquivo, qualidade, face ou None)]"""
+    resultado = {
+        'id': client_id,
+        'faces': [],
+        'total': 0,
+        'ok': 0,
+        'falhas': 0,
+        'problemas': [],
+        'mensagens': [],
+    }
+
+    for arquivo, qualidade, face in registros:
+        resultado['total'] += 1
+
+        if face is None:
+            resultado['falhas'] += 1
+            resultado['problemas'].append(f"{arquivo}: {qualidade}")
+            resultado['mensagens'].append(f"  [ERRO] {arquivo}: {qualidade}")
+            continue
+
+        if qualidade != "OK":
+            resultado['mensagens'].append(f"  [AVISO] {arquivo}: {qualidade}")
+
+        resultado['faces'].append(face)
+        resultado['ok'] += 1
+
+    return resultado
+
+
+def processar_cliente(client_id, arquivos):
+    """Lê e analisa as fotos de um cliente: (client_id, [(arquivo, qualidade, face ou None)])"""
+    registros = []
+    for img_file in arquivos:
+        gray, qualidade = analisar_imagem(img_file)
+        # Redimensiona (SEM outros processamentos)
+        face = None if gray is None else cv2.resize(gray, TAMANHO_FACE)
+        registros.append((img_file.name, qualidade, face))
+    return client_id, registros
+
+
+def processar_lote(lote):
+    """Tarefa do pool: [(client_id, [arquivos])] -> [(client_id, registros)]"""
+    return [processar_cliente(client_id, arquivos) for client_id, arquivos in lote]
+
+
+def dividir_em_lotes(itens, workers, lotes_por_worker=4):
+    """Lotes pequenos o bastante para equilibrar clientes com muitas fotos"""
+    if not itens:
+        return []
+    tamanho = max(1, -(-len(itens) // (max(1, workers) * lotes_por_worker)))
+    return [itens[i:i + tamanho] for i in range(0, len(itens), tamanho)]
@@ -0,0 +1,111 @@
+"""
+Fontes de frames para o reconhecimento: webcam, arquivo de vídeo ou pasta
+de imagens. Todas têm a mesma interface do cv2.VideoCapture
+(read/isOpened/release), então o pipeline não sabe de onde vem o frame.
+"""
+import time
+from pathlib import Path
+
+import cv2
+
+EXTENSOES_IMAGEM = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class FonteWebcam:
+    """Câmera local (cv2.VideoCapture(indice))"""
+
+    def __init__(self, indice=0, largura=640, altura=480):
+        self.cam = cv2.VideoCapture(indice)
+        self.cam.set(cv2.CAP_PROP_FRAME_WIDTH, largura)
+        self.cam.set(cv2.CAP_PROP_FRAME_HEIGHT, altura)
+        self.descricao = f"webcam {indice}"
+
+    def isOpened(self):
+        return self.cam.isOpened()
+
+    def read(self):
+        return self.cam.read()
+
+    def release(self):
+        self.cam.release()
+
+
+class FonteVideo:
+    """Arquivo de vídeo; tempo_real=True respeita o FPS do arquivo"""
+
+    def __init__(self, caminho, tempo_real=False):
+        self.cam = cv2.VideoCapture(str(caminho))
+        self.tempo_real = tempo_real
+        self.fps = self.cam.get(cv2.CAP_PROP_FPS) or 25
+        self.descricao = f"video {caminho}"
+        self._proximo = None
+
+    def isOpened(self):
+        return self.cam.isOpened()
+
+    def read(self):
+        if self.tempo_real:
+            _esperar(self, 1 / self.fps)
+        return self.cam.read()
+
+    def release(self):
+        self.cam.release()
+
+
+class FonteImagens:
+    """Pasta de imagens lidas em ordem alfabética (fps=None: sem espera)"""
+
+    def __init__(self, diretorio, fps=None):
+        self.arquivos = sorted(
+            p for p in Path(diretorio).iterdir()
+            if p.suffix.lower() in EXTENSOES_IMAGEM
+        )
+        self.fps = fps
+        self.tempo_real = fps is not None
+        self.descricao = f"imagens {diretorio} ({len(self.arquivos)})"
+        self._indice = 0
+        self._proximo = None
+
+    def isOpened(self):
+        return bool(self.arquivos)
+
+    def read(self):
+        if self._indice >= len(self.arquivos):
+            return False, None
+        if self.tempo_real:
+            _esperar(self, 1 / self.fps)
+
+        frame = cv2.imread(str(self.arquivos[self._indice]))
+        self._indice += 1
+        if frame is None:
+            return False, None
+        return True, frame
+
+    def release(self):
+        self._indice = len(self.arquivos)
+
+
+def _esperar(fonte, intervalo):
+    """Segura a leitura para simular uma câmera no FPS dado"""
+    agora = time.perf_counter()
+    if fonte._proximo is None:
+        fonte._proximo = agora
+    if fonte._proximo > agora:
+        time.sleep(fonte._proximo - agora)
+    fonte._proximo = max(fonte._proximo, agora) + intervalo
+
+
+def abrir_fonte(spec=0, tempo_real=False, fps_imagens=None):
+    """
+    Abre a fonte a partir de uma especificação:
+      - inteiro (ou '0', '1', ...): webcam
+      - pasta: imagens em ordem alfabética
+      - arquivo: vídeo
+    """
+    if isinstance(spec, int) or str(spec).isdigit():
+        return FonteWebcam(int(spec))
+
+    caminho = Path(spec)
+    if caminho.is_dir():
+        return FonteImagens(caminho, fps=fps_imagens if tempo_real else None)
+    return FonteVideo(caminho, tempo_real=tempo_real)
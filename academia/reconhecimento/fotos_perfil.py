@@ -0,0 +1,128 @@
+"""
+Cadastro em lote a partir da foto de perfil (Cliente.imagem).
+
+Sem Django: roda nos processos do pool do comando
+`python manage.py cadastrar_fotos_perfil`. Cada foto vira um recorte do
+rosto mais variações (espelho, rotação, brilho, zoom) gravadas em
+dataset/<id>/perfil.NN.jpg, que o treina.py lê como qualquer outra foto.
+As variações são determinísticas: rodar de novo com a mesma foto grava os
+mesmos bytes e o manifesto não pede retreino.
+"""
+import re
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from academia.reconhecimento.dataset import avaliar_recorte
+from academia.reconhecimento.motor_captura import gravar_imagem
+
+PREFIXO = 'perfil'
+MARGEM = 0.25            # contexto em volta do rosto para girar/ampliar sem borda preta
+LADO_MINIMO_ROSTO = 60   # foto de perfil costuma ser pequena
+
+RE_ARQUIVO_PERFIL = re.compile(rf'^{PREFIXO}\.\d+\.jpg$')
+
+_detector = None
+
+
+def _obter_detector():
+    global _detector
+    if _detector is None:
+        _detector = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    return _detector
+
+
+def _girar(regiao, graus):
+    altura, largura = regiao.shape[:2]
+    matriz = cv2.getRotationMatrix2D((largura / 2, altura / 2), graus, 1.0)
+    return cv2.warpAffine(regiao, matriz, (largura, altura), borderMode=cv2.BORDER_REFLECT)
+
+
+def _ampliar(regiao, fator):
+    altura, largura = regiao.shape[:2]
+    matriz = cv2.getRotationMatrix2D((largura / 2, altura / 2), 0, fator)
+    return cv2.warpAffine(regiao, matriz, (largura, altura), borderMode=cv2.BORDER_REFLECT)
+
+
+def _brilho(regiao, delta):
+    return cv2.convertScaleAbs(regiao, alpha=1.0, beta=delta)
+
+
+def _gama(regiao, gama):
+    tabela = np.clip(((np.arange(256) / 255.0) ** gama) * 255, 0, 255).astype(np.uint8)
+    return cv2.LUT(regiao, tabela)
+
+
+# Em ordem de utilidade: --variacoes N usa as N primeiras
+VARIACOES = [
+    ('original', lambda r: r),
+    ('espelho', lambda r: cv2.flip(r, 1)),
+    ('rotacao-8', lambda r: _girar(r, -8)),
+    ('rotacao+8', lambda r: _girar(r, 8)),
+    ('escura', lambda r: _brilho(r, -35)),
+    ('clara', lambda r: _brilho(r, 35)),
+    ('zoom', lambda r: _ampliar(r, 1.1)),
+    ('gama', lambda r: _gama(r, 1.6)),
+    ('espelho-rotacao', lambda r: _girar(cv2.flip(r, 1), 5)),
+]
+
+
+def recortar_rosto(gray):
+    """(região com margem, caixa do rosto dentro dela) do maior rosto, ou None"""
+    faces = _obter_detector().detectMultiScale(
+        gray, scaleFactor=1.1, minNeighbors=5, minSize=(LADO_MINIMO_ROSTO, LADO_MINIMO_ROSTO)
+    )
+    if len(faces) == 0:
+        return None
+    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+    mx, my = int(w * MARGEM), int(h * MARGEM)
+    # Borda refletida: o rosto fica sempre no centro da região (espelho e rotação não o deslocam)
+    com_borda = cv2.copyMakeBorder(gray, my, my, mx, mx, cv2.BORDER_REFLECT)
+    return com_borda[y:y + h + 2 * my, x:x + w + 2 * mx], (mx, my, w, h)
+
+
+def processar_foto(cliente_id, caminho_foto, dataset_dir, variacoes=len(VARIACOES), filtrar_qualidade=True):
+    """
+    Tarefa do pool: grava as variações do rosto da foto de perfil.
+    Devolve (cliente_id, amostras gravadas, mensagem de erro ou '').
+    """
+    gray = cv2.imread(str(caminho_foto), cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return cliente_id, 0, 'foto ilegivel ou inexistente'
+
+    recorte = recortar_rosto(gray)
+    if recorte is None:
+        return cliente_id, 0, 'nenhum rosto na foto'
+    regiao, (x, y, w, h) = recorte
+
+    if filtrar_qualidade:
+        problemas = avaliar_recorte(regiao[y:y+h, x:x+w])
+        if problemas:
+            return cliente_id, 0, problemas[0]
+
+    destino = Path(dataset_dir) / str(cliente_id)
+    destino.mkdir(parents=True, exist_ok=True)
+
+    gravadas = set()
+    for numero, (_, transformar) in enumerate(VARIACOES[:variacoes], start=1):
+        # Transforma com margem e recorta a caixa depois: rotação/zoom sem borda
+        amostra = transformar(regiao)[y:y+h, x:x+w]
+        nome = f"{PREFIXO}.{numero:02d}.jpg"
+        gravar_imagem(destino / nome, amostra)
+        gravadas.add(nome)
+
+    # Rodada anterior com mais variações: sobras viram amostras órfãs
+    for antigo in destino.iterdir():
+        if RE_ARQUIVO_PERFIL.match(antigo.name) and antigo.name not in gravadas:
+            antigo.unlink()
+
+    return cliente_id, len(gravadas), ''
+
+
+def tem_fotos_de_camera(dataset_dir, cliente_id):
+    """Já há fotos capturadas (além das geradas pela foto de perfil)?"""
+    pasta = Path(dataset_dir) / str(cliente_id)
+    return pasta.is_dir() and any(
+        p.suffix.lower() == '.jpg' and not RE_ARQUIVO_PERFIL.match(p.name) for p in pasta.iterdir()
+    )
@@ -0,0 +1,141 @@
+"""
+Busca LBPH em fragmentos, em paralelo num pool de processos.
+
+Com TREINO_FRAGMENTOS > 1 o treino grava a galeria do snapshot dividida em
+N fragmentos por cliente (client_id % N, lbph_vetorizado.py). Aqui o
+ReconhecedorFragmentado extrai os histogramas das faces do frame uma vez,
+manda a busca de cada fragmento para um processo e junta os resultados
+pela menor distância. Cada cliente está num fragmento só, então os k
+melhores de cada fragmento juntos dão os k melhores da galeria inteira.
+
+Os processos abrem o mesmo trainer.snap com mmap: a galeria fica uma vez
+no page cache, não uma cópia por processo. Se um processo falhar (ou já
+estiver vendo um snapshot mais novo), a busca do frame roda no processo
+principal mesmo.
+"""
+import os
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from academia.reconhecimento.lbph_vetorizado import GaleriaLBPH
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+# Nos processos do pool: ((caminho, versao), galeria) da última busca
+_galeria = None
+
+
+# ============================================================
+# PROCESSOS DO POOL
+# ============================================================
+
+def _galeria_do_worker(caminho, versao):
+    global _galeria
+    if _galeria is None or _galeria[0] != (caminho, versao):
+        galeria = GaleriaLBPH.carregar(caminho)
+        if galeria.versao != versao:
+            # O treino trocou o arquivo depois que o reconhecedor foi montado
+            raise RuntimeError(f"{caminho}: versao {galeria.versao}, esperada {versao}")
+        _galeria = ((caminho, versao), galeria)
+    return _galeria[1]
+
+
+def _buscar_no_fragmento(caminho, versao, fragmento, consultas, k, removidos):
+    """Os k clientes mais próximos de cada consulta dentro de um fragmento"""
+    galeria = _galeria_do_worker(caminho, versao)
+    if galeria.removidos != removidos:
+        galeria.definir_removidos(removidos)
+    return galeria.fragmento(fragmento).buscar(consultas, k)
+
+
+def _obter_pool(workers):
+    """Pool compartilhado entre as versões do modelo (recriado se mudar de tamanho)"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            # spawn: o processo principal já tem threads (câmera, observador)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context('spawn'))
+            _pool_workers = workers
+        return _pool
+
+
+def encerrar_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def juntar(partes, k):
+    """Junta [[(client_id, distancia), ...] por consulta] de cada fragmento pela menor distância"""
+    # sorted é estável: empate fica com o fragmento de menor índice
+    return [sorted((r for lista in por_fragmento for r in lista), key=lambda r: r[1])[:k]
+            for por_fragmento in zip(*partes)]
+
+
+# ============================================================
+# RECONHECEDOR
+# ============================================================
+
+class ReconhecedorFragmentado:
+    """Reconhecedor LBPH que busca os fragmentos do snapshot em paralelo"""
+
+    nome = 'lbph'
+
+    def __init__(self, galeria, caminho, workers=None):
+        self.galeria = galeria
+        # Os do modelo (cabeçalho do snapshot); None = CONFIDENCE_* do reconhece.py
+        self.limiares = galeria.limiares
+        self.caminho = str(caminho)
+        fragmentos = len(galeria.fragmentos)
+        self.workers = min(fragmentos, workers or os.cpu_count() or 1)
+        self._avisou = False
+        if self.workers > 1:
+            # Abre o snapshot nos processos antes do primeiro frame
+            pool = _obter_pool(self.workers)
+            for _ in range(self.workers):
+                pool.submit(_galeria_do_worker, self.caminho, galeria.versao)
+
+    def predict(self, face):
+        return self.predict_varios([face])[0]
+
+    def predict_varios(self, faces):
+        """(client_id, distancia) de cada face, com os fragmentos buscados em paralelo"""
+        return [r[0] if r else (-1, float('inf')) for r in self.buscar_varios(faces, k=1)]
+
+    def buscar_varios(self, faces, k=5):
+        """Os k clientes mais próximos de cada face: [[(client_id, distancia), ...], ...]"""
+        if not len(faces):
+            return []
+        consultas = self.galeria.extrair(faces)
+        if self.workers <= 1:
+            return self.galeria.buscar(consultas, k=k)
+        try:
+            pool = _obter_pool(self.workers)
+            futuros = [pool.submit(_buscar_no_fragmento, self.caminho, self.galeria.versao, i,
+                                   consultas, k, self.galeria.removidos)
+                       for i in range(len(self.galeria.fragmentos))]
+            return juntar([f.result() for f in futuros], k)
+        except (RuntimeError, OSError, ValueError) as e:
+            if isinstance(e, BrokenProcessPool):
+                # Um processo morreu: o próximo frame sobe um pool novo
+                encerrar_pool()
+            if not self._avisou:
+                print(f"[AVISO] Busca paralela falhou, buscando no processo principal: {e}")
+                self._avisou = True
+            return self.galeria.buscar(consultas, k=k)
+
+    def extrair_vetor(self, face):
+        return self.galeria.extrair([face])[0]
+
+    def definir_removidos(self, removidos):
+        self.galeria.definir_removidos(removidos)
+
+    def tamanho_galeria(self):
+        return len(self.galeria)
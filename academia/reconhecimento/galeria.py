@@ -0,0 +1,182 @@
+"""
+Galeria compacta: cada cliente reduzido a poucos protótipos float16.
+
+O LBPH guarda um histograma por foto (256*8*8 floats = 64 KB no padrão) e
+o predict compara a consulta com todos. Depois do treino (treina.py
+--prototipos K) os histogramas de cada cliente viram no máximo K protótipos:
+
+- medoide    as K amostras reais que melhor representam o cliente
+             (k-medoides com a própria distância chi-quadrado do LBPH)
+- centroide  médias de um k-means dentro do cliente
+
+Os protótipos ficam numa matriz contígua float16 (metade dos bytes) e a
+memória e o tempo do predict passam a crescer com o número de clientes,
+não de fotos. custo_compactacao mede quanto de acurácia isso custa.
+"""
+import cv2
+import numpy as np
+
+from academia.reconhecimento.indice import distancias, VetoresEmDisco, LINHAS_POR_BLOCO
+
+METODOS = ('medoide', 'centroide')
+ITERACOES_MEDOIDES = 10
+MAX_CLIENTES_CUSTO = 200    # clientes sorteados para estimar o custo
+MAX_CONSULTAS_POR_CLIENTE = 2
+
+
+def config_prototipos(por_cliente, metodo='medoide'):
+    """Como o treino e o manifesto descrevem a compactação (None = desligada)"""
+    return {'por_cliente': int(por_cliente), 'metodo': metodo} if por_cliente else None
+
+
+class GaleriaCompacta:
+    """Protótipos float16 com a mesma leitura em blocos do VetoresEmDisco"""
+
+    def __init__(self, vetores, linhas_por_bloco=LINHAS_POR_BLOCO):
+        self.vetores = np.ascontiguousarray(vetores, dtype=np.float16)
+        self.linhas_por_bloco = linhas_por_bloco
+
+    def __len__(self):
+        return len(self.vetores)
+
+    @property
+    def shape(self):
+        return self.vetores.shape
+
+    def blocos(self):
+        """Gera (linha inicial, bloco float32): o chi-quadrado roda em float32"""
+        for inicio in range(0, len(self.vetores), self.linhas_por_bloco):
+            yield inicio, self.vetores[inicio:inicio + self.linhas_por_bloco].astype(np.float32)
+
+
+def _linhas(vetores, indices):
+    """Linhas `indices` (de um cliente) como float32, em memória ou em disco"""
+    if not isinstance(vetores, VetoresEmDisco):
+        return np.asarray(vetores[indices], dtype=np.float32)
+    # No treino em blocos as amostras de um cliente são consecutivas no arquivo
+    inicio, fim = int(indices.min()), int(indices.max()) + 1
+    vetores.fechar()
+    with open(vetores.caminho, 'rb') as f:
+        f.seek(inicio * vetores.dimensao * 4)
+        trecho = np.fromfile(f, dtype=np.float32, count=(fim - inicio) * vetores.dimensao)
+    return trecho.reshape(fim - inicio, vetores.dimensao)[indices - inicio]
+
+
+def _matriz_distancias(vetores, metrica):
+    matriz = np.empty((len(vetores), len(vetores)), dtype=np.float32)
+    for i, vetor in enumerate(vetores):
+        matriz[i] = distancias(vetores, vetor, metrica)
+    return matriz
+
+
+def medoides(vetores, k, metrica='chi2'):
+    """Índices de k amostras por k-medoides (início guloso + iterações de Voronoi)"""
+    matriz = _matriz_distancias(vetores, metrica)
+    escolhidos = [int(np.argmin(matriz.sum(axis=1)))]
+    while len(escolhidos) < k:
+        # Entra quem mais reduz a soma das distâncias ao medoide mais próximo
+        atual = matriz[:, escolhidos].min(axis=1)
+        ganho = np.maximum(atual[None, :] - matriz, 0).sum(axis=1)
+        ganho[escolhidos] = -1
+        escolhidos.append(int(np.argmax(ganho)))
+
+    for _ in range(ITERACOES_MEDOIDES):
+        grupo = np.argmin(matriz[:, escolhidos], axis=1)
+        novos = []
+        for g in range(k):
+            membros = np.flatnonzero(grupo == g)
+            if len(membros) == 0:   # medoides repetidos (amostras idênticas)
+                novos.append(escolhidos[g])
+                continue
+            novos.append(int(membros[np.argmin(matriz[np.ix_(membros, membros)].sum(axis=1))]))
+        if novos == escolhidos:
+            break
+        escolhidos = novos
+    return np.array(escolhidos)
+
+
+def centroides(vetores, k, semente=0):
+    """k médias das amostras (k-means L2 do cv2, determinístico pela semente)"""
+    if k == 1:
+        return vetores.mean(axis=0, keepdims=True)
+    cv2.setRNGSeed(semente)
+    criterio = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 1e-4)
+    _, _, centros = cv2.kmeans(np.ascontiguousarray(vetores), k, None, criterio, 1, cv2.KMEANS_PP_CENTERS)
+    return centros
+
+
+def prototipos_do_cliente(vetores, k, metodo='medoide', metrica='chi2', semente=0):
+    """Até k protótipos (float32) das amostras de um cliente"""
+    if len(vetores) <= k:
+        return vetores
+    if metodo == 'medoide':
+        return vetores[medoides(vetores, k, metrica)]
+    return centroides(vetores, k, semente)
+
+
+def compactar(vetores, rotulos, k, metodo='medoide', metrica='chi2', semente=0):
+    """(protótipos N' x D float16, rótulos N') com até k protótipos por cliente"""
+    if metodo not in METODOS:
+        raise ValueError(f"Metodo desconhecido: {metodo} (opcoes: {', '.join(METODOS)})")
+    rotulos = np.asarray(rotulos, dtype=np.int32)
+    clientes, contagem = np.unique(rotulos, return_counts=True)
+    total = int(np.minimum(contagem, k).sum())
+    prototipos = np.empty((total, vetores.shape[1]), dtype=np.float16)
+    rotulos_prototipos = np.empty(total, dtype=np.int32)
+
+    linha = 0
+    for client_id in clientes:
+        escolhidos = prototipos_do_cliente(_linhas(vetores, np.flatnonzero(rotulos == client_id)),
+                                           k, metodo, metrica, semente)
+        prototipos[linha:linha + len(escolhidos)] = escolhidos
+        rotulos_prototipos[linha:linha + len(escolhidos)] = client_id
+        linha += len(escolhidos)
+    return prototipos, rotulos_prototipos
+
+
+def _top1(galeria, rotulos_galeria, consultas, metrica):
+    return np.array([rotulos_galeria[np.argmin(distancias(galeria, consulta, metrica))]
+                     for consulta in consultas])
+
+
+def custo_compactacao(vetores, rotulos, k, metodo='medoide', metrica='chi2', semente=0):
+    """
+    Acurácia top-1 com a galeria inteira e com a compacta, em amostras
+    separadas de até MAX_CLIENTES_CUSTO clientes (não entram na galeria).
+    """
+    rng = np.random.default_rng(semente)
+    rotulos = np.asarray(rotulos, dtype=np.int32)
+    clientes = np.unique(rotulos)
+    if len(clientes) > MAX_CLIENTES_CUSTO:
+        clientes = np.sort(rng.choice(clientes, MAX_CLIENTES_CUSTO, replace=False))
+
+    galeria, rotulos_galeria, consultas, reais = [], [], [], []
+    for client_id in clientes:
+        amostras = _linhas(vetores, np.flatnonzero(rotulos == client_id))
+        if len(amostras) < 2:
+            continue
+        ordem = rng.permutation(len(amostras))
+        n_teste = min(MAX_CONSULTAS_POR_CLIENTE, max(1, len(amostras) // 5))
+        consultas.append(amostras[ordem[:n_teste]])
+        reais += [client_id] * n_teste
+        galeria.append(amostras[ordem[n_teste:]])
+        rotulos_galeria += [client_id] * (len(amostras) - n_teste)
+
+    if not consultas:
+        return None
+    galeria = np.concatenate(galeria)
+    rotulos_galeria = np.array(rotulos_galeria, dtype=np.int32)
+    consultas = np.concatenate(consultas)
+    reais = np.array(reais)
+    compacta, rotulos_compacta = compactar(galeria, rotulos_galeria, k, metodo, metrica, semente)
+
+    completa = (_top1(galeria, rotulos_galeria, consultas, metrica) == reais).mean()
+    reduzida = (_top1(compacta, rotulos_compacta, consultas, metrica) == reais).mean()
+    return {
+        'clientes': len(clientes),
+        'consultas': len(reais),
+        'acuracia_completa': round(float(completa), 5),
+        'acuracia_compacta': round(float(reduzida), 5),
+        'amostras_galeria': len(galeria),
+        'prototipos_galeria': len(compacta),
+    }
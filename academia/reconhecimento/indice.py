@@ -0,0 +1,406 @@
+"""
+Índice aproximado (IVF) sobre os vetores por amostra do reconhecedor.
+
+Um quantizador grosso (k-means sobre uma projeção aleatória de baixa
+dimensão dos vetores) divide as amostras em listas; a busca mede a
+distância só aos centróides, pega as `sondas` listas mais próximas e
+reordena esses candidatos com a distância exata do backend (chi-quadrado do
+LBPH, L2 para Fisherfaces/embeddings). Com poucas amostras o índice degrada
+para busca exaustiva.
+
+Arquivos ao lado do modelo:
+- trainer.ivf.npz          rótulos, centróides e listas (treina.py): pequeno,
+                           lido inteiro
+- trainer.ivf.<versao>.npy vetores por amostra, abertos com mmap: a busca só
+                           traz do disco as linhas dos candidatos, e os
+                           processos que carregam o índice dividem o page cache
+- trainer.ivf.removidos.json  clientes removidos (lápides), escrito pelo
+                              deletar_reconhecimento sem reescrever o índice
+
+O .npz guarda o nome do .npy da mesma gravação: quem abriu o índice antigo
+continua com os vetores dele até recarregar. No treino com orçamento de
+memória os vetores ficam em VetoresEmDisco e o índice é montado e salvo
+lendo um bloco por vez.
+"""
+import os
+import json
+import threading
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+RECONHECIMENTO_DIR = Path(__file__).resolve().parent
+INDICE_PATH = RECONHECIMENTO_DIR / 'trainer.ivf.npz'
+REMOVIDOS_PATH = RECONHECIMENTO_DIR / 'trainer.ivf.removidos.json'
+SONDAS_PADRAO = 4
+AMOSTRAS_POR_LISTA = 64         # alvo de tamanho das listas
+MAX_AMOSTRAS_KMEANS = 20000     # k-means roda numa amostra do conjunto
+DIMENSAO_GROSSA = 256           # dimensão da projeção usada no quantizador
+LINHAS_POR_BLOCO = 1024         # leitura de VetoresEmDisco
+
+_EPS = np.float32(np.finfo(np.float64).eps)
+
+
+def distancias(vetores, consulta, metrica):
+    """Distância exata de cada linha de `vetores` até `consulta`"""
+    if metrica == 'chi2':
+        # Mesma conta do HISTCMP_CHISQR_ALT usado pelo LBPH do OpenCV.
+        # Onde a soma é ~0 a diferença também é, então limitar o divisor
+        # dá o mesmo resultado que pular o termo (e evita temporários)
+        diferenca = vetores - consulta
+        soma = vetores + consulta
+        np.maximum(soma, _EPS, out=soma)
+        diferenca *= diferenca
+        diferenca /= soma
+        return 2 * diferenca.sum(axis=1)
+    diferenca = vetores - consulta
+    return np.sqrt(np.einsum('ij,ij->i', diferenca, diferenca))
+
+
+class VetoresEmDisco:
+    """
+    Matriz N x D float32 gravada aos blocos num arquivo bruto e relida aos
+    blocos com leituras comuns (sem memmap, que deixaria o arquivo todo no
+    RSS): a memória fica no tamanho do bloco, não no total.
+    """
+
+    dtype = np.float32
+
+    def __init__(self, caminho, linhas_por_bloco=LINHAS_POR_BLOCO):
+        self.caminho = Path(caminho)
+        self.linhas_por_bloco = linhas_por_bloco
+        self.linhas = 0
+        self.dimensao = None
+        self._arquivo = open(self.caminho, 'wb')
+
+    def __len__(self):
+        return self.linhas
+
+    @property
+    def shape(self):
+        return (self.linhas, self.dimensao or 0)
+
+    def acrescentar(self, vetores):
+        vetores = np.ascontiguousarray(vetores, dtype=np.float32)
+        if self.dimensao is None:
+            self.dimensao = vetores.shape[1]
+        self._arquivo.write(vetores.tobytes())
+        self.linhas += len(vetores)
+
+    def fechar(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+    def blocos(self):
+        """Gera (linha inicial, bloco linhas_por_bloco x D)"""
+        self.fechar()
+        with open(self.caminho, 'rb') as f:
+            for inicio in range(0, self.linhas, self.linhas_por_bloco):
+                n = min(self.linhas_por_bloco, self.linhas - inicio)
+                bloco = np.fromfile(f, dtype=np.float32, count=n * self.dimensao)
+                yield inicio, bloco.reshape(n, self.dimensao)
+
+    def remover(self):
+        self.fechar()
+        self.caminho.unlink(missing_ok=True)
+
+
+def _gravar_npy_em_blocos(caminho, vetores):
+    """Mesmo formato do np.save, copiando bloco a bloco (VetoresEmDisco ou memmap)"""
+    with open(caminho, 'wb') as f:
+        np.lib.format.write_array_header_2_0(f, {
+            'descr': np.lib.format.dtype_to_descr(np.dtype(vetores.dtype)),
+            'fortran_order': False,
+            'shape': vetores.shape,
+        })
+        if isinstance(vetores, VetoresEmDisco):
+            blocos = (bloco for _, bloco in vetores.blocos())
+        else:
+            blocos = (vetores[i:i + LINHAS_POR_BLOCO] for i in range(0, len(vetores), LINHAS_POR_BLOCO))
+        for bloco in blocos:
+            f.write(np.ascontiguousarray(bloco).tobytes())
+
+
+def _caminho_vetores(caminho, versao):
+    """trainer.ivf.npz -> trainer.ivf.<versao>.npy"""
+    caminho = Path(caminho)
+    return caminho.with_name(f"{caminho.stem}.{versao or 'sem-versao'}.npy")
+
+
+def tamanho_indice(caminho=INDICE_PATH):
+    """Bytes do índice em disco (.npz mais os vetores dele)"""
+    caminho = Path(caminho)
+    with np.load(caminho) as dados:
+        if dados['vetores'].ndim:
+            return caminho.stat().st_size     # formato antigo: vetores dentro do .npz
+        vetores = caminho.with_name(str(dados['vetores']))
+    return caminho.stat().st_size + vetores.stat().st_size
+
+
+def ler_removidos(caminho=REMOVIDOS_PATH):
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            return set(json.load(f))
+    except (OSError, ValueError):
+        return set()
+
+
+def _escrever_removidos(removidos, caminho=REMOVIDOS_PATH):
+    temporario = caminho.with_name(f".{caminho.name}.tmp")
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(sorted(removidos), f)
+    os.replace(temporario, caminho)
+
+
+def remover_cliente_do_indice(cliente_id, caminho=REMOVIDOS_PATH):
+    """Lápide para o cliente: some das buscas sem retreinar (o reconhecimento
+    em execução recarrega as lápides sozinho)"""
+    removidos = ler_removidos(caminho)
+    removidos.add(int(cliente_id))
+    _escrever_removidos(removidos, caminho)
+
+
+class IndiceIVF:
+    """Listas invertidas + reordenação exata; aceita inserção e lápides"""
+
+    def __init__(self, metrica='chi2', sondas=SONDAS_PADRAO):
+        self.metrica = metrica
+        self.sondas = sondas
+        self.versao = None
+        self.semente = 0
+        self._projecao = None
+        self.centroides = np.zeros((0, 0), dtype=np.float32)
+        self.vetores = np.zeros((0, 0), dtype=np.float32)
+        self.rotulos = np.zeros(0, dtype=np.int32)
+        self.listas = np.zeros(0, dtype=np.int32)
+        self.removidos = set()
+        self._vivos = np.zeros(0, dtype=bool)
+        self._membros = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return int(self._vivos.sum())
+
+    # ----- construção -----
+
+    @classmethod
+    def construir(cls, vetores, rotulos, metrica='chi2', sondas=SONDAS_PADRAO, versao=None, semente=0):
+        indice = cls(metrica, sondas)
+        indice.versao = versao
+        indice.semente = semente
+        rotulos = np.asarray(rotulos, dtype=np.int32)
+        if isinstance(vetores, VetoresEmDisco):
+            # Só a projeção (DIMENSAO_GROSSA colunas) fica inteira na memória;
+            # um índice assim serve para salvar, não para buscar
+            indice._criar_projecao(vetores.shape[1])
+            grossos = np.concatenate([indice._projetar(bloco) for _, bloco in vetores.blocos()])
+        else:
+            # Galeria compacta (galeria.py) continua float16; o resto vira float32
+            tipo = np.float16 if np.asarray(vetores).dtype == np.float16 else np.float32
+            vetores = np.ascontiguousarray(vetores, dtype=tipo)
+            indice._criar_projecao(vetores.shape[1])
+            grossos = indice._projetar(vetores)
+
+        n_listas = max(1, len(vetores) // AMOSTRAS_POR_LISTA)
+        if n_listas == 1:
+            indice.centroides = grossos.mean(axis=0, keepdims=True)
+        else:
+            rng = np.random.default_rng(semente)
+            amostra = grossos
+            if len(grossos) > MAX_AMOSTRAS_KMEANS:
+                amostra = grossos[rng.choice(len(grossos), MAX_AMOSTRAS_KMEANS, replace=False)]
+            cv2.setRNGSeed(semente)
+            criterio = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 1e-4)
+            _, _, centroides = cv2.kmeans(amostra, n_listas, None, criterio, 1, cv2.KMEANS_PP_CENTERS)
+            indice.centroides = centroides.astype(np.float32)
+
+        indice.vetores = vetores
+        indice.rotulos = rotulos
+        indice.listas = indice._atribuir_projetados(grossos)
+        indice._reindexar()
+        return indice
+
+    def _criar_projecao(self, dimensao):
+        """Projeção aleatória fixa (pela semente); preserva distâncias L2"""
+        if dimensao <= DIMENSAO_GROSSA:
+            self._projecao = None
+            return
+        rng = np.random.default_rng(self.semente)
+        # Gerada aos pedaços direto em float32 (mesma sequência da matriz
+        # float64 inteira, sem o pico de memória dela)
+        self._projecao = np.empty((dimensao, DIMENSAO_GROSSA), dtype=np.float32)
+        escala = 1 / np.sqrt(DIMENSAO_GROSSA)
+        for inicio in range(0, dimensao, LINHAS_POR_BLOCO):
+            fim = min(dimensao, inicio + LINHAS_POR_BLOCO)
+            self._projecao[inicio:fim] = rng.standard_normal((fim - inicio, DIMENSAO_GROSSA)) * escala
+
+    def _projetar(self, vetores):
+        return vetores if self._projecao is None else vetores @ self._projecao
+
+    def _atribuir(self, vetores):
+        """Lista (centróide L2 mais próximo) de cada vetor"""
+        if len(vetores) == 0:
+            return np.zeros(0, dtype=np.int32)
+        return self._atribuir_projetados(self._projetar(vetores))
+
+    def _atribuir_projetados(self, grossos):
+        if len(grossos) == 0:
+            return np.zeros(0, dtype=np.int32)
+        produto = grossos @ self.centroides.T
+        normas = np.einsum('ij,ij->i', self.centroides, self.centroides)
+        return np.argmin(normas[None, :] - 2 * produto, axis=1).astype(np.int32)
+
+    def _reindexar(self):
+        self._vivos = ~np.isin(self.rotulos, list(self.removidos))
+        ordem = np.argsort(self.listas, kind='stable')
+        cortes = np.searchsorted(self.listas[ordem], np.arange(len(self.centroides) + 1))
+        self._membros = [ordem[cortes[i]:cortes[i + 1]] for i in range(len(self.centroides))]
+
+    # ----- alterações -----
+
+    def adicionar(self, vetores, rotulos):
+        """Insere amostras nas listas existentes (sem refazer o k-means)"""
+        vetores = np.ascontiguousarray(vetores, dtype=np.float32)
+        rotulos = np.asarray(rotulos, dtype=np.int32)
+        with self._lock:
+            self.vetores = np.concatenate([self.vetores, vetores]) if len(self.vetores) else vetores
+            self.rotulos = np.concatenate([self.rotulos, rotulos])
+            self.listas = np.concatenate([self.listas, self._atribuir(vetores)])
+            # Um cliente reinserido deixa de ser lápide
+            self.removidos -= set(rotulos.tolist())
+            self._reindexar()
+
+    def remover(self, cliente_id):
+        with self._lock:
+            self.removidos.add(int(cliente_id))
+            self._vivos &= self.rotulos != cliente_id
+
+    def definir_removidos(self, removidos):
+        with self._lock:
+            self.removidos = set(removidos)
+            self._vivos = ~np.isin(self.rotulos, list(self.removidos))
+
+    def compactar(self):
+        """Apaga de vez as amostras com lápide (no próximo salvar)"""
+        with self._lock:
+            manter = self._vivos
+            self.vetores = np.ascontiguousarray(self.vetores[manter])
+            self.rotulos = self.rotulos[manter]
+            self.listas = self.listas[manter]
+            self.removidos = set()
+            self._reindexar()
+
+    # ----- busca -----
+
+    def buscar(self, consulta, k=1):
+        """[(client_id, distancia)] dos k clientes mais próximos"""
+        consulta = np.asarray(consulta, dtype=np.float32).ravel()
+        membros, vivos = self._membros, self._vivos
+
+        sondas = min(self.sondas, len(self.centroides))
+        if sondas < len(self.centroides):
+            grossas = distancias(self.centroides, self._projetar(consulta), 'l2')
+            escolhidas = np.argpartition(grossas, sondas - 1)[:sondas]
+        else:
+            escolhidas = range(len(self.centroides))
+
+        candidatos = np.concatenate([membros[i] for i in escolhidas])
+        candidatos = candidatos[vivos[candidatos]]
+        if len(candidatos) == 0:
+            return []
+
+        dist = distancias(self.vetores[candidatos], consulta, self.metrica)
+        ordem = np.argsort(dist)
+        resultado, vistos = [], set()
+        for i in ordem:
+            rotulo = int(self.rotulos[candidatos[i]])
+            if rotulo in vistos:
+                continue
+            vistos.add(rotulo)
+            resultado.append((rotulo, float(dist[i])))
+            if len(resultado) == k:
+                break
+        return resultado
+
+    # ----- persistência -----
+
+    def salvar(self, caminho=INDICE_PATH):
+        """Vetores num .npy à parte (aberto com mmap no carregar), depois o .npz que aponta para ele"""
+        caminho = Path(caminho)
+        vetores = _caminho_vetores(caminho, self.versao)
+        temporario = vetores.with_name(f".{vetores.stem}.tmp.npy")
+        _gravar_npy_em_blocos(temporario, self.vetores)
+        os.replace(temporario, vetores)
+
+        temporario = caminho.with_name(f".{caminho.stem}.tmp.npz")
+        np.savez(
+            temporario,
+            metrica=np.array(self.metrica),
+            sondas=np.array(self.sondas),
+            versao=np.array(self.versao or ''),
+            semente=np.array(self.semente),
+            vetores=np.array(vetores.name),
+            centroides=self.centroides,
+            rotulos=self.rotulos,
+            listas=self.listas,
+        )
+        os.replace(temporario, caminho)
+
+        # Vetores de gravações anteriores (quem ainda os mapeia mantém a cópia aberta)
+        for antigo in caminho.parent.glob(f"{caminho.stem}.*.npy"):
+            if antigo != vetores:
+                try:
+                    antigo.unlink()
+                except OSError:
+                    pass    # Windows: ainda mapeado por um processo; sai na próxima gravação
+
+    @classmethod
+    def carregar(cls, caminho=INDICE_PATH, removidos_path=REMOVIDOS_PATH):
+        caminho = Path(caminho)
+        with np.load(caminho) as dados:
+            indice = cls(str(dados['metrica']), int(dados['sondas']))
+            indice.versao = str(dados['versao']) or None
+            indice.semente = int(dados['semente'])
+            indice.centroides = dados['centroides']
+            indice.rotulos = dados['rotulos']
+            indice.listas = dados['listas']
+            vetores = dados['vetores']
+        if vetores.ndim:
+            indice.vetores = vetores    # formato antigo: vetores dentro do .npz
+        else:
+            vetores = caminho.with_name(str(vetores))
+            # Só as linhas dos candidatos de cada busca saem do disco
+            indice.vetores = np.load(vetores, mmap_mode='r')
+            if len(indice.vetores) != len(indice.rotulos):
+                raise ValueError(f"{vetores}: {len(indice.vetores)} vetores para {len(indice.rotulos)} rotulos")
+        indice._criar_projecao(indice.vetores.shape[1])
+        indice.removidos = ler_removidos(removidos_path)
+        indice._reindexar()
+        return indice
+
+
+class ReconhecedorIndexado:
+    """Reconhecedor cujo predict passa pelo índice em vez da busca exaustiva"""
+
+    def __init__(self, base, indice):
+        self.base = base
+        self.indice = indice
+        self.nome = base.nome
+        self.limiares = base.limiares
+
+    def predict(self, face):
+        resultado = self.indice.buscar(self.base.extrair_vetor(face), k=1)
+        if not resultado:
+            return -1, float('inf')
+        return resultado[0]
+
+    def predict_varios(self, faces):
+        return [self.predict(face) for face in faces]
+
+    def definir_removidos(self, removidos):
+        self.indice.definir_removidos(removidos)
+
+    def tamanho_galeria(self):
+        return len(self.indice)
@@ -0,0 +1,282 @@
+"""
+LBPH em NumPy: extração dos histogramas e busca exata em lote.
+
+O cv2.face.LBPHFaceRecognizer prediz uma face por chamada e só devolve o
+vizinho mais próximo. Aqui:
+
+- histogramas() calcula o LBP estendido e o histograma espacial de várias
+  faces de uma vez, bit a bit iguais aos do OpenCV (mesma interpolação em
+  float32, mesma normalização por célula);
+- GaleriaLBPH guarda os histogramas como uma matriz contígua D x N no
+  snapshot binário (trainer.snap, snapshot.py, aberto com mmap) e compara
+  todas as faces do frame numa passada por ela, devolvendo os k clientes
+  mais próximos.
+
+A distância é o mesmo chi-quadrado (HISTCMP_CHISQR_ALT) do LBPH, reescrito
+para usar só os bins não nulos da consulta:
+
+    sum (g - q)^2 / (g + q) = sum g + sum q - 4 * sum_{q>0} q*g / (g + q)
+
+As somas de cada amostra ficam gravadas; o resto é uma divisão e um
+produto matriz-vetor sobre as linhas não nulas (de 1/4 a metade:
+histogramas do LBP são esparsos), em blocos que cabem no cache. Difere do OpenCV só no arredondamento (float32 contra double).
+
+Com fragmentos > 1 as colunas são gravadas agrupadas por fragmento
+(client_id % fragmentos): cada fragmento é uma faixa contígua da matriz,
+buscada em paralelo pelo fragmentos.py.
+"""
+import cv2
+import numpy as np
+
+from academia.reconhecimento.indice import VetoresEmDisco, LINHAS_POR_BLOCO
+from academia.reconhecimento.snapshot import (
+    gravar_snapshot, ler_snapshot, tabela_clientes, SNAPSHOT_PATH,
+)
+
+COLUNAS_POR_BLOCO = 1024    # amostras por passada pela matriz
+LINHAS_POR_PASSADA = 64     # bins por bloco da divisão
+EPS_FLOAT = np.finfo(np.float32).eps
+
+
+# ============================================================
+# EXTRACAO (igual ao lbph_faces.cpp do opencv_contrib)
+# ============================================================
+
+def _vizinhanca(raio, vizinhos):
+    """Deslocamentos e pesos da interpolação bilinear de cada vizinho, em float32"""
+    pontos = []
+    for n in range(vizinhos):
+        # O ângulo é double no OpenCV; só x e y viram float
+        x = np.float32(raio * np.cos(2.0 * np.pi * n / vizinhos))
+        y = np.float32(-raio * np.sin(2.0 * np.pi * n / vizinhos))
+        fx, fy = int(np.floor(x)), int(np.floor(y))
+        cx, cy = int(np.ceil(x)), int(np.ceil(y))
+        tx, ty = np.float32(x - fx), np.float32(y - fy)
+        um = np.float32(1)
+        pesos = ((um - tx) * (um - ty), tx * (um - ty), (um - tx) * ty, tx * ty)
+        pontos.append(((fy, fx), (fy, cx), (cy, fx), (cy, cx), pesos))
+    return pontos
+
+
+def imagens_lbp(faces, raio=1, vizinhos=8):
+    """Códigos LBP (B x (H-2r) x (W-2r) int32) de um lote de faces B x H x W uint8"""
+    faces = np.asarray(faces, dtype=np.float32)
+    _, altura, largura = faces.shape
+    centro = faces[:, raio:altura - raio, raio:largura - raio]
+    codigos = np.zeros(centro.shape, dtype=np.int32)
+
+    def deslocada(dy, dx):
+        return faces[:, raio + dy:altura - raio + dy, raio + dx:largura - raio + dx]
+
+    for n, (*pontos, pesos) in enumerate(_vizinhanca(raio, vizinhos)):
+        # Mesma ordem de soma do C++ (o arredondamento decide os empates);
+        # peso 0 não muda a soma e fica de fora (vizinhos nos eixos)
+        termos = [(peso, ponto) for peso, ponto in zip(pesos, pontos) if peso != 0]
+        if len(termos) == 1 and termos[0][0] == 1:
+            t = deslocada(*termos[0][1])
+        else:
+            t = termos[0][0] * deslocada(*termos[0][1])
+            for peso, ponto in termos[1:]:
+                t += peso * deslocada(*ponto)
+        # t > centro ou |t - centro| < eps, numa comparação só
+        bit = (t - centro) > -EPS_FLOAT
+        codigos |= bit.astype(np.int32) << n
+    return codigos
+
+
+def histogramas(faces, raio=1, vizinhos=8, grade_x=8, grade_y=8):
+    """Histogramas espaciais (B x grade*grade*2^vizinhos float32) iguais ao getHistograms()"""
+    codigos = imagens_lbp(faces, raio, vizinhos)
+    lote, altura, largura = codigos.shape
+    padroes = 2 ** vizinhos
+    alt_celula, larg_celula = altura // grade_y, largura // grade_x
+    celulas = grade_x * grade_y
+
+    # Sobra da divisão em células fica de fora, como no spatial_histogram
+    codigos = codigos[:, :alt_celula * grade_y, :larg_celula * grade_x]
+    codigos = codigos.reshape(lote, grade_y, alt_celula, grade_x, larg_celula).transpose(0, 1, 3, 2, 4)
+    codigos = codigos.reshape(lote, celulas, alt_celula * larg_celula)
+    deslocamento = (np.arange(lote)[:, None] * celulas + np.arange(celulas)[None, :]) * padroes
+    contagem = np.bincount((codigos + deslocamento[:, :, None]).ravel(), minlength=lote * celulas * padroes)
+    return contagem.reshape(lote, celulas * padroes).astype(np.float32) * np.float32(1.0 / (alt_celula * larg_celula))
+
+
+# ============================================================
+# GALERIA
+# ============================================================
+
+class GaleriaLBPH:
+    """Histogramas da galeria (D x N, mmap) com busca exata em lote"""
+
+    def __init__(self, matriz, rotulos, somas, parametros, versao=None, fragmentos=None, limiares=None):
+        self.matriz = matriz
+        self.rotulos = np.asarray(rotulos, dtype=np.int32)
+        self.somas = np.asarray(somas, dtype=np.float64)
+        self.parametros = parametros
+        self.versao = versao
+        # Faixas [inicio, fim) de colunas de cada fragmento
+        self.fragmentos = fragmentos or [[0, len(self.rotulos)]]
+        # Calibrados no treino (parametros.json); None = CONFIDENCE_* do reconhece.py
+        self.limiares = tuple(limiares) if limiares else None
+        self.removidos = set()
+        self._vivos = np.ones(len(self.rotulos), dtype=bool)
+
+    def __len__(self):
+        return int(self._vivos.sum())
+
+    # ----- persistência -----
+
+    @staticmethod
+    def salvar(caminho, vetores, rotulos, parametros, versao=None, fragmentos=1, **cabecalho):
+        """
+        Grava `vetores` (N x D: array, protótipos float16 ou VetoresEmDisco)
+        transpostos num snapshot, com rótulos e somas. Escreve aos blocos
+        direto no arquivo: a matriz inteira nunca passa pela memória. Com
+        fragmentos > 1 as amostras de cada fragmento ficam em colunas vizinhas.
+        """
+        rotulos = np.asarray(rotulos, dtype=np.int32)
+        if isinstance(vetores, VetoresEmDisco):
+            blocos, tipo = vetores.blocos, np.float32
+        else:
+            tipo = np.float16 if vetores.dtype == np.float16 else np.float32
+            blocos = lambda: ((i, vetores[i:i + LINHAS_POR_BLOCO]) for i in range(0, len(vetores), LINHAS_POR_BLOCO))
+
+        # Estável: dentro do fragmento as amostras mantêm a ordem do treino
+        fragmento = rotulos % fragmentos
+        ordem = np.argsort(fragmento, kind='stable')
+        posicao = np.empty_like(ordem)
+        posicao[ordem] = np.arange(len(ordem))
+        limites = np.searchsorted(fragmento[ordem], np.arange(fragmentos + 1))
+        faixas = [[int(a), int(b)] for a, b in zip(limites[:-1], limites[1:])]
+        somas = np.zeros(len(rotulos), dtype=np.float64)
+
+        def preencher(matriz):
+            for inicio, bloco in blocos():
+                destino = posicao[inicio:inicio + len(bloco)] if fragmentos > 1 else slice(inicio, inicio + len(bloco))
+                matriz[:, destino] = bloco.T
+                somas[destino] = bloco.sum(axis=1, dtype=np.float64)
+
+        gravar_snapshot(caminho, 'lbph', {
+            'galeria': (tipo, (vetores.shape[1], len(rotulos)), preencher),
+            'somas': (np.float64, somas.shape, lambda destino: np.copyto(destino, somas)),
+            'rotulos': rotulos[ordem],
+        }, versao=versao, parametros=parametros, clientes=tabela_clientes(rotulos),
+            fragmentos=faixas, **cabecalho)
+
+    @classmethod
+    def carregar(cls, caminho=SNAPSHOT_PATH, mmap=True):
+        snapshot = ler_snapshot(caminho, mmap)
+        if snapshot.backend != 'lbph':
+            raise ValueError(f"{caminho}: snapshot do backend {snapshot.backend}, nao lbph")
+        arrays = snapshot.arrays
+        return cls(arrays['galeria'], arrays['rotulos'], arrays['somas'],
+                   snapshot.cabecalho['parametros'], snapshot.versao,
+                   snapshot.cabecalho.get('fragmentos'), snapshot.cabecalho.get('limiares'))
+
+    def fragmento(self, i):
+        """Galeria só com as colunas do fragmento i (views, sem cópia)"""
+        inicio, fim = self.fragmentos[i]
+        parte = GaleriaLBPH(self.matriz[:, inicio:fim], self.rotulos[inicio:fim], self.somas[inicio:fim],
+                            self.parametros, self.versao, limiares=self.limiares)
+        parte.removidos = self.removidos
+        parte._vivos = self._vivos[inicio:fim]
+        return parte
+
+    # ----- busca -----
+
+    def definir_removidos(self, removidos):
+        self.removidos = set(removidos)
+        self._vivos = ~np.isin(self.rotulos, list(self.removidos))
+
+    def extrair(self, faces):
+        """Histogramas das faces (200x200, reduzidas para o tamanho_face do modelo)"""
+        p = self.parametros
+        lado = p['tamanho_face']
+        faces = [face if face.shape == (lado, lado) else cv2.resize(face, (lado, lado), interpolation=cv2.INTER_AREA)
+                 for face in faces]
+        return histogramas(np.stack(faces), p['raio'], p['vizinhos'], p['grade'], p['grade'])
+
+    def distancias(self, consultas):
+        """Chi-quadrado (Q x N float64) de cada consulta até cada amostra"""
+        consultas = np.asarray(consultas, dtype=np.float32)
+        n = self.matriz.shape[1]
+        resultado = np.empty((len(consultas), n), dtype=np.float64)
+        nao_nulos = [np.flatnonzero(q) for q in consultas]
+        somas_consultas = consultas.sum(axis=1, dtype=np.float64)
+        # Blocos de LINHAS_POR_PASSADA x COLUNAS_POR_BLOCO cabem no cache:
+        # sem isso o temporário da divisão domina o tempo
+        for inicio in range(0, n, COLUNAS_POR_BLOCO):
+            fim = min(n, inicio + COLUNAS_POR_BLOCO)
+            colunas = self.matriz[:, inicio:fim]
+            for i, nz in enumerate(nao_nulos):
+                parcial = np.zeros(fim - inicio, dtype=np.float32)
+                for linha in range(0, len(nz), LINHAS_POR_PASSADA):
+                    linhas = nz[linha:linha + LINHAS_POR_PASSADA]
+                    q = consultas[i, linhas]
+                    g = np.asarray(colunas[linhas], dtype=np.float32)   # float16 (protótipos) vira float32
+                    soma = g + q[:, None]
+                    np.divide(g, soma, out=soma)
+                    parcial += q @ soma
+                resultado[i, inicio:fim] = parcial
+
+        resultado *= -4
+        resultado += self.somas[None, :]
+        resultado += somas_consultas[:, None]
+        np.maximum(resultado, 0, out=resultado)
+        resultado *= 2
+        return resultado
+
+    def buscar(self, consultas, k=1):
+        """Para cada consulta, [(client_id, distancia)] dos k clientes mais próximos"""
+        dist = self.distancias(consultas)
+        dist[:, ~self._vivos] = np.inf
+        resultados = []
+        for linha in dist:
+            if k == 1:
+                # argmin pega o primeiro empate, como o `<` estrito do OpenCV
+                j = int(np.argmin(linha))
+                resultados.append([(int(self.rotulos[j]), float(linha[j]))] if np.isfinite(linha[j]) else [])
+                continue
+            melhores, vistos = [], set()
+            for j in np.argsort(linha, kind='stable'):
+                rotulo = int(self.rotulos[j])
+                if not np.isfinite(linha[j]) or len(melhores) == k:
+                    break
+                if rotulo not in vistos:
+                    vistos.add(rotulo)
+                    melhores.append((rotulo, float(linha[j])))
+            resultados.append(melhores)
+        return resultados
+
+
+class ReconhecedorVetorizado:
+    """Reconhecedor LBPH cujo predict passa pela GaleriaLBPH (mesmo resultado, em lote)"""
+
+    nome = 'lbph'
+
+    def __init__(self, galeria):
+        self.galeria = galeria
+        # Os do modelo (cabeçalho do snapshot); None = CONFIDENCE_* do reconhece.py
+        self.limiares = galeria.limiares
+
+    def predict(self, face):
+        return self.predict_varios([face])[0]
+
+    def predict_varios(self, faces):
+        """(client_id, distancia) de cada face, todas numa passada pela galeria"""
+        return [r[0] if r else (-1, float('inf')) for r in self.buscar_varios(faces, k=1)]
+
+    def buscar_varios(self, faces, k=5):
+        """Os k clientes mais próximos de cada face: [[(client_id, distancia), ...], ...]"""
+        if not len(faces):
+            return []
+        return self.galeria.buscar(self.galeria.extrair(faces), k=k)
+
+    def extrair_vetor(self, face):
+        return self.galeria.extrair([face])[0]
+
+    def definir_removidos(self, removidos):
+        self.galeria.definir_removidos(removidos)
+
+    def tamanho_galeria(self):
+        return len(self.galeria)
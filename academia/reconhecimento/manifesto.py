@@ -0,0 +1,209 @@
+"""
+Manifesto do dataset e cache das amostras pré-processadas.
+
+O manifesto publicado com o modelo (trainer.manifesto.json) guarda, para
+cada foto '<id>/<arquivo>.jpg', [tamanho, mtime_ns, hash do conteúdo]. Na
+varredura só as fotos com tamanho/mtime diferentes são relidas para o hash;
+uma foto só conta como alterada se o conteúdo mudou.
+
+O cache fica em cache_amostras/: por cliente, <id>.npy com as faces
+200x200 já prontas (aberto com mmap) e <id>.json com o hash e o veredito
+de qualidade de cada foto. O treina.py só decodifica/analisa o que não
+está no cache; com orçamento de memória as amostras saem do cache em
+blocos (ler_amostras_em_blocos).
+
+Sem Django: usado pelo treina.py e pela view treinar_modelo.
+"""
+import os
+import json
+import hashlib
+from pathlib import Path
+
+import numpy as np
+
+from academia.reconhecimento.modelo import (
+    RECONHECIMENTO_DIR, TRAINER_PATH, ler_metadados, ler_manifesto,
+)
+from academia.reconhecimento.reconhecedores import BACKENDS, BACKEND_PADRAO
+from academia.reconhecimento.parametros import parametros_do_backend, ler_limiares, PADRAO_LBPH
+
+DATASET_DIR = RECONHECIMENTO_DIR.parent.parent / 'dataset'
+CACHE_DIR = RECONHECIMENTO_DIR / 'cache_amostras'
+
+
+def hash_arquivo(caminho):
+    h = hashlib.blake2b(digest_size=16)
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def escanear_dataset(dataset_dir=DATASET_DIR, anterior=None):
+    """
+    {'<id>/<foto>.jpg': [tamanho, mtime_ns, hash]} de todas as fotos.
+    Reaproveita o hash do manifesto anterior quando tamanho e mtime batem.
+    """
+    anterior = anterior if anterior is not None else ler_manifesto().get('arquivos', {})
+    arquivos = {}
+    dataset_dir = Path(dataset_dir)
+    if not dataset_dir.exists():
+        return arquivos
+    for pasta_cliente in dataset_dir.iterdir():
+        if not pasta_cliente.is_dir() or not pasta_cliente.name.isdigit():
+            continue
+        for img_file in pasta_cliente.glob('*.jpg'):
+            chave = f"{pasta_cliente.name}/{img_file.name}"
+            st = img_file.stat()
+            registro = anterior.get(chave)
+            if registro and len(registro) >= 3 and registro[:2] == [st.st_size, st.st_mtime_ns]:
+                digest = registro[2]
+            else:
+                digest = hash_arquivo(img_file)
+            arquivos[chave] = [st.st_size, st.st_mtime_ns, digest]
+    return arquivos
+
+
+def _mesmo_conteudo(antes, agora):
+    if len(antes) >= 3:
+        return antes[2] == agora[2]
+    # Manifesto antigo, sem hash: compara tamanho e mtime
+    return antes[:2] == agora[:2]
+
+
+def decidir_modo(arquivos_atuais, backend, completo=False, trainer_path=TRAINER_PATH, prototipos=None,
+                 fragmentos=1):
+    """
+    ('completo' | 'incremental' | 'nada', motivo, fotos novas).
+    `prototipos` = {'por_cliente', 'metodo'} da galeria compacta, ou None.
+    `fragmentos` = divisão do snapshot do LBPH para a busca paralela.
+    """
+    if completo:
+        return 'completo', 'forcado por --completo', None
+    if not BACKENDS[backend].suporta_prototipos:
+        prototipos = None
+
+    metadados = ler_metadados()
+    manifesto = ler_manifesto()
+    if not Path(trainer_path).exists() or not manifesto:
+        return 'completo', 'sem modelo anterior', None
+    if manifesto.get('versao') != metadados.get('versao'):
+        return 'completo', 'manifesto de outra versao do modelo', None
+    if metadados.get('backend', BACKEND_PADRAO) != backend:
+        return 'completo', f"backend mudou ({metadados.get('backend', BACKEND_PADRAO)} -> {backend})", None
+    # Modelos anteriores à varredura de parâmetros foram treinados com o padrão
+    parametros = parametros_do_backend(backend)
+    if parametros and metadados.get('parametros', PADRAO_LBPH) != parametros:
+        return 'completo', 'parametros do LBPH mudaram (parametros.json)', None
+    limiares = ler_limiares(backend)
+    if metadados.get('limiares') != (list(limiares) if limiares else None):
+        return 'completo', 'limiares calibrados mudaram (parametros.json)', None
+    if (metadados.get('prototipos') or {}).get('config') != prototipos:
+        return 'completo', 'compactacao da galeria mudou (prototipos por cliente)', None
+    if backend == 'lbph' and (metadados.get('fragmentos') or 1) != fragmentos:
+        return 'completo', f"fragmentos da galeria mudaram ({metadados.get('fragmentos') or 1} -> {fragmentos})", None
+
+    anteriores = manifesto.get('arquivos', {})
+    removidos = anteriores.keys() - arquivos_atuais.keys()
+    alterados = [k for k in anteriores.keys() & arquivos_atuais.keys()
+                 if not _mesmo_conteudo(anteriores[k], arquivos_atuais[k])]
+    novos = arquivos_atuais.keys() - anteriores.keys()
+
+    if not (removidos or alterados or novos):
+        return 'nada', 'nenhuma foto nova, removida ou alterada', None
+    if removidos or alterados:
+        # O LBPH não "esquece" amostras: só um treino novo remove
+        return 'completo', f'{len(removidos)} foto(s) removida(s), {len(alterados)} alterada(s)', None
+    if not BACKENDS[backend].suporta_update:
+        return 'completo', f'backend {backend} nao suporta update()', None
+    if prototipos:
+        # update() juntaria fotos cruas aos protótipos; o cache deixa o completo barato
+        return 'completo', f'{len(novos)} foto(s) nova(s) numa galeria compacta', None
+    return 'incremental', f'{len(novos)} foto(s) nova(s)', novos
+
+
+# ----- cache de amostras por cliente -----
+
+def _caminhos_cache(client_id):
+    return CACHE_DIR / f"{client_id}.npy", CACHE_DIR / f"{client_id}.json"
+
+
+def ler_cache_cliente(client_id):
+    """
+    ({arquivo: {'hash', 'qualidade', 'linha'}}, amostras) do cliente.
+    `amostras` é um memmap (N, 200, 200) uint8 ou None.
+    """
+    npy, meta = _caminhos_cache(client_id)
+    try:
+        with open(meta, encoding='utf-8') as f:
+            entradas = json.load(f)
+        amostras = np.load(npy, mmap_mode='r') if npy.exists() else None
+    except (OSError, ValueError):
+        return {}, None
+    return entradas, amostras
+
+
+def gravar_cache_cliente(client_id, registros):
+    """registros: [(arquivo, hash, qualidade, face 200x200 ou None)]"""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    npy, meta = _caminhos_cache(client_id)
+
+    entradas = {}
+    faces = []
+    for arquivo, digest, qualidade, face in registros:
+        linha = None
+        if face is not None:
+            linha = len(faces)
+            faces.append(face)
+        entradas[arquivo] = {'hash': digest, 'qualidade': qualidade, 'linha': linha}
+
+    temporario = npy.with_name(f".{npy.stem}.tmp.npy")
+    if faces:
+        np.save(temporario, np.stack(faces).astype(np.uint8))
+        os.replace(temporario, npy)
+    else:
+        npy.unlink(missing_ok=True)
+
+    temporario = meta.with_name(f".{meta.name}.tmp")
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(entradas, f)
+    os.replace(temporario, meta)
+
+
+def limpar_cache(clientes_existentes):
+    """Apaga o cache de clientes que não estão mais no dataset"""
+    if not CACHE_DIR.exists():
+        return
+    for arquivo in CACHE_DIR.glob('*.json'):
+        if arquivo.stem.isdigit() and int(arquivo.stem) not in clientes_existentes:
+            arquivo.unlink(missing_ok=True)
+            (CACHE_DIR / f"{arquivo.stem}.npy").unlink(missing_ok=True)
+
+
+def ler_amostras_em_blocos(arquivos, clientes, tamanho_bloco):
+    """
+    Gera (faces K x 200 x 200 uint8, rotulos K), K <= tamanho_bloco, com as
+    fotos válidas de `arquivos` lidas do cache dos `clientes`. Cada bloco é
+    uma cópia e o memmap de um cliente é solto antes do próximo.
+    """
+    por_cliente = {}
+    for chave in arquivos:
+        client_id, nome_arquivo = chave.split('/', 1)
+        por_cliente.setdefault(int(client_id), []).append(nome_arquivo)
+
+    faces, rotulos = [], []
+    for client_id in sorted(clientes):
+        entradas, amostras = ler_cache_cliente(client_id)
+        linhas = sorted(
+            entradas[nome_arquivo]['linha'] for nome_arquivo in por_cliente.get(client_id, [])
+            if nome_arquivo in entradas and entradas[nome_arquivo]['linha'] is not None
+        )
+        for linha in linhas:
+            faces.append(np.array(amostras[linha]))
+            rotulos.append(client_id)
+            if len(faces) == tamanho_bloco:
+                yield np.stack(faces), np.array(rotulos, dtype=np.int32)
+                faces, rotulos = [], []
+        del amostras
+    if faces:
+        yield np.stack(faces), np.array(rotulos, dtype=np.int32)
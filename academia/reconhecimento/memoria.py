@@ -0,0 +1,60 @@
+"""
+Medição de memória do processo (RSS) sem dependências extras: resource no
+Linux/macOS, GetProcessMemoryInfo (psapi) no Windows.
+"""
+import os
+import sys
+
+MB = 1024 * 1024
+
+
+def _contadores_windows():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    contadores = PROCESS_MEMORY_COUNTERS()
+    contadores.cb = ctypes.sizeof(contadores)
+    processo = ctypes.windll.kernel32.GetCurrentProcess()
+    ctypes.windll.psapi.GetProcessMemoryInfo(processo, ctypes.byref(contadores), contadores.cb)
+    return contadores
+
+
+def _maxrss_bytes(quem):
+    import resource
+    valor = resource.getrusage(quem).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return valor if sys.platform == 'darwin' else valor * 1024
+
+
+def pico_rss():
+    """Maior RSS (bytes) do processo até agora"""
+    if sys.platform == 'win32':
+        return _contadores_windows().PeakWorkingSetSize
+    import resource
+    return _maxrss_bytes(resource.RUSAGE_SELF)
+
+
+def rss_atual():
+    """RSS (bytes) agora; sem /proc cai no pico"""
+    if sys.platform == 'win32':
+        return _contadores_windows().WorkingSetSize
+    try:
+        with open('/proc/self/statm') as f:
+            paginas = int(f.read().split()[1])
+        return paginas * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return pico_rss()
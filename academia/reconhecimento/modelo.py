@@ -0,0 +1,305 @@
+"""
+Persistência e recarga do modelo de reconhecimento.
+
+O treino grava cada modelo como uma versão em modelos/ e só então troca o
+trainer.yml de forma atômica (os.replace), junto com trainer.json
+(metadados da versão). O reconhecimento usa ModeloRecarregavel: uma
+thread observa o trainer.yml, carrega a versão nova em background e troca
+a referência entre frames, sem parar a câmera.
+
+O LBPH também é publicado como snapshot binário (trainer.snap,
+snapshot.py). Com snapshot da mesma versão o reconhecimento nem lê o
+trainer.yml: mapeia o arquivo e usa a busca exata em lote
+(lbph_vetorizado.py). Acima de MAX_AMOSTRAS_BUSCA_EXATA amostras, ou sem
+snapshot, o predict passa pelo índice IVF (indice.py), se houver; com
+snapshot o IVF extrai as consultas pela galeria dele, ainda sem o YAML.
+Snapshot gravado em fragmentos é buscado em paralelo (fragmentos.py); aí o
+limite vale por fragmento. Lápides novas (cliente removido) são aplicadas sem
+recarregar nada.
+"""
+import os
+import json
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+
+from academia.reconhecimento.reconhecedores import carregar_reconhecedor
+from academia.reconhecimento.indice import (
+    IndiceIVF, ReconhecedorIndexado, ler_removidos, INDICE_PATH, REMOVIDOS_PATH,
+)
+from academia.reconhecimento.lbph_vetorizado import GaleriaLBPH, ReconhecedorVetorizado
+from academia.reconhecimento.fragmentos import ReconhecedorFragmentado, encerrar_pool
+from academia.reconhecimento.snapshot import hash_manifesto, SNAPSHOT_PATH
+
+RECONHECIMENTO_DIR = Path(__file__).resolve().parent
+TRAINER_PATH = RECONHECIMENTO_DIR / 'trainer.yml'
+METADADOS_PATH = RECONHECIMENTO_DIR / 'trainer.json'
+# Fotos que entraram no modelo publicado (treino incremental do treina.py)
+MANIFESTO_PATH = RECONHECIMENTO_DIR / 'trainer.manifesto.json'
+MODELOS_DIR = RECONHECIMENTO_DIR / 'modelos'
+MAX_VERSOES = 5
+INTERVALO_OBSERVADOR = 2  # segundos
+# Acima disso a busca exata perde para o IVF (que é aproximado)
+MAX_AMOSTRAS_BUSCA_EXATA = 20000
+
+
+def carregar_modelo(caminho=TRAINER_PATH):
+    # O backend (lbph, fisher, embeddings) vem do próprio arquivo
+    recognizer = carregar_reconhecedor(caminho)
+    if Path(caminho).resolve() == TRAINER_PATH:
+        # Limiares calibrados no treino ficam nos metadados da versão publicada
+        limiares = ler_metadados().get('limiares')
+        if limiares:
+            recognizer.limiares = tuple(limiares)
+    return recognizer
+
+
+def _ler_json(caminho):
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def ler_metadados():
+    return _ler_json(METADADOS_PATH)
+
+
+def ler_manifesto():
+    return _ler_json(MANIFESTO_PATH)
+
+
+def _escrever_atomico(destino, escrever):
+    """Escreve em arquivo temporário no mesmo diretório e troca com os.replace"""
+    temporario = destino.with_name(f".{destino.name}.tmp")
+    escrever(temporario)
+    os.replace(temporario, destino)
+
+
+def salvar_modelo(recognizer, indice=None, manifesto=None, galeria=None, fragmentos=1, **metadados):
+    """
+    Grava uma nova versão e publica como trainer.yml; devolve a versão.
+    `galeria` = (vetores, rotulos) do LBPH, publicados como snapshot binário
+    dividido em `fragmentos`. Os `limiares` calibrados (metadados) também
+    vão no cabeçalho do snapshot.
+    """
+    MODELOS_DIR.mkdir(parents=True, exist_ok=True)
+    versao = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    snapshot = MODELOS_DIR / f"trainer-{versao}.yml"
+    recognizer.write(str(snapshot))
+
+    # Índice antes do modelo: quem recarregar o trainer.yml já o encontra
+    if indice is not None:
+        indice.versao = versao
+        indice.salvar(INDICE_PATH)
+        # O índice salvo já não tem os clientes removidos (treino completo
+        # ou compactado no incremental)
+        REMOVIDOS_PATH.unlink(missing_ok=True)
+
+    if galeria is not None:
+        vetores, rotulos = galeria
+        GaleriaLBPH.salvar(SNAPSHOT_PATH, vetores, rotulos, recognizer.parametros(), versao,
+                           fragmentos=fragmentos, manifesto=hash_manifesto(manifesto),
+                           limiares=metadados.get('limiares'))
+        REMOVIDOS_PATH.unlink(missing_ok=True)
+    else:
+        # Snapshot de um modelo anterior (ex. outro backend) não vale mais
+        SNAPSHOT_PATH.unlink(missing_ok=True)
+
+    _escrever_atomico(TRAINER_PATH, lambda tmp: shutil.copyfile(snapshot, tmp))
+
+    dados = {
+        'versao': versao,
+        'arquivo': str(snapshot.relative_to(RECONHECIMENTO_DIR)),
+        'criado_em': datetime.now().isoformat(timespec='seconds'),
+        'fragmentos': fragmentos if galeria is not None else None,
+        **metadados,
+    }
+
+    def escrever_json(conteudo):
+        def escrever(tmp):
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(conteudo, f, indent=2, ensure_ascii=False)
+        return escrever
+
+    if manifesto is not None:
+        _escrever_atomico(MANIFESTO_PATH, escrever_json({**manifesto, 'versao': versao}))
+    _escrever_atomico(METADADOS_PATH, escrever_json(dados))
+
+    # Mantém só as últimas versões
+    versoes = sorted(MODELOS_DIR.glob('trainer-*.yml'))
+    for antiga in versoes[:-MAX_VERSOES]:
+        antiga.unlink(missing_ok=True)
+
+    return versao
+
+
+def _assinatura(caminho):
+    try:
+        st = os.stat(caminho)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+class ModeloRecarregavel:
+    """
+    Guarda o modelo em uso e troca por uma versão nova quando o
+    trainer.yml muda. Quem usa pega `atual()` uma vez por frame, então um
+    frame nunca mistura dois modelos.
+    """
+
+    def __init__(self, caminho=TRAINER_PATH, intervalo=INTERVALO_OBSERVADOR):
+        self.caminho = Path(caminho)
+        self.intervalo = intervalo
+        self._assinatura = _assinatura(self.caminho)
+        self.versao = ler_metadados().get('versao', 'desconhecida')
+        self._assinatura_indice = None
+        # Com snapshot da mesma versão o trainer.yml nem é lido (_base = None)
+        self._modelo, self._base = self._montar()
+
+        self.trocas = 0
+        self.ultima_carga_ms = 0.0
+        self.ultima_troca_us = 0.0
+        self._parar = threading.Event()
+        self._thread = None
+
+    def atual(self):
+        return self._modelo
+
+    def predict(self, face):
+        return self._modelo.predict(face)
+
+    def _assinaturas(self):
+        return (_assinatura(INDICE_PATH), _assinatura(REMOVIDOS_PATH), _assinatura(SNAPSHOT_PATH))
+
+    def _carregar_snapshot(self):
+        """Busca vetorizada sobre o snapshot da mesma versão, se houver"""
+        try:
+            galeria = GaleriaLBPH.carregar(SNAPSHOT_PATH)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[AVISO] Snapshot ilegivel, usando o trainer.yml: {e}")
+            return None
+        if galeria.versao != self.versao:
+            return None
+        galeria.definir_removidos(ler_removidos(REMOVIDOS_PATH))
+        if len(galeria.fragmentos) > 1:
+            return ReconhecedorFragmentado(galeria, SNAPSHOT_PATH)
+        return ReconhecedorVetorizado(galeria)
+
+    def _carregar_indice(self):
+        """Índice IVF da mesma versão, ou None (sem ele a busca é exaustiva)"""
+        try:
+            indice = IndiceIVF.carregar(INDICE_PATH, REMOVIDOS_PATH)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[AVISO] Indice ilegivel, usando busca exaustiva: {e}")
+            return None
+        if indice.versao != self.versao:
+            # Índice de outra versão (publicação em andamento): tenta de novo
+            self._assinatura_indice = None
+            return None
+        return indice
+
+    def _montar(self, base=None):
+        """
+        (modelo em uso, modelo base). O snapshot da mesma versão dispensa o
+        trainer.yml: com galeria grande demais para a busca exata o índice
+        IVF usa o extrator do próprio snapshot. Só sem snapshot o base é lido
+        e passa pelo índice IVF da mesma versão, se houver.
+        """
+        self._assinatura_indice = self._assinaturas()
+        vetorizado = self._carregar_snapshot() if self._assinatura_indice[2] else None
+        if vetorizado:
+            # Os fragmentos são buscados ao mesmo tempo: o limite é por fragmento
+            limite = MAX_AMOSTRAS_BUSCA_EXATA * len(vetorizado.galeria.fragmentos)
+            if vetorizado.tamanho_galeria() <= limite or self._assinatura_indice[0] is None:
+                return vetorizado, base
+            indice = self._carregar_indice()
+            return (ReconhecedorIndexado(vetorizado, indice) if indice else vetorizado), base
+
+        if base is None:
+            base = carregar_modelo(self.caminho)
+        if self._assinatura_indice[0] is None:
+            if self._assinatura_indice[2]:
+                # Snapshot de outra versão (publicação em andamento): tenta de novo
+                self._assinatura_indice = None
+            return base, base
+        indice = self._carregar_indice()
+        return (ReconhecedorIndexado(base, indice) if indice else base), base
+
+    def _verificar_indice(self):
+        """Aplica lápides novas ou um índice/snapshot novo sem recarregar o modelo"""
+        assinatura = self._assinaturas()
+        if assinatura == self._assinatura_indice:
+            return False
+
+        atual = self._modelo
+        if (isinstance(atual, (ReconhecedorIndexado, ReconhecedorVetorizado, ReconhecedorFragmentado))
+                and self._assinatura_indice
+                and assinatura[0] == self._assinatura_indice[0] and assinatura[2] == self._assinatura_indice[2]):
+            removidos = ler_removidos(REMOVIDOS_PATH)
+            atual.definir_removidos(removidos)
+            self._assinatura_indice = assinatura
+            print(f"[MODELO] Lapides na galeria: {sorted(removidos)}")
+            return True
+
+        self.versao = ler_metadados().get('versao', self.versao)
+        self._modelo, self._base = self._montar(self._base)
+        if isinstance(self._modelo, ReconhecedorVetorizado):
+            print(f"[MODELO] Snapshot carregado ({self._modelo.tamanho_galeria()} amostras, busca vetorizada)")
+        elif isinstance(self._modelo, ReconhecedorFragmentado):
+            print(f"[MODELO] Snapshot carregado ({self._modelo.tamanho_galeria()} amostras em "
+                  f"{len(self._modelo.galeria.fragmentos)} fragmentos, {self._modelo.workers} processo(s))")
+        elif isinstance(self._modelo, ReconhecedorIndexado):
+            print(f"[MODELO] Indice IVF carregado ({len(self._modelo.indice)} amostras)")
+        return self._modelo is not self._base
+
+    def verificar(self):
+        """Carrega e troca o modelo se o arquivo mudou; True se trocou"""
+        assinatura = _assinatura(self.caminho)
+        if assinatura is None or assinatura == self._assinatura:
+            return self._verificar_indice()
+
+        inicio = time.perf_counter()
+        anterior, self.versao = self.versao, ler_metadados().get('versao', 'desconhecida')
+        try:
+            montado, novo = self._montar()
+        except cv2.error as e:
+            self.versao = anterior
+            print(f"[AVISO] Modelo novo ilegivel, mantendo o atual: {e}")
+            return False
+        self.ultima_carga_ms = (time.perf_counter() - inicio) * 1000
+
+        inicio_troca = time.perf_counter()
+        self._base = novo
+        self._modelo = montado     # troca atômica de referência
+        self.ultima_troca_us = (time.perf_counter() - inicio_troca) * 1e6
+
+        self._assinatura = assinatura
+        self.trocas += 1
+        origem = 'snapshot' if novo is None else 'trainer.yml'
+        print(f"[MODELO] {anterior} -> {self.versao} | carga em background ({origem}): "
+              f"{self.ultima_carga_ms:.0f} ms | troca: {self.ultima_troca_us:.1f} us")
+        return True
+
+    def _loop(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.verificar()
+            except Exception as e:
+                print(f"[AVISO] Falha ao recarregar modelo: {e}")
+
+    def iniciar_observador(self):
+        self._thread = threading.Thread(target=self._loop, name='observador-modelo', daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread:
+            self._thread.join(timeout=self.intervalo + 1)
+        encerrar_pool()
@@ -0,0 +1,174 @@
+"""
+Motor de captura comum ao coleta.py e ao captura.py.
+
+    camera -> detecção -> [qualidade] -> [filtro de duplicatas] -> [fila] -> gravador (thread)
+
+O loop da câmera só detecta e oferece o recorte: o recorte desfocado, mal
+exposto ou fora de pose é recusado com o motivo (dataset.avaliar_recorte,
+os mesmos critérios do treina.py), o hash perceptual (pHash, 64 bits)
+descarta rostos quase iguais aos já aceitos, e a codificação JPEG
+e a escrita no disco ficam numa thread separada, então a janela não trava
+esperando o disco. Sem Django: os scripts passam o diretório e o padrão do
+nome do arquivo.
+"""
+import os
+import queue
+import threading
+from collections import Counter
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from academia.reconhecimento.dataset import avaliar_recorte
+from academia.reconhecimento.fontes import EXTENSOES_IMAGEM
+
+# Distância de Hamming (em 64 bits) até a qual o recorte é duplicata.
+# Frames seguidos de um rosto parado ficam em 0-4; poses diferentes do
+# mesmo rosto passam de 10.
+DISTANCIA_DUPLICATA = 6
+TAMANHO_FILA_GRAVACAO = 64
+QUALIDADE_JPEG = 95
+
+
+def hash_perceptual(gray):
+    """pHash: sinal dos coeficientes 8x8 de baixa frequência da DCT contra a mediana"""
+    reduzida = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    coeficientes = cv2.dct(reduzida)[:8, :8].flatten()
+    bits = coeficientes > np.median(coeficientes[1:])  # sem o DC, que só mede o brilho
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def distancia_hash(a, b):
+    return bin(a ^ b).count('1')
+
+
+def gravar_imagem(caminho, imagem):
+    """Codifica e grava via arquivo temporário: o treino nunca lê um JPEG pela metade"""
+    caminho = Path(caminho)
+    ok, dados = cv2.imencode(caminho.suffix or '.jpg', imagem, [cv2.IMWRITE_JPEG_QUALITY, QUALIDADE_JPEG])
+    if not ok:
+        raise ValueError('falha ao codificar a imagem')
+    temporario = caminho.with_name(f".{caminho.name}.tmp")
+    dados.tofile(str(temporario))
+    os.replace(temporario, caminho)
+
+
+class FiltroDuplicatas:
+    """Guarda os hashes aceitos e recusa recortes próximos demais de algum deles"""
+
+    def __init__(self, distancia=DISTANCIA_DUPLICATA):
+        self.distancia = distancia
+        self.hashes = []
+
+    def carregar(self, arquivos):
+        """Fotos que já estão no dataset também contam (recaptura não repete pose)"""
+        for arquivo in arquivos:
+            gray = cv2.imread(str(arquivo), cv2.IMREAD_GRAYSCALE)
+            if gray is not None:
+                self.hashes.append(hash_perceptual(gray))
+
+    def avaliar(self, gray):
+        """(aceito, distância ao hash mais próximo); aceito já entra no filtro"""
+        h = hash_perceptual(gray)
+        mais_proximo = min((distancia_hash(h, outro) for outro in self.hashes), default=64)
+        if mais_proximo <= self.distancia:
+            return False, mais_proximo
+        self.hashes.append(h)
+        return True, mais_proximo
+
+
+class GravadorAssincrono:
+    """Thread que codifica e grava os recortes; a escrita é atômica (tmp + replace)"""
+
+    def __init__(self, tamanho_fila=TAMANHO_FILA_GRAVACAO):
+        self._fila = queue.Queue(maxsize=tamanho_fila)
+        self.salvos = 0
+        self.falhas = []
+        self._thread = threading.Thread(target=self._loop, name='gravador-capturas', daemon=True)
+        self._thread.start()
+
+    def enviar(self, caminho, imagem):
+        # Fila cheia (disco muito lento) segura a câmera em vez de perder foto aceita
+        self._fila.put((Path(caminho), imagem))
+
+    def _loop(self):
+        while True:
+            item = self._fila.get()
+            if item is None:
+                return
+            caminho, imagem = item
+            try:
+                gravar_imagem(caminho, imagem)
+                self.salvos += 1
+            except Exception as e:
+                self.falhas.append(f"{caminho.name}: {e}")
+
+    def pendentes(self):
+        return self._fila.qsize()
+
+    def fechar(self):
+        """Espera a fila esvaziar"""
+        self._fila.put(None)
+        self._thread.join()
+
+
+class MotorCaptura:
+    """
+    Recebe recortes de rosto e decide: ruim ou duplicata (descarta, com o
+    motivo) ou nova foto (numera e manda para o gravador). padrao_nome recebe o número da foto,
+    ex.: 'User.7.{n}.jpg' ou '{n:03d}.jpg'; números já usados no diretório
+    são pulados, então recapturar não sobrescreve fotos antigas.
+    """
+
+    def __init__(self, diretorio, padrao_nome, distancia=DISTANCIA_DUPLICATA, comparar_existentes=True,
+                 filtrar_qualidade=True):
+        self.diretorio = Path(diretorio)
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        self.padrao_nome = padrao_nome
+        self.filtrar_qualidade = filtrar_qualidade
+        self.filtro = FiltroDuplicatas(distancia)
+        if comparar_existentes and distancia >= 0:
+            self.filtro.carregar(self._existentes())
+        self.gravador = GravadorAssincrono()
+        self.aceitas = 0
+        self.duplicadas = 0
+        self.recusadas = Counter()  # motivo -> quantidade
+        self._numero = 0
+
+    def _existentes(self):
+        return [p for p in self.diretorio.iterdir() if p.suffix.lower() in EXTENSOES_IMAGEM]
+
+    def _proximo_caminho(self):
+        while True:
+            self._numero += 1
+            caminho = self.diretorio / self.padrao_nome.format(n=self._numero)
+            if not caminho.exists():
+                return caminho
+
+    def oferecer(self, gray):
+        """(salvo, motivo): motivo diz por que o recorte foi recusado ('' se salvo)"""
+        if self.filtrar_qualidade:
+            problemas = avaliar_recorte(gray)
+            if problemas:
+                # Sem o valor medido, para a contagem agrupar por tipo
+                self.recusadas[problemas[0].split(' (')[0]] += 1
+                return False, problemas[0]
+        aceito, distancia = self.filtro.avaliar(gray)
+        if not aceito:
+            self.duplicadas += 1
+            return False, f"Repetida (distancia {distancia}) - mude a pose"
+        # Cópia: o frame da câmera é reaproveitado antes de a thread gravar
+        self.gravador.enviar(self._proximo_caminho(), gray.copy())
+        self.aceitas += 1
+        return True, ''
+
+    def resumo_recusas(self):
+        """Linhas '[INFO] motivo: n' para o fim da captura"""
+        contagem = self.recusadas + Counter({'Repetida': self.duplicadas})
+        return [f"[INFO] Recusadas - {motivo}: {n}" for motivo, n in contagem.most_common()]
+
+    def fechar(self):
+        """Termina de gravar; devolve (salvas, falhas)"""
+        self.gravador.fechar()
+        return self.gravador.salvos, self.gravador.falhas
@@ -0,0 +1,252 @@
+import os
+import sys
+import time
+import queue
+import argparse
+import threading
+import multiprocessing as mp
+import cv2
+
+if sys.platform == 'win32':
+    import codecs
+    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
+    sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, 'strict')
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'academia.settings')
+import django
+django.setup()
+
+from academia.reconhecimento import reconhece
+from academia.reconhecimento.anel_frames import AnelFrames, processo_captura, SLOTS_PADRAO
+from academia.reconhecimento.cache_clientes import CacheClientes
+from academia.reconhecimento.pipeline import FilaDescarte, FilaEventos, ContadorEstagio
+from academia.reconhecimento.modelo import ModeloRecarregavel, TRAINER_PATH
+
+LARGURA, ALTURA = 640, 480
+
+
+class Camera:
+    """Estado de uma câmera no supervisor: anel, rastreador e estatísticas"""
+
+    def __init__(self, indice, spec, anel, analisador):
+        self.indice = indice
+        self.spec = spec
+        self.anel = anel
+        self.analisador = analisador
+        self.lock = threading.Lock()    # um worker por câmera por vez (rastreador tem estado)
+        self.fila_resultados = FilaDescarte(f'resultados-{indice}', 2)
+        self.contador = ContadorEstagio(f'inferencia-{indice}')
+        self.processo = None
+
+
+class SupervisorMulticamera:
+    """
+    Um processo de captura por câmera escrevendo em anéis de memória
+    compartilhada, um pool de threads de inferência que compartilha o
+    mesmo modelo carregado e uma tabela de cooldown única (um cliente visto
+    por duas câmeras gera um evento só).
+    """
+
+    def __init__(self, specs, modelo, cache_clientes, workers=2, slots=SLOTS_PADRAO,
+                 rastreamento=True, intervalo_deteccao=reconhece.INTERVALO_DETECCAO,
+                 render=True):
+        self.modelo = modelo
+        self.cache_clientes = cache_clientes
+        self.workers = max(1, workers)
+        self.render = render
+        # Presenças/acessos: nunca descarta (pipeline.FilaEventos)
+        self.fila_eventos = FilaEventos('eventos')
+        self.contador_efeitos = ContadorEstagio('efeitos')
+        self._parar_threads = threading.Event()
+        self._parar_captura = mp.Event()
+        self._threads = []
+
+        self.cameras = []
+        for indice, spec in enumerate(specs):
+            anel = AnelFrames(None, LARGURA, ALTURA, slots, criar=True)
+            analisador = reconhece.criar_analisador(modelo, cache_clientes,
+                                                    rastreamento, intervalo_deteccao)
+            analisador.verbose = False
+            self.cameras.append(Camera(indice, spec, anel, analisador))
+
+    # ----- processos de captura -----
+
+    def iniciar_capturas(self):
+        # Antes de qualquer thread: seguro para fork
+        for camera in self.cameras:
+            camera.processo = mp.Process(
+                target=processo_captura,
+                args=(camera.anel.nome, camera.spec, LARGURA, ALTURA,
+                      camera.anel.slots, self._parar_captura),
+                name=f'captura-{camera.indice}',
+                daemon=True,
+            )
+            camera.processo.start()
+
+    # ----- threads -----
+
+    def _worker(self):
+        while not self._parar_threads.is_set():
+            trabalhou = False
+            for camera in self.cameras:
+                if not camera.lock.acquire(blocking=False):
+                    continue
+                try:
+                    seq, view = camera.anel.ler_ultimo()
+                    if seq is None:
+                        continue
+
+                    inicio = time.perf_counter()
+                    # Copia o slot antes de analisar: a captura pode sobrescrevê-lo
+                    # e um frame rasgado confundiria o detector e o rastreador
+                    frame = view.copy()
+                    if not camera.anel.valido(seq):
+                        continue    # slot sobrescrito durante a cópia
+                    # Daqui em diante os eventos têm cooldown reservado: nunca descartar
+                    (frame, anotacoes), eventos = camera.analisador(frame)
+                    camera.contador.registrar(time.perf_counter() - inicio)
+
+                    if self.render:
+                        camera.fila_resultados.colocar((frame, anotacoes))
+                    for evento in eventos:
+                        self.fila_eventos.colocar((camera.indice, evento))
+                    trabalhou = True
+                finally:
+                    camera.lock.release()
+
+            if not trabalhou:
+                time.sleep(0.002)
+
+    def _efeitos(self):
+        while not self._parar_threads.is_set() or not self.fila_eventos.vazia():
+            try:
+                indice, evento = self.fila_eventos.obter(timeout=0.1)
+            except queue.Empty:
+                continue
+            inicio = time.perf_counter()
+            print(f"[CAMERA {indice}] Cliente {evento[0]} reconhecido")
+            try:
+                reconhece.processar_evento(evento)
+            except Exception as e:
+                print(f"[ERRO] Falha no efeito do evento {evento}: {e}")
+            self.contador_efeitos.registrar(time.perf_counter() - inicio)
+
+    def iniciar(self):
+        self.iniciar_capturas()
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'inferencia-{n}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._efeitos, name='efeitos', daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def ativo(self):
+        return not all(c.anel.finalizado() for c in self.cameras)
+
+    def parar(self):
+        self._parar_captura.set()
+        for camera in self.cameras:
+            if camera.processo:
+                camera.processo.join(timeout=3)
+        self._parar_threads.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        for camera in self.cameras:
+            camera.anel.fechar()
+
+    def estatisticas(self):
+        return {
+            'cameras': {
+                camera.indice: {
+                    'fonte': str(camera.spec),
+                    'inferencias': camera.contador.processados,
+                    'media_ms': round(camera.contador.media_ms(), 2),
+                    **camera.contador.percentis_ms(),
+                    'frames_pulados': camera.anel.pulados,
+                    'leituras_descartadas': camera.anel.descartes,
+                    'predicoes': camera.analisador.predicoes,
+                }
+                for camera in self.cameras
+            },
+            'eventos': {
+                'profundidade': self.fila_eventos.profundidade(),
+                'entradas': self.fila_eventos.entradas,
+                'descartados': self.fila_eventos.descartados,
+                'processados': self.contador_efeitos.processados,
+            },
+        }
+
+
+def reconhecimento_multicamera(specs, workers=2, rastreamento=True, janela=True):
+    if not TRAINER_PATH.exists():
+        print("ERRO: Modelo nao treinado!")
+        return
+
+    print("\n" + "="*60)
+    print(f"RECONHECIMENTO MULTICAMERA ({len(specs)} cameras, {workers} workers)")
+    print("="*60)
+    print("[INFO] Pressione 'Q' para sair\n")
+
+    # Um único modelo carregado para todas as câmeras (com recarga a quente)
+    modelo = ModeloRecarregavel(TRAINER_PATH)
+    print(f"[INFO] Modelo: versao {modelo.versao}")
+
+    cache_clientes = CacheClientes()
+    print(f"[INFO] Cache de clientes: {cache_clientes.carregar()} carregados")
+
+    supervisor = SupervisorMulticamera(specs, modelo, cache_clientes,
+                                       workers=workers, rastreamento=rastreamento,
+                                       render=janela)
+    supervisor.iniciar()
+    cache_clientes.iniciar()
+    modelo.iniciar_observador()
+
+    ultimo_log = time.time()
+    try:
+        while supervisor.ativo():
+            if janela:
+                for camera in supervisor.cameras:
+                    try:
+                        resultado = camera.fila_resultados.obter(timeout=0.01)
+                    except queue.Empty:
+                        continue
+                    frame = reconhece.desenhar_resultado(resultado)
+                    cv2.imshow(f'Reconhecimento Facial - Camera {camera.indice}', frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+            else:
+                time.sleep(0.1)
+
+            if time.time() - ultimo_log >= 10:
+                ultimo_log = time.time()
+                print(f"[SUPERVISOR] {supervisor.estatisticas()}")
+
+    except KeyboardInterrupt:
+        print("\n[INFO] Interrompido")
+
+    finally:
+        supervisor.parar()
+        cache_clientes.parar()
+        modelo.parar()
+        reconhece.escritor_presencas.parar()
+        if janela:
+            cv2.destroyAllWindows()
+        print(f"[SUPERVISOR] {supervisor.estatisticas()}")
+        print("\n[INFO] Cameras fechadas\n")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cameras', nargs='+', default=['0'],
+                        help='Indices de webcam, videos ou pastas (um por entrada)')
+    parser.add_argument('--workers', type=int, default=2,
+                        help='Threads de inferencia compartilhando o modelo')
+    parser.add_argument('--sem-rastreamento', action='store_true')
+    parser.add_argument('--sem-janela', action='store_true')
+    args = parser.parse_args()
+
+    reconhecimento_multicamera(args.cameras, workers=args.workers,
+                               rastreamento=not args.sem_rastreamento,
+                               janela=not args.sem_janela)
@@ -0,0 +1,88 @@
+"""
+Ponto de operação do LBPH: tamanho do recorte, raio, vizinhos e grade.
+
+O padrão é o do OpenCV sobre a face 200x200. O varredura.py mede outras
+combinações e grava a escolhida em parametros.json; o treina.py cria o
+reconhecedor com ela e o modelo guarda os valores, então o reconhecimento
+sempre usa os do modelo carregado (mudar o arquivo pede um treino completo).
+
+O arquivo também guarda os limiares (excelente, bom, aceitavel) calibrados
+por backend (chave "limiares"): a varredura grava os do LBPH junto com a
+combinação e o avaliacao.py --aplicar-limiares os do backend avaliado. O
+treino os grava no modelo, e o reconhece.py usa os do modelo carregado
+(limiares_do_modelo); mudá-los também pede um treino completo.
+"""
+import json
+import os
+from pathlib import Path
+
+PARAMETROS_PATH = Path(__file__).resolve().parent / 'parametros.json'
+
+PADRAO_LBPH = {'tamanho_face': 200, 'raio': 1, 'vizinhos': 8, 'grade': 8}
+
+
+def dimensao_lbph(parametros):
+    """Floats por histograma: 2^vizinhos bins por célula da grade"""
+    return (2 ** parametros['vizinhos']) * parametros['grade'] ** 2
+
+
+def _ler_arquivo(caminho):
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"[AVISO] {caminho} ilegivel ({e}); usando os parametros padrao do LBPH")
+        return None
+
+
+def _gravar_arquivo(dados, caminho):
+    temporario = Path(caminho).with_name(f".{Path(caminho).name}.tmp")
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, indent=2, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def ler_parametros(caminho=PARAMETROS_PATH):
+    """Parâmetros do LBPH (padrão do OpenCV se o arquivo não existe)"""
+    dados = _ler_arquivo(caminho)
+    if dados is None:
+        return dict(PADRAO_LBPH)
+    return {chave: int(dados.get(chave, padrao)) for chave, padrao in PADRAO_LBPH.items()}
+
+
+def ler_limiares(backend, caminho=PARAMETROS_PATH):
+    """(excelente, bom, aceitavel) calibrados para o backend; None = os padrões dele"""
+    calibrados = ((_ler_arquivo(caminho) or {}).get('limiares') or {}).get(backend)
+    return tuple(float(l) for l in calibrados['valores']) if calibrados else None
+
+
+def gravar_parametros(parametros, caminho=PARAMETROS_PATH, limiares=None, **origem):
+    """
+    Grava a escolha (com a origem, ex. a medição da varredura) de forma
+    atômica. Os limiares do LBPH valem para a combinação: sem `limiares`
+    os calibrados para a anterior são descartados.
+    """
+    por_backend = dict(((_ler_arquivo(caminho) or {}).get('limiares') or {}))
+    por_backend.pop('lbph', None)
+    if limiares:
+        por_backend['lbph'] = {'valores': [float(l) for l in limiares]}
+    dados = {chave: int(parametros[chave]) for chave in PADRAO_LBPH}
+    dados.update(origem)
+    if por_backend:
+        dados['limiares'] = por_backend
+    _gravar_arquivo(dados, caminho)
+
+
+def gravar_limiares(backend, limiares, caminho=PARAMETROS_PATH, **origem):
+    """Grava os limiares calibrados de um backend sem mexer no resto do arquivo"""
+    dados = _ler_arquivo(caminho) or dict(PADRAO_LBPH)
+    dados['limiares'] = {**(dados.get('limiares') or {}),
+                         backend: {'valores': [float(l) for l in limiares], **origem}}
+    _gravar_arquivo(dados, caminho)
+
+
+def parametros_do_backend(backend):
+    """Configuração do reconhecedor para o treino ({} para quem não tem)"""
+    return ler_parametros() if backend == 'lbph' else {}
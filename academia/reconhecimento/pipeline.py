@@ -0,0 +1,291 @@
+"""
+Pipeline em threads para o reconhecimento facial.
+
+    captura -> [frames] -> inferência -> [resultados] -> render (thread principal)
+                                     \\-> [eventos] -> efeitos (banco)
+
+As filas de frames e de resultados são limitadas e descartam o item mais
+antigo quando cheias (com aviso no log): a de frames tem tamanho 1, então a
+inferência sempre pega o frame mais recente da câmera. A de eventos nunca
+descarta: cada evento é uma presença ou decisão de acesso, então um MySQL
+lento só faz os eventos esperarem, sem atrasar o vídeo.
+"""
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+AMOSTRAS_LATENCIA = 10000   # últimas durações guardadas por estágio
+INTERVALO_AVISO = 10        # segundos entre avisos de descarte/acúmulo de uma fila
+EVENTOS_ACUMULADOS = 64     # eventos esperando acima disso: banco lento
+
+
+class FilaDescarte:
+    """
+    Fila limitada que descarta o item mais antigo quando cheia. Só para
+    frames e resultados: avisa no log (no máximo a cada INTERVALO_AVISO
+    segundos) quantos itens descartou.
+    """
+
+    def __init__(self, nome, tamanho, avisar=True):
+        self.nome = nome
+        self.tamanho = tamanho
+        self.avisar = avisar
+        self._fila = queue.Queue(maxsize=tamanho)
+        self.entradas = 0
+        self.descartados = 0
+        self._descartados_avisados = 0
+        self._ultimo_aviso = time.monotonic()
+
+    def colocar(self, item):
+        self.entradas += 1
+        while True:
+            try:
+                self._fila.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._fila.get_nowait()
+                    self.descartados += 1
+                    self._avisar_descarte()
+                except queue.Empty:
+                    pass
+
+    def _avisar_descarte(self):
+        agora = time.monotonic()
+        if not self.avisar or agora - self._ultimo_aviso < INTERVALO_AVISO:
+            return
+        novos = self.descartados - self._descartados_avisados
+        print(f"[AVISO] Fila {self.nome}: {novos} item(ns) descartado(s) em "
+              f"{agora - self._ultimo_aviso:.0f}s (consumidor mais lento que o produtor)")
+        self._descartados_avisados = self.descartados
+        self._ultimo_aviso = agora
+
+    def colocar_bloqueando(self, item, cancelar):
+        """Espera espaço em vez de descartar (replay de vídeo/benchmark)"""
+        self.entradas += 1
+        while not cancelar.is_set():
+            try:
+                self._fila.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def obter(self, timeout=None):
+        """Próximo item (levanta queue.Empty no timeout)"""
+        return self._fila.get(timeout=timeout)
+
+    def profundidade(self):
+        return self._fila.qsize()
+
+    def vazia(self):
+        return self._fila.empty()
+
+
+class FilaEventos:
+    """
+    Fila sem limite para eventos de presença/acesso: nunca descarta. Se o
+    banco travar os eventos acumulam (e o log avisa) até os efeitos voltarem.
+    """
+
+    def __init__(self, nome, alerta=EVENTOS_ACUMULADOS):
+        self.nome = nome
+        self.alerta = alerta
+        self._fila = queue.Queue()
+        self.entradas = 0
+        self.descartados = 0    # sempre 0; mesmo formato das outras filas nas estatísticas
+        self._ultimo_aviso = 0.0
+
+    def colocar(self, item):
+        self.entradas += 1
+        self._fila.put(item)
+        profundidade = self._fila.qsize()
+        agora = time.monotonic()
+        if profundidade >= self.alerta and agora - self._ultimo_aviso >= INTERVALO_AVISO:
+            print(f"[AVISO] Fila {self.nome}: {profundidade} evento(s) esperando o banco")
+            self._ultimo_aviso = agora
+
+    def obter(self, timeout=None):
+        """Próximo item (levanta queue.Empty no timeout)"""
+        return self._fila.get(timeout=timeout)
+
+    def profundidade(self):
+        return self._fila.qsize()
+
+    def vazia(self):
+        return self._fila.empty()
+
+
+class ContadorEstagio:
+    """Itens processados e tempo gasto por um estágio"""
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.processados = 0
+        self.tempo_total = 0.0
+        self.duracoes = deque(maxlen=AMOSTRAS_LATENCIA)
+
+    def registrar(self, duracao):
+        self.processados += 1
+        self.tempo_total += duracao
+        self.duracoes.append(duracao)
+
+    def percentis_ms(self, percentis=(50, 95, 99)):
+        if not self.duracoes:
+            return {f'p{p}': 0.0 for p in percentis}
+        valores = np.percentile(np.fromiter(self.duracoes, dtype=np.float64), percentis) * 1000
+        return {f'p{p}': round(float(v), 2) for p, v in zip(percentis, valores)}
+
+    def media_ms(self):
+        return (self.tempo_total / self.processados * 1000) if self.processados else 0.0
+
+
+class PipelineReconhecimento:
+    """
+    Liga os estágios. `inferir(frame)` devolve (resultado, eventos) e
+    `efeito(evento)` executa o efeito colateral de cada evento. O render
+    fica com quem chamou (cv2.imshow precisa da thread principal).
+
+    descartar_frames=False faz a captura esperar a inferência em vez de
+    pular frames (replay de arquivo, onde cada frame conta).
+    """
+
+    def __init__(self, fonte, inferir, efeito, alerta_eventos=EVENTOS_ACUMULADOS, descartar_frames=True):
+        self.fonte = fonte
+        self.inferir = inferir
+        self.efeito = efeito
+        self.descartar_frames = descartar_frames
+
+        # Pular frame é o normal (a inferência pega sempre o mais novo): sem aviso
+        self.fila_frames = FilaDescarte('frames', 1, avisar=False)
+        self.fila_resultados = FilaDescarte('resultados', 2)
+        self.fila_eventos = FilaEventos('eventos', alerta_eventos)
+
+        self.contadores = {
+            nome: ContadorEstagio(nome)
+            for nome in ('captura', 'inferencia', 'efeitos', 'render')
+        }
+
+        self._parar = threading.Event()
+        self._fim_captura = threading.Event()
+        self._fim_inferencia = threading.Event()
+        self._threads = []
+
+    # ----- estágios -----
+
+    def _captura(self):
+        try:
+            while not self._parar.is_set():
+                inicio = time.perf_counter()
+                ret, frame = self.fonte.read()
+                if not ret:
+                    break
+                self.contadores['captura'].registrar(time.perf_counter() - inicio)
+                if self.descartar_frames:
+                    self.fila_frames.colocar(frame)
+                else:
+                    self.fila_frames.colocar_bloqueando(frame, self._parar)
+        finally:
+            self._fim_captura.set()
+
+    def _inferencia(self):
+        try:
+            while not self._parar.is_set():
+                try:
+                    frame = self.fila_frames.obter(timeout=0.1)
+                except queue.Empty:
+                    if self._fim_captura.is_set():
+                        break
+                    continue
+
+                inicio = time.perf_counter()
+                resultado, eventos = self.inferir(frame)
+                self.contadores['inferencia'].registrar(time.perf_counter() - inicio)
+
+                self.fila_resultados.colocar(resultado)
+                for evento in eventos:
+                    self.fila_eventos.colocar(evento)
+        finally:
+            self._fim_inferencia.set()
+
+    def _efeitos(self):
+        while True:
+            try:
+                evento = self.fila_eventos.obter(timeout=0.1)
+            except queue.Empty:
+                if self._fim_inferencia.is_set() or self._parar.is_set():
+                    break
+                continue
+
+            inicio = time.perf_counter()
+            try:
+                self.efeito(evento)
+            except Exception as e:
+                print(f"[ERRO] Falha no efeito do evento {evento}: {e}")
+            self.contadores['efeitos'].registrar(time.perf_counter() - inicio)
+
+    # ----- controle -----
+
+    def iniciar(self):
+        for nome, alvo in (('captura', self._captura),
+                           ('inferencia', self._inferencia),
+                           ('efeitos', self._efeitos)):
+            thread = threading.Thread(target=alvo, name=f'pipeline-{nome}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def proximo_resultado(self, timeout=0.1):
+        """Resultado mais recente para o render (levanta queue.Empty)"""
+        return self.fila_resultados.obter(timeout=timeout)
+
+    def registrar_render(self, duracao):
+        self.contadores['render'].registrar(duracao)
+
+    def ativo(self):
+        """False quando a fonte acabou e não há mais resultados para mostrar"""
+        return not (self._fim_inferencia.is_set() and self.fila_resultados.vazia())
+
+    def parar(self, timeout=5):
+        self._parar.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        if not self.fila_eventos.vazia():
+            print(f"[ERRO] {self.fila_eventos.profundidade()} evento(s) nao processado(s) "
+                  f"ao encerrar (banco nao respondeu em {timeout}s)")
+
+    def aguardar_efeitos(self, timeout=10):
+        """Espera os efeitos pendentes terminarem (fim da fonte)"""
+        for thread in self._threads:
+            if thread.name == 'pipeline-efeitos':
+                thread.join(timeout=timeout)
+
+    def estatisticas(self):
+        """Profundidade e descartes de cada fila + contadores de estágio"""
+        return {
+            'filas': {
+                fila.nome: {
+                    'profundidade': fila.profundidade(),
+                    'entradas': fila.entradas,
+                    'descartados': fila.descartados,
+                }
+                for fila in (self.fila_frames, self.fila_resultados, self.fila_eventos)
+            },
+            'estagios': {
+                nome: {
+                    'processados': c.processados,
+                    'media_ms': round(c.media_ms(), 2),
+                    **c.percentis_ms(),
+                }
+                for nome, c in self.contadores.items()
+            },
+        }
+
+    def resumo(self):
+        """Linha curta para overlay/log"""
+        est = self.estatisticas()
+        filas = ' '.join(
+            f"{nome}={f['profundidade']}/{f['descartados']}d" for nome, f in est['filas'].items()
+        )
+        return f"Filas {filas}"
@@ -0,0 +1,225 @@
+"""
+Detecção + rastreamento de faces para o reconhece.py.
+
+O Haar roda só a cada INTERVALO_DETECCAO frames (ou quando uma trilha se
+perde). Entre as detecções cada face é seguida por fluxo óptico
+(Lucas-Kanade) e a trilha guarda a identidade já reconhecida, então o
+recognizer.predict só roda de novo quando o rastreamento perde qualidade.
+"""
+import cv2
+import numpy as np
+
+INTERVALO_DETECCAO = 5      # frames entre detecções completas
+FRAMES_MINIMOS = 3          # predições concordantes para confirmar identidade
+MAX_HISTORICO = 10
+IOU_MINIMO = 0.3            # associação detecção <-> trilha
+QUALIDADE_MINIMA = 0.6      # fração de pontos mantidos antes de re-identificar
+PONTOS_MINIMOS = 6          # abaixo disso a trilha é considerada perdida
+ERRO_FB_MAXIMO = 1.0        # erro forward-backward (pixels)
+
+PARAMETROS_LK = dict(
+    winSize=(15, 15),
+    maxLevel=2,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03),
+)
+
+
+def calcular_iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    x1, y1 = max(ax, bx), max(ay, by)
+    x2, y2 = min(ax + aw, bx + bw), min(ay + ah, by + bh)
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    uniao = aw * ah + bw * bh - inter
+    return inter / uniao if uniao > 0 else 0.0
+
+
+def extrair_pontos(gray, caixa):
+    """Cantos bons para rastrear dentro da caixa da face"""
+    x, y, w, h = caixa
+    mascara = np.zeros_like(gray)
+    # Margem interna para não pegar fundo
+    mx, my = w // 6, h // 6
+    mascara[y + my:y + h - my, x + mx:x + w - mx] = 255
+    pontos = cv2.goodFeaturesToTrack(gray, maxCorners=40, qualityLevel=0.01,
+                                     minDistance=5, mask=mascara)
+    if pontos is None:
+        return np.empty((0, 1, 2), dtype=np.float32)
+    return pontos.astype(np.float32)
+
+
+class Trilha:
+    """Uma face rastreada e a identidade associada a ela"""
+
+    _proximo_id = 1
+
+    def __init__(self, caixa, gray):
+        self.id = Trilha._proximo_id
+        Trilha._proximo_id += 1
+        self.caixa = tuple(int(v) for v in caixa)
+        self.pontos = extrair_pontos(gray, self.caixa)
+        self.pontos_iniciais = max(len(self.pontos), 1)
+        self.qualidade = 1.0
+        self.perdida = False
+
+        self.historico_ids = []
+        self.client_id = -1
+        self.confianca = float('inf')
+        self.confirmacoes = 0
+        self.confirmada = False
+        self.reverificar = True     # precisa de predict
+        self.predicoes = 0
+
+    def reiniciar_pontos(self, gray, caixa=None):
+        if caixa is not None:
+            self.caixa = tuple(int(v) for v in caixa)
+        self.pontos = extrair_pontos(gray, self.caixa)
+        self.pontos_iniciais = max(len(self.pontos), 1)
+        self.qualidade = 1.0
+
+    def precisa_reconhecer(self):
+        # Enquanto não confirmada, prediz a cada frame (como antes);
+        # depois disso só quando o rastreamento deriva
+        return not self.confirmada or self.reverificar
+
+    def registrar_predicao(self, client_id, confianca, valida):
+        """Atualiza votação da trilha com uma nova predição"""
+        self.predicoes += 1
+        self.reverificar = False
+
+        if not valida:
+            self.confianca = confianca
+            if self.confirmada:
+                # Identidade não se sustenta: volta a identificar
+                self.confirmada = False
+                self.confirmacoes = 0
+                self.historico_ids.clear()
+            return
+
+        self.historico_ids.append(client_id)
+        if len(self.historico_ids) > MAX_HISTORICO:
+            self.historico_ids.pop(0)
+
+        if len(self.historico_ids) >= 3:
+            from collections import Counter
+            id_vencedor, num_votos = Counter(self.historico_ids).most_common(1)[0]
+            if num_votos >= len(self.historico_ids) * 0.5:
+                client_id = id_vencedor
+
+        if self.confirmada and client_id != self.client_id:
+            self.confirmada = False
+            self.confirmacoes = 0
+
+        self.client_id = client_id
+        self.confianca = confianca
+        self.confirmacoes += 1
+        if self.confirmacoes >= FRAMES_MINIMOS:
+            self.confirmada = True
+
+
+class Rastreador:
+    """Detecta a cada N frames e rastreia por fluxo óptico entre detecções"""
+
+    def __init__(self, detector, intervalo_deteccao=INTERVALO_DETECCAO,
+                 parametros_deteccao=None, cache_identidade=True):
+        self.detector = detector
+        self.intervalo_deteccao = max(1, intervalo_deteccao)
+        self.parametros_deteccao = parametros_deteccao or dict(
+            scaleFactor=1.2, minNeighbors=5, minSize=(100, 100)
+        )
+        self.cache_identidade = cache_identidade
+        self.trilhas = []
+        self._gray_anterior = None
+        self._frames_desde_deteccao = 0
+        self._forcar_deteccao = True
+
+        # Estatísticas
+        self.deteccoes = 0
+        self.frames = 0
+
+    def _detectar(self, gray):
+        faces = self.detector.detectMultiScale(gray, **self.parametros_deteccao)
+        self.deteccoes += 1
+
+        novas = []
+        livres = list(self.trilhas)
+        for caixa in faces:
+            melhor, melhor_iou = None, IOU_MINIMO
+            for trilha in livres:
+                iou = calcular_iou(caixa, trilha.caixa)
+                if iou >= melhor_iou:
+                    melhor, melhor_iou = trilha, iou
+            if melhor is not None:
+                # Mesma pessoa: mantém identidade e corrige a caixa
+                livres.remove(melhor)
+                melhor.reiniciar_pontos(gray, caixa)
+                novas.append(melhor)
+            else:
+                novas.append(Trilha(caixa, gray))
+
+        # Trilhas sem detecção correspondente são descartadas
+        self.trilhas = novas
+
+    def _rastrear(self, gray):
+        perdeu = False
+        for trilha in self.trilhas:
+            if len(trilha.pontos) < PONTOS_MINIMOS:
+                trilha.perdida = True
+                perdeu = True
+                continue
+
+            p1, st, _ = cv2.calcOpticalFlowPyrLK(self._gray_anterior, gray, trilha.pontos,
+                                                 None, **PARAMETROS_LK)
+            p0r, st_r, _ = cv2.calcOpticalFlowPyrLK(gray, self._gray_anterior, p1,
+                                                    None, **PARAMETROS_LK)
+            erro_fb = np.abs(trilha.pontos - p0r).reshape(-1, 2).max(axis=1)
+            bons = (st.ravel() == 1) & (st_r.ravel() == 1) & (erro_fb < ERRO_FB_MAXIMO)
+
+            if bons.sum() < PONTOS_MINIMOS:
+                trilha.perdida = True
+                perdeu = True
+                continue
+
+            desloc = np.median((p1[bons] - trilha.pontos[bons]).reshape(-1, 2), axis=0)
+            x, y, w, h = trilha.caixa
+            altura, largura = gray.shape[:2]
+            x = int(np.clip(round(x + desloc[0]), 0, largura - w))
+            y = int(np.clip(round(y + desloc[1]), 0, altura - h))
+            trilha.caixa = (x, y, w, h)
+            trilha.pontos = p1[bons].reshape(-1, 1, 2)
+            trilha.qualidade = len(trilha.pontos) / trilha.pontos_iniciais
+
+            if trilha.qualidade < QUALIDADE_MINIMA:
+                # Rastreamento derivou: re-identifica e renova os pontos
+                trilha.reverificar = True
+                trilha.reiniciar_pontos(gray)
+
+        self.trilhas = [t for t in self.trilhas if not t.perdida]
+        return perdeu
+
+    def atualizar(self, gray):
+        """Processa um frame em tons de cinza e devolve as trilhas ativas"""
+        self.frames += 1
+        detectar = (
+            self._forcar_deteccao
+            or self._gray_anterior is None
+            or self._frames_desde_deteccao + 1 >= self.intervalo_deteccao
+        )
+
+        if not detectar and self._rastrear(gray):
+            # Trilha perdida: detecção completa no mesmo frame
+            detectar = True
+
+        if detectar:
+            self._detectar(gray)
+            self._frames_desde_deteccao = 0
+            self._forcar_deteccao = False
+        else:
+            self._frames_desde_deteccao += 1
+
+        if not self.cache_identidade:
+            for trilha in self.trilhas:
+                trilha.reverificar = True
+
+        self._gray_anterior = gray
+        return self.trilhas
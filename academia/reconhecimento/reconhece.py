@@ -2,9 +2,10 @@ import os
 import sys
 import cv2
 import numpy as np
-from datetime import date, datetime
-from pathlib import Path
+from datetime import datetime
 import time
+import queue
+import threading
 
 if sys.platform == 'win32':
     import codecs
@@ -16,7 +17,14 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'academia.settings')
 import django
 django.setup()
 
-from gym.models import Cliente, Presenca, ClientePlano
+from django.conf import settings
+from gym.acesso import situacoes
+from gym.presencas import EscritorPresencas
+from academia.reconhecimento.cache_clientes import CacheClientes
+from academia.reconhecimento.rastreamento import Rastreador, INTERVALO_DETECCAO, FRAMES_MINIMOS
+from academia.reconhecimento.pipeline import PipelineReconhecimento
+from academia.reconhecimento.fontes import abrir_fonte
+from academia.reconhecimento.modelo import ModeloRecarregavel, TRAINER_PATH
 
 # THRESHOLDS MUITO TOLERANTES
 CONFIDENCE_EXCELLENT = 80
@@ -25,7 +33,13 @@ CONFIDENCE_ACCEPTABLE = 120
 
 COOLDOWN_SEGUNDOS = 5
 ultimos_reconhecimentos = {}
+# Compartilhado por todas as câmeras do processo (multicamera.py)
+cooldown_lock = threading.Lock()
 ultimo_feedback = {'texto': '', 'cor': (255, 255, 255), 'tempo': 0}
+# Presenças gravadas em lote por uma thread (uma ida ao banco por lote)
+escritor_presencas = EscritorPresencas()
+nomes_presencas = {}    # cliente_id -> nome, para os avisos do escritor
+presencas_com_falha = set()
 
 def pode_reconhecer_novamente(client_id):
     agora = time.time()
@@ -37,135 +51,239 @@ def pode_reconhecer_novamente(client_id):
 def atualizar_cooldown(client_id):
     ultimos_reconhecimentos[client_id] = time.time()
 
+def reservar_reconhecimento(client_id):
+    """Verifica e marca o cooldown de forma atômica (uma pessoa = um evento)"""
+    with cooldown_lock:
+        if not pode_reconhecer_novamente(client_id):
+            return False
+        atualizar_cooldown(client_id)
+        return True
+
 def verificar_acesso_cliente(cliente_id):
+    """(pode_entrar, mensagem, dias) pela situação em cache do cliente"""
     try:
-        print(f"[DEBUG] Buscando cliente ID {cliente_id}...")
-        cliente = Cliente.objects.get(pk=cliente_id)
-        print(f"[DEBUG] Cliente encontrado: {cliente.nome}")
-        print(f"[DEBUG] Status ativo: {cliente.status}")
-        
-        if not cliente.status:
-            return False, "Cliente INATIVO", 0
-        
-        print(f"[DEBUG] Buscando plano ativo...")
-        plano_ativo = ClientePlano.objects.filter(cliente=cliente, ativo=True).first()
-        
-        if not plano_ativo:
-            print(f"[DEBUG] Nenhum plano ativo encontrado")
-            return False, "SEM PLANO ATIVO", 0
-        
-        print(f"[DEBUG] Plano ativo encontrado: {plano_ativo.plano.nome}")
-        print(f"[DEBUG] Data fim: {plano_ativo.data_fim}")
-        
-        hoje = date.today()
-        print(f"[DEBUG] Data hoje: {hoje}")
-        
-        if plano_ativo.data_fim < hoje:
-            dias_vencido = (hoje - plano_ativo.data_fim).days
-            print(f"[DEBUG] Plano vencido ha {dias_vencido} dias")
-            return False, f"PLANO VENCIDO ({dias_vencido} dias)", -dias_vencido
-        
-        dias_restantes = (plano_ativo.data_fim - hoje).days
-        print(f"[DEBUG] Dias restantes: {dias_restantes}")
-        
-        if dias_restantes == 0:
-            return True, "VENCE HOJE!", 0
-        elif dias_restantes <= 3:
-            return True, f"Vence em {dias_restantes} dias", dias_restantes
-        else:
-            return True, "ACESSO LIBERADO", dias_restantes
-            
-    except Cliente.DoesNotExist:
-        print(f"[DEBUG] Cliente ID {cliente_id} nao existe no banco!")
-        return False, "Cliente NAO ENCONTRADO", 0
+        situacao = situacoes.obter(cliente_id)
     except Exception as e:
-        print(f"[DEBUG] Erro ao verificar acesso: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"[ERRO] Falha ao verificar acesso de {cliente_id}: {e}")
         return False, "ERRO AO VERIFICAR", 0
 
-def registrar_presenca(cliente_id):
-    try:
-        print(f"\n[DEBUG] === INICIANDO REGISTRO DE PRESENCA ===")
-        print(f"[DEBUG] Cliente ID: {cliente_id}")
-        
-        cliente = Cliente.objects.get(pk=cliente_id)
-        print(f"[DEBUG] Cliente: {cliente.nome}")
-        
-        hoje = date.today()
-        print(f"[DEBUG] Data: {hoje}")
-        
-        # Verifica se já existe
-        ja_registrado = Presenca.objects.filter(cliente=cliente, data=hoje).exists()
-        print(f"[DEBUG] Ja registrado hoje: {ja_registrado}")
-        
-        if ja_registrado:
-            print(f"[INFO] {cliente.nome} ja registrou presenca hoje")
-            presenca_existente = Presenca.objects.filter(cliente=cliente, data=hoje).first()
-            print(f"[DEBUG] Presenca existente ID: {presenca_existente.id}")
-            return True
-        
-        # Cria presença
-        print(f"[DEBUG] Criando nova presenca...")
-        presenca = Presenca.objects.create(
-            cliente=cliente,
-            tipo='facial',
-            usuario=None
-        )
-        
-        print(f"[DEBUG] Presenca criada com sucesso!")
-        print(f"[DEBUG] Presenca ID: {presenca.id}")
-        print(f"[DEBUG] Data: {presenca.data}")
-        print(f"[DEBUG] Hora: {presenca.hora_entrada}")
-        print(f"[DEBUG] Tipo: {presenca.tipo}")
-        
-        # Verifica se salvou
-        verificacao = Presenca.objects.filter(id=presenca.id).exists()
-        print(f"[DEBUG] Verificacao no banco: {verificacao}")
-        
-        if verificacao:
-            print(f"[OK] ✓ Presenca ID {presenca.id} registrada: {cliente.nome}")
-            print(f"[DEBUG] === REGISTRO CONCLUIDO COM SUCESSO ===\n")
-            return True
+    if situacao is None:
+        print(f"[AVISO] Cliente ID {cliente_id} nao existe no banco!")
+        return False, "Cliente NAO ENCONTRADO", 0
+    return situacao['pode_entrar'], situacao['mensagem'], situacao['dias']
+
+def presenca_gravada(cliente_id, ok, erro=None, ja_registrada=False):
+    """Resultado do lote do escritor de presenças (chamado pela thread dele)"""
+    nome = nomes_presencas.get(cliente_id, cliente_id)
+    if ok:
+        if ja_registrada:
+            print(f"[INFO] Presenca de {nome} ja estava no banco hoje (nada gravado)")
         else:
-            print(f"[ERRO] Presenca nao foi salva no banco!")
-            return False
-        
-    except Cliente.DoesNotExist:
-        print(f"[ERRO] Cliente ID {cliente_id} nao existe!")
-        return False
-    except Exception as e:
-        print(f"[ERRO] Falha ao registrar presenca: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+            print(f"[OK] Presenca de {nome} gravada no banco")
+        if cliente_id in presencas_com_falha:
+            presencas_com_falha.discard(cliente_id)
+            definir_feedback(f"PRESENCA GRAVADA\n{nome}", (0, 255, 0), duracao=3)
+    else:
+        presencas_com_falha.add(cliente_id)
+        print(f"\n[ERRO] Falha ao gravar presenca de {nome}: {erro} (nova tentativa no proximo lote)\n")
+        definir_feedback(f"ERRO AO GRAVAR PRESENCA\n{nome}\nChame a recepcao", (0, 165, 255), duracao=5)
+
+def registrar_presenca(cliente_id, nome=None):
+    """
+    Enfileira a presença no escritor em lote (idempotente por cliente/dia);
+    True se enfileirou, False se o cliente já tinha presença hoje. A gravação
+    é confirmada depois, por presenca_gravada.
+    """
+    nomes_presencas[cliente_id] = nome or cliente_id
+    if escritor_presencas.registrar(cliente_id, tipo='facial', ao_gravar=presenca_gravada):
+        print(f"[INFO] Presenca de {cliente_id} enfileirada para gravacao")
+        return True
+    print(f"[INFO] Cliente {cliente_id} ja registrou presenca hoje")
+    return False
 
 def pre_processar_face(face_roi):
     """EXATAMENTE IGUAL AO TREINO - SÓ REDIMENSIONA"""
     return cv2.resize(face_roi, (200, 200))
 
+def limiares_do_modelo(recognizer):
+    """
+    (excelente, bom, aceitavel) do modelo carregado: os calibrados que o
+    treino gravou nele (parametros.json), senão os do backend; LBPH sem
+    calibração usa os CONFIDENCE_* daqui
+    """
+    return (getattr(recognizer, 'limiares', None)
+            or (CONFIDENCE_EXCELLENT, CONFIDENCE_GOOD, CONFIDENCE_ACCEPTABLE))
+
+def classificar_confianca(confidence, limiares=None):
+    """Retorna (qualidade, cor, nivel) para a distância do reconhecedor"""
+    excelente, bom, aceitavel = limiares or (CONFIDENCE_EXCELLENT, CONFIDENCE_GOOD, CONFIDENCE_ACCEPTABLE)
+    if confidence < excelente:
+        return "EXCELENTE", (0, 255, 0), 3
+    elif confidence < bom:
+        return "BOM", (0, 255, 255), 2
+    elif confidence < aceitavel:
+        return "ACEITAVEL", (0, 165, 255), 1
+    return "DESCONHECIDO", (0, 0, 255), 0
+
+def definir_feedback(texto, cor, duracao=3):
+    """Agenda um feedback na tela por X segundos (pode vir de outra thread)"""
+    global ultimo_feedback
+    ultimo_feedback = {'texto': texto, 'cor': cor, 'tempo': time.time() + duracao}
+
 def mostrar_feedback(frame, texto, cor, duracao=3):
     """Mostra feedback na tela por X segundos"""
-    global ultimo_feedback
     agora = time.time()
     
     if texto:
-        ultimo_feedback = {'texto': texto, 'cor': cor, 'tempo': agora + duracao}
+        definir_feedback(texto, cor, duracao)
     
-    if agora < ultimo_feedback['tempo']:
+    feedback = ultimo_feedback
+    if agora < feedback['tempo']:
         overlay = frame.copy()
         cv2.rectangle(overlay, (10, 80), (630, 200), (0, 0, 0), -1)
         cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
         
-        linhas = ultimo_feedback['texto'].split('\n')
+        linhas = feedback['texto'].split('\n')
         y = 120
         for linha in linhas:
             cv2.putText(frame, linha, (20, y),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, ultimo_feedback['cor'], 2)
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, feedback['cor'], 2)
             y += 35
 
-def reconhecimento_facial():
-    trainer_path = Path(__file__).parent / 'trainer.yml'
+class AnalisadorFrames:
+    """Estágio de inferência: rastreia, prediz e decide quem processar"""
+    
+    def __init__(self, modelo, rastreador, cache_clientes):
+        self.modelo = modelo
+        self.rastreador = rastreador
+        self.cache_clientes = cache_clientes
+        self.predicoes = 0
+        self.verbose = True
+    
+    def __call__(self, frame):
+        """Devolve ((frame, anotacoes), eventos) para o pipeline"""
+        anotacoes = []
+        eventos = []
+        
+        # Um único modelo por frame, mesmo que o observador troque a versão agora
+        recognizer = self.modelo.atual()
+        limiares = limiares_do_modelo(recognizer)
+        
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        trilhas = self.rastreador.atualizar(gray)
+        
+        # Todas as faces do frame num predict só (uma passada pela galeria)
+        pendentes = [trilha for trilha in trilhas if trilha.precisa_reconhecer()]
+        faces = []
+        for trilha in pendentes:
+            (x, y, w, h) = trilha.caixa
+            faces.append(pre_processar_face(gray[y:y+h, x:x+w]))
+        predicoes = dict(zip((trilha.id for trilha in pendentes), recognizer.predict_varios(faces)))
+        
+        for trilha in trilhas:
+            if trilha.id in predicoes:
+                client_id, confidence = predicoes[trilha.id]
+                self.predicoes += 1
+                if self.verbose:
+                    print(f"[RAW] Trilha {trilha.id} | ID: {client_id} | Conf: {confidence:.1f}")
+                
+                valida = client_id != -1 and confidence < limiares[2]
+                trilha.registrar_predicao(client_id, confidence, valida)
+                
+                if client_id == -1 or confidence > 500:
+                    anotacoes.append((trilha.caixa, (128, 128, 128), None, 1))
+                    continue
+            
+            client_id = trilha.client_id
+            confidence = trilha.confianca
+            qualidade, cor, nivel = classificar_confianca(confidence, limiares)
+            nome = self.cache_clientes.nome(client_id)
+            
+            if nivel > 0:
+                frames = min(trilha.confirmacoes, FRAMES_MINIMOS)
+                
+                if trilha.confirmada:
+                    # Cooldown marcado já aqui: evita eventos repetidos
+                    # enquanto o estágio de efeitos consulta o banco
+                    if reservar_reconhecimento(client_id):
+                        eventos.append((client_id, nome))
+                        anotacoes.append((trilha.caixa, cor, nome, 2))
+                    else:
+                        tempo_restante = COOLDOWN_SEGUNDOS - (time.time() - ultimos_reconhecimentos[client_id])
+                        anotacoes.append((trilha.caixa, (128, 128, 128), f"Aguarde {tempo_restante:.0f}s", 2))
+                else:
+                    if self.verbose:
+                        print(f"[DETECT] ID: {client_id} | Conf: {confidence:.1f} | Frames: {frames}/{FRAMES_MINIMOS}")
+                    anotacoes.append((trilha.caixa, cor, f"{nome} {frames}/{FRAMES_MINIMOS}", 2))
+            else:
+                anotacoes.append((trilha.caixa, cor, f"Desconhecido ({confidence:.0f})", 2))
+        
+        return (frame, anotacoes), eventos
+
+def processar_evento(evento):
+    """Estágio de efeitos: verifica acesso, registra presença e dá feedback"""
+    client_id, nome = evento
+    
+    print(f"\n{'='*60}")
+    print(f"[INFO] PROCESSANDO CLIENTE ID {client_id}")
+    print(f"{'='*60}")
+    
+    # Verifica acesso
+    pode_entrar, mensagem, dias = verificar_acesso_cliente(client_id)
+    
+    print(f"[RESULTADO] Pode entrar: {pode_entrar}")
+    print(f"[RESULTADO] Mensagem: {mensagem}")
+    
+    if pode_entrar:
+        print(f"\n[INFO] Cliente autorizado! Registrando presenca...")
+        
+        # Enfileira a presença; gravação (ou falha) é avisada por presenca_gravada
+        nova = registrar_presenca(client_id, nome)
+        
+        print(f"\n{'*'*60}")
+        print(f"*** ACESSO LIBERADO! PRESENCA {'ENFILEIRADA PARA GRAVACAO' if nova else 'JA REGISTRADA HOJE'} ***")
+        print(f"*** Cliente: {nome}")
+        print(f"*** Status: {mensagem}")
+        print(f"{'*'*60}\n")
+        
+        definir_feedback(f"ACESSO LIBERADO\n{nome}\n{mensagem}", (0, 255, 0), duracao=5)
+    else:
+        print(f"\n[NEGADO] {mensagem}\n")
+        definir_feedback(f"ACESSO NEGADO\n{nome}\n{mensagem}", (0, 0, 255), duracao=5)
+
+def desenhar_resultado(resultado, resumo=None):
+    """Estágio de render: desenha anotações e feedback no frame"""
+    frame, anotacoes = resultado
+    
+    for (x, y, w, h), cor, texto, espessura in anotacoes:
+        cv2.rectangle(frame, (x, y), (x+w, y+h), cor, espessura)
+        if texto:
+            cv2.putText(frame, texto, (x, y-10),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, cor, 2)
+    
+    mostrar_feedback(frame, None, None)
+    
+    cv2.putText(frame, 'Pressione Q para sair', (10, 30),
+               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    if resumo:
+        cv2.putText(frame, resumo, (10, 470),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.45, (200, 200, 200), 1)
+    return frame
+
+def criar_analisador(modelo, cache_clientes, rastreamento=True, intervalo_deteccao=INTERVALO_DETECCAO):
+    """Monta detector + rastreador + estágio de inferência"""
+    cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+    face_detector = cv2.CascadeClassifier(cascade_path)
+    
+    rastreador = Rastreador(
+        face_detector,
+        intervalo_deteccao=intervalo_deteccao if rastreamento else 1,
+        cache_identidade=rastreamento,
+    )
+    return AnalisadorFrames(modelo, rastreador, cache_clientes)
+
+def reconhecimento_facial(fonte=0, rastreamento=True, intervalo_deteccao=INTERVALO_DETECCAO):
+    trainer_path = TRAINER_PATH
     
     if not trainer_path.exists():
         print("ERRO: Modelo nao treinado!")
@@ -174,176 +292,70 @@ def reconhecimento_facial():
     print("\n" + "="*60)
     print("SISTEMA DE RECONHECIMENTO FACIAL")
     print("="*60)
-    print(f"[INFO] Thresholds: < {CONFIDENCE_EXCELLENT} (Excelente)")
-    print(f"                   < {CONFIDENCE_GOOD} (Bom)")
-    print(f"                   < {CONFIDENCE_ACCEPTABLE} (Aceitavel)")
+    
+    # Modelo com recarga a quente: um novo treino entra sem reiniciar
+    modelo = ModeloRecarregavel(trainer_path)
+    modelo.iniciar_observador()
+    recognizer = modelo.atual()
+    excelente, bom, aceitavel = limiares_do_modelo(recognizer)
+    print(f"[INFO] Modelo: versao {modelo.versao} | backend {recognizer.nome}")
+    backend_config = getattr(settings, 'RECONHECIMENTO_BACKEND', recognizer.nome)
+    if backend_config != recognizer.nome:
+        print(f"[AVISO] settings.RECONHECIMENTO_BACKEND = '{backend_config}', mas o modelo "
+              f"foi treinado com '{recognizer.nome}'. Rode o treina.py novamente.")
+    print(f"[INFO] Thresholds: < {excelente} (Excelente)")
+    print(f"                   < {bom} (Bom)")
+    print(f"                   < {aceitavel} (Aceitavel)")
     print(f"[INFO] Cooldown: {COOLDOWN_SEGUNDOS}s")
-    print(f"[INFO] Cliente cadastrado: ID 12")
     print("[INFO] Pressione 'Q' para sair")
     print("="*60 + "\n")
     
-    cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-    face_detector = cv2.CascadeClassifier(cascade_path)
-    
-    recognizer = cv2.face.LBPHFaceRecognizer_create()
-    recognizer.read(str(trainer_path))
+    # Roster em memória: o loop de frames não consulta o banco para nomes
+    cache_clientes = CacheClientes()
+    total_cache = cache_clientes.carregar()
+    cache_clientes.iniciar()
+    print(f"[INFO] Cache de clientes: {total_cache} carregados")
     
-    cam = cv2.VideoCapture(0)
-    cam.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cam.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+    cam = abrir_fonte(fonte, tempo_real=True, fps_imagens=25)
+    print(f"[INFO] Fonte: {cam.descricao}")
     
     if not cam.isOpened():
         print("ERRO: Camera nao acessivel!")
+        cache_clientes.parar()
+        modelo.parar()
+        escritor_presencas.parar()
         return
     
-    historico_ids = []
-    MAX_HISTORICO = 10
+    analisador = criar_analisador(modelo, cache_clientes, rastreamento, intervalo_deteccao)
+    rastreador = analisador.rastreador
+    if rastreamento:
+        print(f"[INFO] Rastreamento: deteccao a cada {rastreador.intervalo_deteccao} frames")
+    else:
+        print("[INFO] Rastreamento: desligado (deteccao em todo frame)")
+    
+    pipeline = PipelineReconhecimento(cam, analisador, processar_evento)
     
-    reconhecimentos_validos = {}
-    FRAMES_MINIMOS = 3
+    inicio = time.time()
+    ultimo_log = inicio
+    pipeline.iniciar()
     
     try:
-        frame_count = 0
-        
-        while True:
-            ret, frame = cam.read()
-            if not ret:
-                break
-            
-            frame_count += 1
-            
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            
-            faces = face_detector.detectMultiScale(
-                gray,
-                scaleFactor=1.2,
-                minNeighbors=5,
-                minSize=(100, 100)
-            )
-            
-            if len(faces) == 0:
-                reconhecimentos_validos.clear()
-                historico_ids.clear()
-            
-            for (x, y, w, h) in faces:
-                face_roi = gray[y:y+h, x:x+w]
-                face_processed = pre_processar_face(face_roi)
-                
-                client_id, confidence = recognizer.predict(face_processed)
-                
-                print(f"[RAW] ID: {client_id} | Conf: {confidence:.1f}")
-                
-                if client_id == -1 or confidence > 500:
-                    cv2.rectangle(frame, (x, y), (x+w, y+h), (128, 128, 128), 1)
-                    continue
-                
-                historico_ids.append(client_id)
-                if len(historico_ids) > MAX_HISTORICO:
-                    historico_ids.pop(0)
-                
-                if len(historico_ids) >= 3:
-                    from collections import Counter
-                    votos = Counter(historico_ids)
-                    id_vencedor, num_votos = votos.most_common(1)[0]
-                    
-                    if num_votos >= len(historico_ids) * 0.5:
-                        client_id = id_vencedor
-                
-                if confidence < CONFIDENCE_EXCELLENT:
-                    qualidade = "EXCELENTE"
-                    cor = (0, 255, 0)
-                    nivel = 3
-                elif confidence < CONFIDENCE_GOOD:
-                    qualidade = "BOM"
-                    cor = (0, 255, 255)
-                    nivel = 2
-                elif confidence < CONFIDENCE_ACCEPTABLE:
-                    qualidade = "ACEITAVEL"
-                    cor = (0, 165, 255)
-                    nivel = 1
-                else:
-                    qualidade = "DESCONHECIDO"
-                    cor = (0, 0, 255)
-                    nivel = 0
-                
-                try:
-                    cliente = Cliente.objects.get(id=client_id)
-                    nome = cliente.nome
-                except Cliente.DoesNotExist:
-                    nome = f"ID {client_id}"
-                
-                if nivel > 0:
-                    if client_id not in reconhecimentos_validos:
-                        reconhecimentos_validos[client_id] = 0
-                    
-                    reconhecimentos_validos[client_id] += 1
-                    frames = reconhecimentos_validos[client_id]
-                    
-                    print(f"[DETECT] ID: {client_id} | Conf: {confidence:.1f} | Frames: {frames}/{FRAMES_MINIMOS}")
-                    
-                    if frames >= FRAMES_MINIMOS:
-                        if pode_reconhecer_novamente(client_id):
-                            print(f"\n{'='*60}")
-                            print(f"[INFO] PROCESSANDO CLIENTE ID {client_id}")
-                            print(f"{'='*60}")
-                            
-                            # Verifica acesso
-                            pode_entrar, mensagem, dias = verificar_acesso_cliente(client_id)
-                            
-                            print(f"[RESULTADO] Pode entrar: {pode_entrar}")
-                            print(f"[RESULTADO] Mensagem: {mensagem}")
-                            
-                            if pode_entrar:
-                                print(f"\n[INFO] Cliente autorizado! Registrando presenca...")
-                                
-                                # Registra presença
-                                sucesso = registrar_presenca(client_id)
-                                
-                                if sucesso:
-                                    cor_final = (0, 255, 0)
-                                    feedback_texto = f"ACESSO LIBERADO\n{nome}\n{mensagem}"
-                                    
-                                    print(f"\n{'*'*60}")
-                                    print(f"*** SUCESSO! PRESENCA REGISTRADA! ***")
-                                    print(f"*** Cliente: {nome}")
-                                    print(f"*** Status: {mensagem}")
-                                    print(f"{'*'*60}\n")
-                                    
-                                    mostrar_feedback(frame, feedback_texto, cor_final, duracao=5)
-                                else:
-                                    cor_final = (0, 165, 255)
-                                    feedback_texto = f"ERRO AO REGISTRAR\n{nome}"
-                                    print(f"\n[ERRO] Falha ao registrar presenca!\n")
-                                    mostrar_feedback(frame, feedback_texto, cor_final, duracao=3)
-                            else:
-                                cor_final = (0, 0, 255)
-                                feedback_texto = f"ACESSO NEGADO\n{nome}\n{mensagem}"
-                                
-                                print(f"\n[NEGADO] {mensagem}\n")
-                                mostrar_feedback(frame, feedback_texto, cor_final, duracao=5)
-                            
-                            atualizar_cooldown(client_id)
-                            reconhecimentos_validos[client_id] = 0
-                        else:
-                            tempo_restante = COOLDOWN_SEGUNDOS - (time.time() - ultimos_reconhecimentos[client_id])
-                            cv2.rectangle(frame, (x, y), (x+w, y+h), (128, 128, 128), 2)
-                            cv2.putText(frame, f"Aguarde {tempo_restante:.0f}s", (x, y-10),
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (128, 128, 128), 2)
-                    else:
-                        cv2.rectangle(frame, (x, y), (x+w, y+h), cor, 2)
-                        cv2.putText(frame, f"{nome} {frames}/{FRAMES_MINIMOS}",
-                                   (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, cor, 2)
-                else:
-                    cv2.rectangle(frame, (x, y), (x+w, y+h), cor, 2)
-                    cv2.putText(frame, f"Desconhecido ({confidence:.0f})", (x, y-10),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.6, cor, 2)
-            
-            mostrar_feedback(frame, None, None)
-            
-            cv2.putText(frame, 'Pressione Q para sair', (10, 30),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        while pipeline.ativo():
+            try:
+                resultado = pipeline.proximo_resultado(timeout=0.1)
+            except queue.Empty:
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+                continue
             
+            inicio_render = time.perf_counter()
+            frame = desenhar_resultado(resultado, pipeline.resumo())
             cv2.imshow('Reconhecimento Facial - Academia', frame)
+            pipeline.registrar_render(time.perf_counter() - inicio_render)
+            
+            if time.time() - ultimo_log >= 10:
+                ultimo_log = time.time()
+                print(f"[PIPELINE] {pipeline.estatisticas()}")
             
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
@@ -352,9 +364,37 @@ def reconhecimento_facial():
         print("\n[INFO] Interrompido")
     
     finally:
+        pipeline.parar()
         cam.release()
         cv2.destroyAllWindows()
-        print("\n[INFO] Camera fechada\n")
+        cache_clientes.parar()
+        modelo.parar()
+        escritor_presencas.parar()
+        
+        duracao = time.time() - inicio
+        renderizados = pipeline.contadores['render'].processados
+        if duracao > 0:
+            print(f"[INFO] {renderizados} frames exibidos em {duracao:.1f}s ({renderizados / duracao:.1f} FPS)")
+        print(f"[INFO] Deteccoes completas: {rastreador.deteccoes} | Predicoes: {analisador.predicoes}")
+        if modelo.trocas:
+            print(f"[INFO] Modelo recarregado {modelo.trocas}x | ultima carga: {modelo.ultima_carga_ms:.0f} ms | troca: {modelo.ultima_troca_us:.1f} us")
+        print(f"[PIPELINE] {pipeline.estatisticas()}")
+        print(f"[INFO] Presencas: {escritor_presencas.enviados} gravada(s) em {escritor_presencas.lotes} lote(s) | "
+              f"ja no banco: {escritor_presencas.ja_registradas} | "
+              f"lotes com falha: {escritor_presencas.falhas} | nao gravadas: {escritor_presencas.nao_gravadas}")
+        print("\n[INFO] Fonte fechada\n")
 
 if __name__ == '__main__':
-    reconhecimento_facial()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fonte', default='0',
+                        help='Indice da webcam, arquivo de video ou pasta de imagens')
+    parser.add_argument('--sem-rastreamento', action='store_true',
+                        help='Detecta e prediz em todo frame (modo antigo)')
+    parser.add_argument('--intervalo-deteccao', type=int, default=INTERVALO_DETECCAO,
+                        help='Frames entre deteccoes completas no modo rastreamento')
+    args = parser.parse_args()
+    
+    reconhecimento_facial(fonte=args.fonte,
+                          rastreamento=not args.sem_rastreamento,
+                          intervalo_deteccao=args.intervalo_deteccao)
@@ -0,0 +1,441 @@
+"""
+Backends de reconhecimento facial com a mesma interface do cv2.face
+(train / predict / write / read), para que treina.py, reconhece.py e
+modelo.py não dependam do algoritmo.
+
+- lbph        cv2.face.LBPHFaceRecognizer (padrão)
+- fisher      cv2.face.FisherFaceRecognizer (precisa de 2+ clientes)
+- embeddings  vetores 128-d do dlib (face_recognition), comparados por
+              distância euclidiana vetorizada contra a matriz de centróides
+              (um por cliente)
+
+O arquivo do modelo continua sendo um YAML do OpenCV; o nó raiz diz qual
+backend gravou (opencv_lbphfaces, opencv_fisherfaces, academia_embeddings),
+então quem carrega não precisa de configuração.
+
+treinar_em_blocos recebe as amostras de um gerador (treino com orçamento de
+memória): o LBPH grava os histogramas em disco e escreve o YAML bloco a
+bloco; os embeddings guardam só os vetores 128-d.
+
+As faces chegam sempre em 200x200; o LBPH reduz para o tamanho_face
+configurado (parametros.py) antes de extrair, e grava esse tamanho no YAML
+quando não é o padrão.
+
+compactar_galeria (LBPH) troca os histogramas por protótipos de cada
+cliente (galeria.py); o YAML gravado depois disso só tem os protótipos.
+"""
+import re
+
+import cv2
+import numpy as np
+
+from academia.reconhecimento.indice import distancias
+from academia.reconhecimento.galeria import GaleriaCompacta, compactar
+from academia.reconhecimento.lbph_vetorizado import histogramas
+
+BACKEND_PADRAO = 'lbph'
+
+
+class Reconhecedor:
+    """Interface comum; predict devolve (client_id, distancia), menor = melhor"""
+
+    nome = None
+    no_raiz = None
+    # (excelente, bom, aceitavel); None = CONFIDENCE_* do reconhece.py (LBPH)
+    limiares = None
+    # Distância usada pelo predict sobre os vetores (ver indice.py)
+    metrica = 'l2'
+    # Aceita amostras novas sem retreinar tudo (update do cv2.face)
+    suporta_update = False
+    # Monta o modelo a partir de blocos sem juntar todas as faces na memória
+    suporta_blocos = False
+    # compactar_galeria (protótipos por cliente, galeria.py)
+    suporta_prototipos = False
+
+    def train(self, faces, labels):
+        raise NotImplementedError
+
+    def predict(self, face):
+        raise NotImplementedError
+
+    def predict_varios(self, faces):
+        return [self.predict(face) for face in faces]
+
+    def configurar(self, parametros):
+        """Parâmetros do algoritmo (parametros.py); o padrão não tem nenhum"""
+
+    def parametros(self):
+        return {}
+
+    def treinar_em_blocos(self, blocos, vetores_em_disco=None):
+        """
+        Treina a partir de um gerador de (faces, rotulos). O padrão junta
+        tudo e chama train (sem limite de memória).
+        """
+        faces, labels = [], []
+        for bloco_faces, bloco_labels in blocos:
+            faces.extend(bloco_faces)
+            labels.extend(bloco_labels)
+        self.train(faces, labels)
+
+    def compactar_galeria(self, por_cliente, metodo='medoide'):
+        """Reduz a galeria a até `por_cliente` protótipos por cliente"""
+        raise NotImplementedError
+
+    def write(self, caminho):
+        raise NotImplementedError
+
+    def read(self, caminho):
+        raise NotImplementedError
+
+    def tamanho_galeria(self):
+        """Quantos vetores um predict compara"""
+        raise NotImplementedError
+
+    def extrair_vetor(self, face):
+        """Vetor de características da face (o que o predict compara)"""
+        raise NotImplementedError
+
+    def vetores_amostras(self):
+        """(vetores N x D float32, rotulos N) da galeria, para o índice"""
+        raise NotImplementedError
+
+
+class ReconhecedorOpenCV(Reconhecedor):
+    """Adapta um FaceRecognizer do cv2.face"""
+
+    def __init__(self):
+        self.modelo = self.criar()
+        self._galeria = 0
+
+    def criar(self):
+        raise NotImplementedError
+
+    def train(self, faces, labels):
+        self.modelo.train(faces, np.asarray(labels, dtype=np.int32))
+        self._galeria = len(faces)
+
+    def update(self, faces, labels):
+        self.modelo.update(faces, np.asarray(labels, dtype=np.int32))
+        self._galeria += len(faces)
+
+    def predict(self, face):
+        return self.modelo.predict(face)
+
+    def write(self, caminho):
+        self.modelo.write(str(caminho))
+
+    def read(self, caminho):
+        self.modelo.read(str(caminho))
+        self._galeria = len(self.modelo.getLabels())
+
+    def tamanho_galeria(self):
+        return self._galeria
+
+
+class ReconhecedorLBPH(ReconhecedorOpenCV):
+    nome = 'lbph'
+    no_raiz = 'opencv_lbphfaces'
+    metrica = 'chi2'
+    suporta_update = True
+    suporta_blocos = True
+    suporta_prototipos = True
+
+    TAMANHO_FACE_PADRAO = 200
+    RE_TAMANHO_FACE = re.compile(r'\n\s*tamanho_face: (\d+)')
+
+    def __init__(self):
+        self.tamanho_face = self.TAMANHO_FACE_PADRAO
+        self._raio, self._vizinhos, self._grade = 1, 8, 8
+        super().__init__()
+        # Treino em blocos: histogramas em VetoresEmDisco em vez do cv2
+        self._em_disco = None
+        self._rotulos_disco = None
+
+    def criar(self):
+        return cv2.face.LBPHFaceRecognizer_create(self._raio, self._vizinhos, self._grade, self._grade)
+
+    def configurar(self, parametros):
+        self.tamanho_face = int(parametros.get('tamanho_face', self.TAMANHO_FACE_PADRAO))
+        self._raio = int(parametros.get('raio', 1))
+        self._vizinhos = int(parametros.get('vizinhos', 8))
+        self._grade = int(parametros.get('grade', 8))
+        self.modelo = self.criar()
+
+    def parametros(self):
+        return {
+            'tamanho_face': self.tamanho_face,
+            'raio': self.modelo.getRadius(),
+            'vizinhos': self.modelo.getNeighbors(),
+            'grade': self.modelo.getGridX(),
+        }
+
+    def _reduzir(self, face):
+        if face.shape[0] == self.tamanho_face and face.shape[1] == self.tamanho_face:
+            return face
+        return cv2.resize(face, (self.tamanho_face, self.tamanho_face), interpolation=cv2.INTER_AREA)
+
+    def train(self, faces, labels):
+        super().train([self._reduzir(face) for face in faces], labels)
+
+    def update(self, faces, labels):
+        super().update([self._reduzir(face) for face in faces], labels)
+
+    def _histogramas(self, faces):
+        # O cv2 não expõe o histograma de uma consulta: a extração em NumPy
+        # dá os mesmos bits do getHistograms(), várias faces por chamada
+        return histogramas(np.stack([self._reduzir(face) for face in faces]),
+                           self.modelo.getRadius(), self.modelo.getNeighbors(),
+                           self.modelo.getGridX(), self.modelo.getGridY())
+
+    def extrair_vetor(self, face):
+        return self._histogramas([face])[0]
+
+    def treinar_em_blocos(self, blocos, vetores_em_disco=None):
+        if vetores_em_disco is None:
+            return super().treinar_em_blocos(blocos)
+        rotulos = []
+        for faces, labels in blocos:
+            vetores_em_disco.acrescentar(self._histogramas(faces))
+            rotulos.append(np.asarray(labels, dtype=np.int32))
+        self._em_disco = vetores_em_disco
+        self._rotulos_disco = np.concatenate(rotulos) if rotulos else np.zeros(0, dtype=np.int32)
+        self._galeria = len(self._rotulos_disco)
+
+    def compactar_galeria(self, por_cliente, metodo='medoide'):
+        vetores, rotulos = self.vetores_amostras()
+        prototipos, rotulos_prototipos = compactar(vetores, rotulos, por_cliente, metodo, self.metrica)
+        # Daqui em diante predict e write usam os protótipos, como no treino em blocos
+        self._em_disco = GaleriaCompacta(prototipos)
+        self._rotulos_disco = rotulos_prototipos
+        self._galeria = len(rotulos_prototipos)
+
+    def predict(self, face):
+        if self._em_disco is not None:
+            return self.predict_varios([face])[0]
+        return self.modelo.predict(self._reduzir(face))
+
+    def predict_varios(self, faces):
+        if self._em_disco is None:
+            return super().predict_varios(faces)
+        # Uma passada pelos histogramas em disco para todas as consultas
+        consultas = self._histogramas(faces) if len(faces) else []
+        melhores = [(-1, float('inf'))] * len(consultas)
+        for inicio, bloco in self._em_disco.blocos():
+            rotulos = self._rotulos_disco[inicio:inicio + len(bloco)]
+            for i, consulta in enumerate(consultas):
+                dist = distancias(bloco, consulta, self.metrica)
+                j = int(np.argmin(dist))
+                if dist[j] < melhores[i][1]:
+                    melhores[i] = (int(rotulos[j]), float(dist[j]))
+        return melhores
+
+    def write(self, caminho):
+        if self._em_disco is None and self.tamanho_face == self.TAMANHO_FACE_PADRAO:
+            return super().write(caminho)
+        # Mesmo YAML do LBPHFaceRecognizer::write, um histograma por vez
+        fs = cv2.FileStorage(str(caminho), cv2.FILE_STORAGE_WRITE)
+        fs.startWriteStruct(self.no_raiz, cv2.FileNode_MAP)
+        if self.tamanho_face != self.TAMANHO_FACE_PADRAO:
+            # Logo no início: o read acha sem analisar o arquivo inteiro (o cv2 ignora a chave)
+            fs.write('tamanho_face', self.tamanho_face)
+        fs.write('threshold', self.modelo.getThreshold())
+        fs.write('radius', self.modelo.getRadius())
+        fs.write('neighbors', self.modelo.getNeighbors())
+        fs.write('grid_x', self.modelo.getGridX())
+        fs.write('grid_y', self.modelo.getGridY())
+        fs.startWriteStruct('histograms', cv2.FileNode_SEQ)
+        if self._em_disco is not None:
+            for _, bloco in self._em_disco.blocos():
+                for histograma in bloco:
+                    fs.write('', histograma.reshape(1, -1))
+            rotulos = self._rotulos_disco
+        else:
+            for histograma in self.modelo.getHistograms():
+                fs.write('', histograma.reshape(1, -1))
+            rotulos = self.modelo.getLabels().ravel()
+        fs.endWriteStruct()
+        fs.write('labels', np.asarray(rotulos, dtype=np.int32).reshape(-1, 1))
+        fs.startWriteStruct('labelsInfo', cv2.FileNode_SEQ)
+        fs.endWriteStruct()
+        fs.endWriteStruct()
+        fs.release()
+
+    def read(self, caminho):
+        super().read(caminho)
+        with open(caminho, 'rb') as f:
+            inicio = f.read(512).decode('ascii', errors='ignore')
+        m = self.RE_TAMANHO_FACE.search(inicio)
+        self.tamanho_face = int(m.group(1)) if m else self.TAMANHO_FACE_PADRAO
+
+    def vetores_amostras(self):
+        if isinstance(self._em_disco, GaleriaCompacta):
+            return self._em_disco.vetores, self._rotulos_disco
+        if self._em_disco is not None:
+            return self._em_disco, self._rotulos_disco
+        histogramas = self.modelo.getHistograms()
+        vetores = np.stack([h.ravel() for h in histogramas]).astype(np.float32)
+        return vetores, self.modelo.getLabels().ravel().astype(np.int32)
+
+
+class ReconhecedorFisher(ReconhecedorOpenCV):
+    nome = 'fisher'
+    no_raiz = 'opencv_fisherfaces'
+    # Distância euclidiana no espaço LDA. A escala depende do dataset (número
+    # de clientes, iluminação), então estes valores são só um ponto de partida
+    # sem medição; calibre com avaliacao.py --impostores 1 --aplicar-limiares
+    limiares = (400, 700, 1000)
+
+    def criar(self):
+        return cv2.face.FisherFaceRecognizer_create()
+
+    def extrair_vetor(self, face):
+        # Projeção no espaço LDA: (x - média) . W, igual ao predict do cv2
+        amostra = face.reshape(1, -1).astype(np.float64)
+        projecao = (amostra - self.modelo.getMean()) @ self.modelo.getEigenVectors()
+        return projecao.ravel().astype(np.float32)
+
+    def vetores_amostras(self):
+        projecoes = self.modelo.getProjections()
+        vetores = np.stack([p.ravel() for p in projecoes]).astype(np.float32)
+        return vetores, self.modelo.getLabels().ravel().astype(np.int32)
+
+
+def _face_recognition():
+    try:
+        import face_recognition
+    except ImportError as e:
+        raise ImportError(
+            "Backend 'embeddings' precisa de face-recognition e dlib-bin "
+            "(pip install -r requirements.txt)"
+        ) from e
+    return face_recognition
+
+
+class ReconhecedorEmbeddings(Reconhecedor):
+    """
+    Um embedding 128-d por amostra no treino; no modelo fica só o centróide
+    de cada cliente. O predict custa um embedding (dlib) mais uma distância
+    contra a matriz (clientes x 128), independente do número de amostras.
+    """
+
+    nome = 'embeddings'
+    no_raiz = 'academia_embeddings'
+    # Distância euclidiana entre embeddings: 0.6 é a tolerance padrão do
+    # face_recognition (compare_faces), a do modelo do dlib no LFW; 0.5 e 0.4
+    # só apertam as faixas bom e excelente. Calibre no dataset da academia
+    # com avaliacao.py --impostores 1 --aplicar-limiares
+    limiares = (0.40, 0.50, 0.60)
+    suporta_blocos = True
+
+    def __init__(self):
+        self.centroides = np.zeros((0, 128), dtype=np.float32)
+        self.rotulos = np.zeros(0, dtype=np.int32)
+        # Embeddings por amostra do último treino (não vão para o arquivo)
+        self.amostras = None
+
+    def extrair(self, face):
+        """Embedding de um recorte de face (cinza ou BGR) já alinhado ao retângulo"""
+        face_recognition = _face_recognition()
+        if face.ndim == 2:
+            rgb = cv2.cvtColor(face, cv2.COLOR_GRAY2RGB)
+        else:
+            rgb = cv2.cvtColor(face, cv2.COLOR_BGR2RGB)
+        altura, largura = rgb.shape[:2]
+        # O recorte inteiro é a face: (top, right, bottom, left)
+        vetores = face_recognition.face_encodings(rgb, known_face_locations=[(0, largura, altura, 0)])
+        return np.asarray(vetores[0], dtype=np.float32)
+
+    def definir_galeria(self, embeddings, labels):
+        """Calcula os centróides por cliente a partir dos embeddings das amostras"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        labels = np.asarray(labels, dtype=np.int32)
+        self.amostras = (embeddings, labels)
+        self.rotulos = np.unique(labels)
+        self.centroides = np.stack([
+            embeddings[labels == rotulo].mean(axis=0) for rotulo in self.rotulos
+        ]).astype(np.float32)
+
+    def train(self, faces, labels):
+        self.definir_galeria([self.extrair(face) for face in faces], labels)
+
+    def treinar_em_blocos(self, blocos, vetores_em_disco=None):
+        # Só os embeddings (128 floats por amostra) ficam na memória
+        embeddings, labels = [], []
+        for faces, bloco_labels in blocos:
+            embeddings.extend(self.extrair(face) for face in faces)
+            labels.extend(bloco_labels)
+        self.definir_galeria(embeddings, labels)
+
+    def predict_embedding(self, embedding):
+        if len(self.rotulos) == 0:
+            return -1, float('inf')
+        distancias = np.linalg.norm(self.centroides - embedding, axis=1)
+        indice = int(np.argmin(distancias))
+        return int(self.rotulos[indice]), float(distancias[indice])
+
+    def predict(self, face):
+        return self.predict_embedding(self.extrair(face))
+
+    def write(self, caminho):
+        fs = cv2.FileStorage(str(caminho), cv2.FILE_STORAGE_WRITE)
+        fs.startWriteStruct(self.no_raiz, cv2.FileNode_MAP)
+        fs.write('centroides', self.centroides)
+        fs.write('rotulos', self.rotulos.reshape(-1, 1))
+        fs.endWriteStruct()
+        fs.release()
+
+    def read(self, caminho):
+        fs = cv2.FileStorage(str(caminho), cv2.FILE_STORAGE_READ)
+        try:
+            no = fs.getNode(self.no_raiz)
+            if no.empty():
+                raise cv2.error(f"{caminho}: nao e um modelo de embeddings")
+            self.centroides = np.ascontiguousarray(no.getNode('centroides').mat(), dtype=np.float32)
+            self.rotulos = no.getNode('rotulos').mat().reshape(-1).astype(np.int32)
+        finally:
+            fs.release()
+
+    def tamanho_galeria(self):
+        return len(self.rotulos)
+
+    def extrair_vetor(self, face):
+        return self.extrair(face)
+
+    def vetores_amostras(self):
+        if self.amostras is not None:
+            return self.amostras
+        # Modelo lido do disco só tem os centróides
+        return self.centroides, self.rotulos
+
+
+BACKENDS = {
+    classe.nome: classe
+    for classe in (ReconhecedorLBPH, ReconhecedorFisher, ReconhecedorEmbeddings)
+}
+
+
+def criar_reconhecedor(nome=BACKEND_PADRAO, parametros=None):
+    try:
+        recognizer = BACKENDS[nome]()
+    except KeyError:
+        raise ValueError(f"Backend desconhecido: {nome} (opcoes: {', '.join(BACKENDS)})")
+    if parametros:
+        recognizer.configurar(parametros)
+    return recognizer
+
+
+def identificar_backend(caminho):
+    """Nome do backend que gravou o arquivo (pelo nó raiz do YAML)"""
+    with open(caminho, 'rb') as f:
+        inicio = f.read(512).decode('ascii', errors='ignore')
+    for classe in BACKENDS.values():
+        if f"\n{classe.no_raiz}:" in inicio:
+            return classe.nome
+    return BACKEND_PADRAO
+
+
+def carregar_reconhecedor(caminho):
+    recognizer = criar_reconhecedor(identificar_backend(caminho))
+    recognizer.read(caminho)
+    return recognizer
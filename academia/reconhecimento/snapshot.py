@@ -0,0 +1,264 @@
+"""
+Snapshot binário do modelo: cabeçalho + arrays crus mapeáveis em memória.
+
+    python academia/reconhecimento/snapshot.py converter                  # trainer.yml -> trainer.snap
+    python academia/reconhecimento/snapshot.py converter --modelo academia/reconhecimento/modelos/trainer-<versao>.yml
+    python academia/reconhecimento/snapshot.py converter --fragmentos 4   # galeria em 4 fragmentos
+    python academia/reconhecimento/snapshot.py info                       # mostra o cabeçalho
+
+O trainer.yml do LBPH é texto: com galeria grande o cv2 leva segundos para
+ler e usa várias vezes a memória dos histogramas. O snapshot guarda os
+mesmos números em binário:
+
+    ACADSNAP | formato (uint32) | tamanho do cabeçalho (uint32) | cabeçalho JSON
+    ... arrays, cada um alinhado em ALINHAMENTO bytes (ordem C, little endian)
+
+O cabeçalho tem o formato, a versão do modelo, o backend, o hash do
+manifesto do treino, a tabela de clientes e onde está cada array. Ler é
+abrir um mmap e fazer views: não copia nada, então carrega em milissegundos
+e os processos que abrem o mesmo arquivo dividem as páginas no page cache.
+O treino publica com os.replace, então quem já mapeou a versão anterior
+continua lendo a dela.
+"""
+import os
+import re
+import sys
+import json
+import time
+import struct
+import hashlib
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+if __name__ == '__main__':
+    if sys.platform == 'win32':
+        import codecs
+        sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
+        sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, 'strict')
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+RECONHECIMENTO_DIR = Path(__file__).resolve().parent
+SNAPSHOT_PATH = RECONHECIMENTO_DIR / 'trainer.snap'
+MAGICA = b'ACADSNAP'
+FORMATO = 1
+PREFIXO = struct.Struct('<8sII')    # mágica, formato, bytes do cabeçalho
+ALINHAMENTO = 4096                  # página: cada array começa numa página própria
+
+
+def _alinhar(n):
+    return -(-n // ALINHAMENTO) * ALINHAMENTO
+
+
+def hash_manifesto(manifesto):
+    """sha256 das fotos que entraram no modelo (sem a versão, que muda a cada treino)"""
+    if not manifesto:
+        return None
+    conteudo = {chave: valor for chave, valor in manifesto.items() if chave != 'versao'}
+    return hashlib.sha256(json.dumps(conteudo, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def tabela_clientes(rotulos):
+    """[[client_id, amostras], ...] para o cabeçalho"""
+    clientes, contagem = np.unique(np.asarray(rotulos), return_counts=True)
+    return [[int(c), int(n)] for c, n in zip(clientes, contagem)]
+
+
+class Snapshot:
+    """Cabeçalho (dict) e arrays (views somente leitura do arquivo)"""
+
+    def __init__(self, caminho, cabecalho, arrays):
+        self.caminho = caminho
+        self.cabecalho = cabecalho
+        self.arrays = arrays
+
+    @property
+    def versao(self):
+        return self.cabecalho.get('versao')
+
+    @property
+    def backend(self):
+        return self.cabecalho.get('backend')
+
+
+def _posicoes(arrays, inicio):
+    """Descritores (dtype, shape, offset) a partir do byte `inicio`; devolve também o fim"""
+    descritores, posicao = {}, inicio
+    for nome, valor in arrays.items():
+        dtype, shape = (valor.dtype, valor.shape) if isinstance(valor, np.ndarray) else valor[:2]
+        dtype = np.dtype(dtype).newbyteorder('<')
+        descritores[nome] = {'dtype': dtype.str, 'shape': [int(n) for n in shape], 'offset': posicao}
+        posicao = _alinhar(posicao + dtype.itemsize * int(np.prod(shape)))
+    return descritores, posicao
+
+
+def gravar_snapshot(caminho, backend, arrays, versao=None, **cabecalho):
+    """
+    Grava o snapshot de forma atômica. `arrays` mapeia nome -> ndarray ou
+    (dtype, shape, preencher): preencher(destino) escreve direto no arquivo
+    mapeado, para arrays que não cabem (ou não estão) inteiros na memória.
+    """
+    caminho = Path(caminho)
+    dados = {'formato': FORMATO, 'versao': versao, 'backend': backend, **cabecalho}
+
+    # O cabeçalho diz onde os arrays começam e os arrays começam depois dele
+    inicio = 0
+    while True:
+        descritores, fim = _posicoes(arrays, inicio)
+        texto = json.dumps({**dados, 'arrays': descritores}, ensure_ascii=False).encode('utf-8')
+        necessario = _alinhar(PREFIXO.size + len(texto))
+        if necessario <= inicio:
+            break
+        inicio = necessario
+
+    temporario = caminho.with_name(f".{caminho.name}.tmp")
+    with open(temporario, 'wb') as f:
+        f.write(PREFIXO.pack(MAGICA, FORMATO, len(texto)))
+        f.write(texto)
+        f.truncate(fim)
+
+    if fim > inicio:
+        bruto = np.memmap(temporario, dtype=np.uint8, mode='r+')
+        for nome, valor in arrays.items():
+            d = descritores[nome]
+            tamanho = np.dtype(d['dtype']).itemsize * int(np.prod(d['shape']))
+            destino = bruto[d['offset']:d['offset'] + tamanho].view(d['dtype']).reshape(d['shape'])
+            if isinstance(valor, np.ndarray):
+                destino[...] = valor
+            else:
+                valor[2](destino)
+        bruto.flush()
+        del bruto
+    os.replace(temporario, caminho)
+
+
+def ler_snapshot(caminho=SNAPSHOT_PATH, mmap=True):
+    """Snapshot com os arrays mapeados (mmap=False lê tudo para a memória)"""
+    caminho = Path(caminho)
+    with open(caminho, 'rb') as f:
+        prefixo = f.read(PREFIXO.size)
+        if len(prefixo) < PREFIXO.size:
+            raise ValueError(f"{caminho}: arquivo truncado")
+        magica, formato, tamanho = PREFIXO.unpack(prefixo)
+        if magica != MAGICA:
+            raise ValueError(f"{caminho}: nao e um snapshot de modelo")
+        if formato > FORMATO:
+            raise ValueError(f"{caminho}: formato {formato} mais novo que o suportado ({FORMATO})")
+        cabecalho = json.loads(f.read(tamanho).decode('utf-8'))
+
+    descritores = cabecalho.pop('arrays')
+    fim = max((d['offset'] + np.dtype(d['dtype']).itemsize * int(np.prod(d['shape']))
+               for d in descritores.values()), default=0)
+    if os.path.getsize(caminho) < fim:
+        raise ValueError(f"{caminho}: arquivo truncado")
+
+    bruto = None
+    if fim:
+        bruto = np.memmap(caminho, dtype=np.uint8, mode='r') if mmap else np.fromfile(caminho, dtype=np.uint8)
+    arrays = {}
+    for nome, d in descritores.items():
+        tamanho = np.dtype(d['dtype']).itemsize * int(np.prod(d['shape']))
+        if tamanho == 0:
+            arrays[nome] = np.zeros(d['shape'], dtype=d['dtype'])
+            continue
+        arrays[nome] = bruto[d['offset']:d['offset'] + tamanho].view(d['dtype']).reshape(d['shape'])
+    return Snapshot(caminho, cabecalho, arrays)
+
+
+# ============================================================
+# CONVERSAO E INSPECAO
+# ============================================================
+
+def _versao_do_arquivo(caminho):
+    """Versão de um trainer.yml: a publicada (trainer.json) ou a do nome em modelos/"""
+    from academia.reconhecimento.modelo import TRAINER_PATH, ler_metadados
+    if Path(caminho).resolve() == TRAINER_PATH.resolve():
+        return ler_metadados().get('versao')
+    encontrado = re.match(r'trainer-(.+)\.yml$', Path(caminho).name)
+    return encontrado.group(1) if encontrado else None
+
+
+def converter(modelo, saida, fragmentos=1):
+    """Converte um trainer.yml do LBPH em snapshot; devolve (ms yml, ms snapshot) ou None"""
+    from academia.reconhecimento.modelo import carregar_modelo, ler_manifesto, ler_metadados
+    from academia.reconhecimento.lbph_vetorizado import GaleriaLBPH
+
+    inicio = time.perf_counter()
+    recognizer = carregar_modelo(modelo)
+    ms_yml = (time.perf_counter() - inicio) * 1000
+    if recognizer.nome != 'lbph':
+        # Só o YAML do LBPH cresce com as fotos; os outros já carregam rápido
+        print(f"[ERRO] {modelo}: backend {recognizer.nome} nao tem snapshot binario (so lbph)")
+        return None
+
+    versao = _versao_do_arquivo(modelo)
+    manifesto = ler_manifesto()
+    hash_ = hash_manifesto(manifesto) if versao and manifesto.get('versao') == versao else None
+    # Limiares calibrados: os do modelo carregado, ou os dos metadados da mesma versão
+    limiares = getattr(recognizer, 'limiares', None)
+    if limiares is None and versao and ler_metadados().get('versao') == versao:
+        limiares = ler_metadados().get('limiares')
+    vetores, rotulos = recognizer.vetores_amostras()
+    GaleriaLBPH.salvar(saida, vetores, rotulos, recognizer.parametros(), versao,
+                       fragmentos=fragmentos, manifesto=hash_,
+                       limiares=list(limiares) if limiares else None)
+
+    inicio = time.perf_counter()
+    galeria = GaleriaLBPH.carregar(saida)
+    ms_snapshot = (time.perf_counter() - inicio) * 1000
+    print(f"[OK] {saida}: {len(galeria)} amostras, versao {versao or '?'}"
+          f"{'' if hash_ else ' (sem manifesto da mesma versao)'}")
+    print(f"[INFO] Carga: trainer.yml {ms_yml:.0f} ms -> snapshot {ms_snapshot:.1f} ms | "
+          f"{os.path.getsize(modelo) / 1024 ** 2:.1f} MB -> {os.path.getsize(saida) / 1024 ** 2:.1f} MB")
+    return ms_yml, ms_snapshot
+
+
+def imprimir_info(caminho):
+    snapshot = ler_snapshot(caminho)
+    cab = snapshot.cabecalho
+    print(f"Arquivo:    {caminho} ({os.path.getsize(caminho) / 1024 ** 2:.1f} MB)")
+    print(f"Formato:    {cab['formato']}")
+    print(f"Versao:     {cab.get('versao')}")
+    print(f"Backend:    {cab.get('backend')}")
+    print(f"Manifesto:  {cab.get('manifesto') or '-'}")
+    print(f"Parametros: {cab.get('parametros')}")
+    print(f"Limiares:   {cab.get('limiares') or 'padrao do backend'}")
+    clientes = cab.get('clientes', [])
+    print(f"Clientes:   {len(clientes)} ({sum(n for _, n in clientes)} amostras)")
+    fragmentos = cab.get('fragmentos')
+    if fragmentos and len(fragmentos) > 1:
+        print(f"Fragmentos: {len(fragmentos)} ({', '.join(str(fim - inicio) for inicio, fim in fragmentos)} amostras)")
+    for nome, array in snapshot.arrays.items():
+        print(f"  {nome:10s} {str(array.dtype):8s} {'x'.join(map(str, array.shape))}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Snapshot binario do modelo de reconhecimento')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_conv = sub.add_parser('converter', help='Converte um trainer.yml (LBPH) em snapshot')
+    p_conv.add_argument('--modelo', default=str(RECONHECIMENTO_DIR / 'trainer.yml'))
+    p_conv.add_argument('--saida', default=str(SNAPSHOT_PATH))
+    p_conv.add_argument('--fragmentos', type=int, default=1,
+                        help='Divide a galeria em N fragmentos por cliente (busca paralela)')
+
+    p_info = sub.add_parser('info', help='Mostra o cabecalho de um snapshot')
+    p_info.add_argument('arquivo', nargs='?', default=str(SNAPSHOT_PATH))
+
+    args = parser.parse_args()
+
+    if args.comando == 'converter':
+        if not os.path.exists(args.modelo):
+            print(f"[ERRO] Modelo nao encontrado: {args.modelo}")
+            sys.exit(1)
+        if args.fragmentos < 1:
+            parser.error('--fragmentos precisa ser pelo menos 1')
+        if converter(args.modelo, args.saida, args.fragmentos) is None:
+            sys.exit(1)
+    else:
+        try:
+            imprimir_info(args.arquivo)
+        except (OSError, ValueError) as e:
+            print(f"[ERRO] {e}")
+            sys.exit(1)
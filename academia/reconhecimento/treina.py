@@ -1,6 +1,9 @@
 import os
 import sys
-import cv2
+import random
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import numpy as np
 from pathlib import Path
 
@@ -16,244 +19,605 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'academia.settings')
 import django
 django.setup()
 
+from django.conf import settings
 from gym.models import Cliente
+from academia.reconhecimento.dataset import processar_lote, dividir_em_lotes, resumir_cliente
+from academia.reconhecimento.modelo import salvar_modelo, carregar_modelo, ler_metadados, TRAINER_PATH
+from academia.reconhecimento.manifesto import (
+    escanear_dataset, decidir_modo, ler_cache_cliente, gravar_cache_cliente, limpar_cache,
+    ler_amostras_em_blocos,
+)
+from academia.reconhecimento.reconhecedores import criar_reconhecedor, BACKENDS, BACKEND_PADRAO
+from academia.reconhecimento.parametros import parametros_do_backend, ler_limiares, dimensao_lbph
+from academia.reconhecimento.galeria import custo_compactacao, config_prototipos, METODOS
+from academia.reconhecimento.indice import IndiceIVF, VetoresEmDisco, ler_removidos, tamanho_indice, INDICE_PATH
+from academia.reconhecimento.memoria import pico_rss, rss_atual, MB
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 dataset_dir = BASE_DIR / 'dataset'
-trainer_path = Path(__file__).resolve().parent / 'trainer.yml'
-
-print("\n" + "="*70)
-print("TREINAMENTO DO MODELO - DIAGNOSTICO COMPLETO")
-print("="*70 + "\n")
-
-# Detector
-detector = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-
-def analisar_imagem(img_path):
-    """Analisa qualidade da imagem"""
-    img = cv2.imread(str(img_path), cv2.IMREAD_GRAYSCALE)
-    
-    if img is None:
-        return None, "ERRO: Arquivo corrompido"
-    
-    # Calcula métricas
-    altura, largura = img.shape
-    brilho_medio = np.mean(img)
-    contraste = np.std(img)
-    
-    # Tenta detectar face
-    faces = detector.detectMultiScale(img, 1.1, 4)
-    tem_face = len(faces) > 0
-    
-    # Classifica qualidade
-    problemas = []
-    if brilho_medio < 50:
-        problemas.append("Muito escura")
-    elif brilho_medio > 200:
-        problemas.append("Muito clara")
-    
-    if contraste < 30:
-        problemas.append("Baixo contraste")
-    
-    if not tem_face:
-        problemas.append("Sem face detectada")
-    
-    qualidade = "OK" if not problemas else " | ".join(problemas)
-    
-    return img, qualidade
-
-def carregar_imagens():
+trainer_path = TRAINER_PATH
+histogramas_path = trainer_path.with_name('.treino.histogramas.f32')
+
+# Treino com orçamento de memória (valores medidos com o LBPH): o que cada
+# amostra custa enquanto o seu bloco é processado (face + imagem LBP e cópias
+# do histograma, 256*8*8 floats no padrão), o que fica até o fim (projeção
+# do índice, rótulo e lista) e a matriz de projeção do índice
+DIMENSAO_HISTOGRAMA = dimensao_lbph(parametros_do_backend('lbph'))
+BYTES_POR_AMOSTRA_NO_BLOCO = 200 * 200 + 6 * DIMENSAO_HISTOGRAMA * 4
+BYTES_POR_AMOSTRA_FIXOS = 256 * 4 + 4 + 4
+BYTES_FIXOS_INDICE = DIMENSAO_HISTOGRAMA * 256 * 4
+
+
+def etapa(nome):
+    """Marca de etapa (a fila de tarefas do Django acompanha por ela)"""
+    print(f"[ETAPA] {nome}")
+    sys.stdout.flush()
+
+
+def imprimir_cliente(resultado, nome, feitos, total_clientes, do_cache=False):
+    """Resumo de um cliente assim que o pool termina de analisá-lo"""
+    client_id = resultado['id']
+    origem = " (cache)" if do_cache else ""
+    print(f"\n{'='*70}")
+    print(f"[{feitos}/{total_clientes}] CLIENTE ID {client_id}: {nome}{origem}")
+    print(f"{'='*70}")
+
+    for mensagem in resultado['mensagens']:
+        print(mensagem)
+
+    total = resultado['total']
+    ok = resultado['ok']
+    falhas = resultado['falhas']
+    taxa = (ok / total * 100) if total > 0 else 0
+
+    print(f"\nRESUMO: {ok}/{total} OK ({taxa:.1f}%) | {falhas} falhas")
+
+    if taxa < 70:
+        print(f"[ATENCAO] Taxa baixa! Recapture com:")
+        print(f"  - Melhor iluminacao")
+        print(f"  - Face centralizada")
+        print(f"  - Sem sombras no rosto")
+    sys.stdout.flush()
+
+
+def separar_cache(client_id, arquivos_cliente, arquivos):
+    """
+    (registros do cache, fotos a analisar) de um cliente. Uma foto sai do
+    cache (memmap, sem decodificar) quando o hash do conteúdo bate.
+    """
+    entradas, amostras = ler_cache_cliente(client_id)
+    aproveitados = []
+    pendentes = []
+    for nome_arquivo in arquivos_cliente:
+        digest = arquivos[f"{client_id}/{nome_arquivo}"][2]
+        entrada = entradas.get(nome_arquivo)
+        linha = entrada.get('linha') if entrada else None
+        if (entrada and entrada['hash'] == digest
+                and (linha is None or (amostras is not None and linha < len(amostras)))):
+            face = None if linha is None else amostras[linha]
+            aproveitados.append((nome_arquivo, entrada['qualidade'], face))
+        else:
+            pendentes.append(dataset_dir / str(client_id) / nome_arquivo)
+    return entradas, aproveitados, pendentes
+
+
+def atualizar_cache(client_id, entradas, registros, arquivos):
+    """Regrava o cache do cliente e devolve os registros lidos do memmap novo"""
+    nomes_run = {arquivo for arquivo, _, _ in registros}
+    _, amostras = ler_cache_cliente(client_id)
+
+    completos = []
+    # Fotos do cache fora desta execução (treino incremental) continuam
+    for nome_arquivo, entrada in entradas.items():
+        if nome_arquivo in nomes_run or not (dataset_dir / str(client_id) / nome_arquivo).exists():
+            continue
+        linha = entrada.get('linha')
+        if linha is not None and (amostras is None or linha >= len(amostras)):
+            continue
+        face = None if linha is None else np.array(amostras[linha])
+        completos.append((nome_arquivo, entrada['hash'], entrada['qualidade'], face))
+    for nome_arquivo, qualidade, face in registros:
+        digest = arquivos[f"{client_id}/{nome_arquivo}"][2]
+        completos.append((nome_arquivo, digest, qualidade, None if face is None else np.array(face)))
+
+    # Nenhuma referência ao memmap antigo antes do os.replace (Windows)
+    del amostras, registros
+    gravar_cache_cliente(client_id, sorted(completos, key=lambda r: r[0]))
+
+    entradas, amostras = ler_cache_cliente(client_id)
+    return [
+        (nome_arquivo, entradas[nome_arquivo]['qualidade'],
+         None if entradas[nome_arquivo]['linha'] is None else amostras[entradas[nome_arquivo]['linha']])
+        for nome_arquivo in sorted(nomes_run)
+    ]
+
+
+def carregar_imagens(arquivos, workers=None, manter_faces=True):
+    """
+    Carrega as fotos de `arquivos` ({'<id>/<foto>.jpg': [tamanho, mtime_ns,
+    hash]}). Clientes sem mudança vêm direto do cache (memmap); o resto é
+    lido e analisado em paralelo (pool de processos sobre lotes de clientes)
+    e vai para o cache. Com manter_faces=False só atualiza o cache e devolve
+    as estatísticas (o treino em blocos lê as faces depois).
+    """
     face_samples = []
     ids = []
     stats = {}
-    
+
     if not dataset_dir.exists():
         print(f"[ERRO] Dataset nao encontrado: {dataset_dir}")
         return face_samples, ids, stats
-    
+
     print("Analisando dataset...\n")
-    
+
     for pasta_cliente in dataset_dir.iterdir():
-        if not pasta_cliente.is_dir():
-            continue
-        
-        try:
-            client_id = int(pasta_cliente.name)
-            cliente = Cliente.objects.get(id=client_id)
-        except:
+        if pasta_cliente.is_dir() and not pasta_cliente.name.isdigit():
             print(f"[AVISO] Ignorando pasta: {pasta_cliente.name}")
+
+    pastas = {}
+    for chave in sorted(arquivos):
+        client_id, nome_arquivo = chave.split('/', 1)
+        pastas.setdefault(int(client_id), []).append(nome_arquivo)
+
+    # Nomes de todos os clientes em uma consulta
+    nomes = dict(Cliente.objects.filter(id__in=pastas).values_list('id', 'nome'))
+    for client_id in sorted(pastas.keys() - nomes.keys()):
+        print(f"[AVISO] Ignorando pasta: {client_id} (cliente nao cadastrado)")
+
+    total_clientes = len(nomes)
+    resultados = {}
+    feitos = 0
+
+    def registrar(client_id, registros, do_cache=False):
+        nonlocal feitos
+        feitos += 1
+        resultado = resumir_cliente(client_id, registros)
+        if not manter_faces:
+            resultado['faces'] = []
+        resultados[client_id] = resultado
+        imprimir_cliente(resultado, nomes[client_id], feitos, total_clientes, do_cache)
+
+    entradas_cache = {}
+    aproveitados = {}
+    tarefas = []
+    for client_id in sorted(nomes):
+        entradas, registros, pendentes = separar_cache(client_id, pastas[client_id], arquivos)
+        entradas_cache[client_id] = entradas
+        aproveitados[client_id] = registros
+        if pendentes:
+            tarefas.append((client_id, pendentes))
+
+    fotos_pendentes = sum(len(pendentes) for _, pendentes in tarefas)
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(tarefas)) or 1
+    lotes = dividir_em_lotes(tarefas, workers)
+    print(f"[INFO] {total_clientes - len(tarefas)} cliente(s) do cache | "
+          f"{fotos_pendentes} foto(s) de {len(tarefas)} cliente(s) para analisar "
+          f"em {len(lotes)} lote(s), {workers} processo(s)")
+
+    pendentes_por_cliente = dict(tarefas)
+    for client_id in sorted(nomes):
+        if client_id in pendentes_por_cliente:
             continue
-        
-        print(f"\n{'='*70}")
-        print(f"CLIENTE ID {client_id}: {cliente.nome}")
-        print(f"{'='*70}")
-        
+        registros = aproveitados.pop(client_id)
+        entradas = entradas_cache.pop(client_id)
+        if any(not (dataset_dir / str(client_id) / nome_arquivo).exists() for nome_arquivo in entradas):
+            # Fotos apagadas desde o último treino: tira do cache
+            registros = atualizar_cache(client_id, entradas, registros, arquivos)
+        registrar(client_id, registros, do_cache=True)
+
+    def concluir(lote_resultado):
+        for client_id, registros in lote_resultado:
+            registros = atualizar_cache(client_id, entradas_cache.pop(client_id),
+                                        aproveitados.pop(client_id) + registros, arquivos)
+            registrar(client_id, registros)
+
+    if workers == 1:
+        for lote in lotes:
+            concluir(processar_lote(lote))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futuros = [pool.submit(processar_lote, lote) for lote in lotes]
+            for futuro in as_completed(futuros):
+                concluir(futuro.result())
+
+    # Ordem estável (por id), independente de qual processo terminou antes
+    for client_id in sorted(resultados):
+        resultado = resultados[client_id]
+        face_samples.extend(resultado['faces'])
+        ids.extend([client_id] * len(resultado['faces']))
         stats[client_id] = {
-            'nome': cliente.nome,
-            'total': 0,
-            'ok': 0,
-            'falhas': 0,
-            'problemas': []
+            'nome': nomes[client_id],
+            'total': resultado['total'],
+            'ok': resultado['ok'],
+            'falhas': resultado['falhas'],
+            'problemas': resultado['problemas'],
         }
-        
-        for img_file in sorted(pasta_cliente.glob('*.jpg')):
-            stats[client_id]['total'] += 1
-            
-            # Analisa imagem
-            gray, qualidade = analisar_imagem(img_file)
-            
-            if gray is None:
-                stats[client_id]['falhas'] += 1
-                stats[client_id]['problemas'].append(f"{img_file.name}: {qualidade}")
-                print(f"  [ERRO] {img_file.name}: {qualidade}")
-                continue
-            
-            if qualidade != "OK":
-                print(f"  [AVISO] {img_file.name}: {qualidade}")
-            
-            # Redimensiona (SEM outros processamentos)
-            gray = cv2.resize(gray, (200, 200))
-            
-            face_samples.append(gray)
-            ids.append(client_id)
-            stats[client_id]['ok'] += 1
-        
-        # Mostra resumo do cliente
-        total = stats[client_id]['total']
-        ok = stats[client_id]['ok']
-        falhas = stats[client_id]['falhas']
-        taxa = (ok / total * 100) if total > 0 else 0
-        
-        print(f"\nRESUMO: {ok}/{total} OK ({taxa:.1f}%) | {falhas} falhas")
-        
-        if taxa < 70:
-            print(f"[ATENCAO] Taxa baixa! Recapture com:")
-            print(f"  - Melhor iluminacao")
-            print(f"  - Face centralizada")
-            print(f"  - Sem sombras no rosto")
-    
+
     return face_samples, ids, stats
 
-# Carrega imagens
-face_samples, ids, stats = carregar_imagens()
 
-print(f"\n{'='*70}")
-print("ESTATISTICAS GERAIS")
-print(f"{'='*70}")
+def validar_modelo(recognizer, face_samples, ids, stats):
+    """Prediz algumas amostras de cada cliente e mostra a taxa de acerto"""
+    print(f"\n{'='*70}")
+    print("VALIDACAO INTERNA")
+    print(f"{'='*70}\n")
 
-if len(face_samples) < 10:
-    print(f"[ERRO] Apenas {len(face_samples)} imagens validas!")
-    print("[INFO] Necessario: Minimo 10 fotos por cliente")
-    print("[INFO] Recomendado: 50+ fotos por cliente")
-    print("\nSOLUCAO:")
-    print("1. Recapture com melhor qualidade")
-    print("2. Use boa iluminacao")
-    print("3. Centralize o rosto na camera")
-    sys.exit(1)
+    acertos = 0
+    erros = 0
+    detalhes_erros = []
 
-total_clientes = len(set(ids))
-total_faces = len(face_samples)
-media = total_faces / total_clientes
+    testes = {}
+    for client_id in sorted(set(ids)):
+        indices = [i for i, x in enumerate(ids) if x == client_id]
 
-print(f"Clientes: {total_clientes}")
-print(f"Faces validas: {total_faces}")
-print(f"Media: {media:.1f} por cliente")
+        if len(indices) < 3:
+            continue
 
-if media < 30:
-    print(f"\n[AVISO] Media baixa! Recapture mais fotos.")
+        testes[client_id] = random.sample(indices, min(5, len(indices)))
 
-# Lista todos os IDs únicos
-ids_unicos = sorted(set(ids))
-print(f"\nIDs que serao treinados: {ids_unicos}")
+    # Todas as consultas de uma vez (o LBPH treinado em blocos varre o disco uma vez só)
+    ordem = [idx for indices in testes.values() for idx in indices]
+    previsoes = dict(zip(ordem, recognizer.predict_varios([face_samples[idx] for idx in ordem])))
 
-# Mostra distribuição
-print(f"\nDistribuicao de faces por cliente:")
-from collections import Counter
-contagem = Counter(ids)
-for client_id in sorted(contagem.keys()):
-    cliente = Cliente.objects.get(id=client_id)
-    print(f"  ID {client_id:3d} ({cliente.nome:20s}): {contagem[client_id]:3d} fotos")
-
-print(f"\n{'='*70}")
-print("INICIANDO TREINAMENTO")
-print(f"{'='*70}\n")
-
-# Cria e treina reconhecedor
-recognizer = cv2.face.LBPHFaceRecognizer_create()
-
-print(f"[INFO] Treinando com {len(face_samples)} amostras...")
-recognizer.train(face_samples, np.array(ids))
-print(f"[OK] Treinamento concluido!")
-
-# Salva modelo
-trainer_path.parent.mkdir(parents=True, exist_ok=True)
-print(f"\n[INFO] Salvando modelo em: {trainer_path}")
-recognizer.write(str(trainer_path))
-
-if trainer_path.exists():
-    tamanho = trainer_path.stat().st_size
-    print(f"[OK] Modelo salvo! ({tamanho} bytes)")
-else:
-    print(f"[ERRO] Arquivo nao foi criado!")
-    sys.exit(1)
-
-# TESTE INTERNO
-print(f"\n{'='*70}")
-print("VALIDACAO INTERNA")
-print(f"{'='*70}\n")
-
-acertos = 0
-erros = 0
-detalhes_erros = []
-
-for client_id in ids_unicos:
-    indices = [i for i, x in enumerate(ids) if x == client_id]
-    
-    if len(indices) < 3:
-        continue
-    
-    import random
-    test_indices = random.sample(indices, min(5, len(indices)))
-    
-    cliente = Cliente.objects.get(id=client_id)
-    
-    print(f"\nTestando ID {client_id} ({cliente.nome}):")
-    
-    for idx in test_indices:
-        sample = face_samples[idx]
-        pred_id, confidence = recognizer.predict(sample)
-        
-        if pred_id == client_id:
-            acertos += 1
-            status = "[OK]"
+    for client_id, test_indices in testes.items():
+        print(f"\nTestando ID {client_id} ({stats[client_id]['nome']}):")
+
+        for idx in test_indices:
+            pred_id, confidence = previsoes[idx]
+
+            if pred_id == client_id:
+                acertos += 1
+                status = "[OK]"
+            else:
+                erros += 1
+                status = "[ERRO]"
+                detalhes_erros.append(f"ID {client_id} previsto como {pred_id} (conf: {confidence:.1f})")
+
+            print(f"  {status} Previu: ID {pred_id:3d} | Confianca: {confidence:5.1f}")
+
+    taxa_acerto = (acertos / (acertos + erros) * 100) if (acertos + erros) > 0 else 0
+
+    print(f"\n{'='*70}")
+    print(f"RESULTADO FINAL: {acertos} acertos / {erros} erros ({taxa_acerto:.1f}%)")
+    print(f"{'='*70}")
+    print("[INFO] Amostras do proprio treino; acuracia real, FAR/FRR e latencia: "
+          "python academia/reconhecimento/avaliacao.py")
+
+    if erros > 0:
+        print(f"\nERROS DETALHADOS:")
+        for erro in detalhes_erros:
+            print(f"  - {erro}")
+
+    if acertos + erros == 0:
+        print("\n[INFO] Poucas amostras por cliente para validar (minimo 3).")
+    elif taxa_acerto >= 90:
+        print("\n[OK] EXCELENTE! Modelo pronto.")
+    elif taxa_acerto >= 70:
+        print("\n[AVISO] ACEITAVEL. Pode funcionar, mas considere recapturar.")
+    else:
+        print("\n[ERRO] RUIM! Recapture TODAS as fotos!")
+        print("\nDICAS:")
+        print("  - Use iluminacao uniforme")
+        print("  - Evite sombras no rosto")
+        print("  - Centralize a face")
+        print("  - Faca pequenas variacoes de angulo")
+
+    print(f"\n{'='*70}\n")
+
+
+def tamanho_bloco(orcamento, total_amostras):
+    """Amostras por bloco que cabem no orçamento (bytes); None se nem uma cabe"""
+    livre = (orcamento - rss_atual() - BYTES_FIXOS_INDICE
+             - total_amostras * BYTES_POR_AMOSTRA_FIXOS)
+    if livre < BYTES_POR_AMOSTRA_NO_BLOCO:
+        return None
+    return int(min(total_amostras, livre // BYTES_POR_AMOSTRA_NO_BLOCO))
+
+
+def galeria_vetorizada(recognizer, removidos=()):
+    """(vetores, rotulos) da busca vetorizada do reconhece.py; só o LBPH tem"""
+    if recognizer.nome != 'lbph':
+        return None
+    vetores, rotulos = recognizer.vetores_amostras()
+    if removidos:
+        # No incremental o cv2 ainda tem os clientes com lápide
+        manter = ~np.isin(rotulos, list(removidos))
+        vetores, rotulos = vetores[manter], rotulos[manter]
+    return vetores, rotulos
+
+
+def compactar_galeria(recognizer, config):
+    """Reduz a galeria a protótipos por cliente e mostra o custo em acurácia"""
+    print(f"\n[INFO] Compactando galeria: ate {config['por_cliente']} prototipo(s) "
+          f"({config['metodo']}) por cliente")
+    vetores, rotulos = recognizer.vetores_amostras()
+    bytes_antes = vetores.shape[0] * vetores.shape[1] * 4
+    custo = custo_compactacao(vetores, rotulos, config['por_cliente'], config['metodo'], recognizer.metrica)
+    recognizer.compactar_galeria(config['por_cliente'], config['metodo'])
+    prototipos, _ = recognizer.vetores_amostras()
+    print(f"[OK] {len(rotulos)} amostras -> {len(prototipos)} prototipos float16 "
+          f"({bytes_antes / MB:.1f} MB -> {prototipos.nbytes / MB:.1f} MB)")
+    if custo:
+        print(f"[INFO] Custo em acuracia (top-1 em {custo['consultas']} amostras separadas de "
+              f"{custo['clientes']} clientes): {custo['acuracia_completa'] * 100:.2f}% -> "
+              f"{custo['acuracia_compacta'] * 100:.2f}%")
+    else:
+        print("[AVISO] Poucas amostras por cliente para medir o custo da compactacao")
+    return {'config': config, 'amostras': int(len(rotulos)), 'prototipos': int(len(prototipos)), 'custo': custo}
+
+
+def amostras_validacao(arquivos, contagem, max_clientes=20, por_cliente=5):
+    """Algumas faces de alguns clientes, lidas do cache, para validar o treino em blocos"""
+    por_id = {}
+    for chave in arquivos:
+        por_id.setdefault(int(chave.split('/', 1)[0]), []).append(chave)
+
+    clientes = [client_id for client_id in sorted(contagem) if contagem[client_id] >= 3]
+    clientes = random.sample(clientes, min(max_clientes, len(clientes)))
+    escolhidas = {}
+    for client_id in clientes:
+        for chave in random.sample(por_id[client_id], min(por_cliente, len(por_id[client_id]))):
+            escolhidas[chave] = arquivos[chave]
+
+    face_samples, ids = [], []
+    for faces, rotulos in ler_amostras_em_blocos(escolhidas, clientes, max(1, len(escolhidas))):
+        face_samples.extend(faces)
+        ids.extend(rotulos.tolist())
+    return face_samples, ids
+
+
+def imprimir_memoria(orcamento=None):
+    """Pico de RSS do treino, para dimensionar o servidor"""
+    texto = f"[INFO] Pico de memoria (RSS): {pico_rss() / MB:.0f} MB"
+    if orcamento:
+        texto += f" (orcamento {orcamento / MB:.0f} MB)"
+    print(texto)
+    if orcamento and pico_rss() > orcamento:
+        print("[AVISO] Pico acima do orcamento: importacoes ou leitura do dataset ja passam do limite")
+
+
+def treinar(backend, completo=False, workers=None, memoria_mb=None, prototipos=None, metodo_prototipos='medoide',
+            fragmentos=1):
+    """
+    Treino completo ou incremental; devolve a versão publicada (ou None).
+    Com memoria_mb o treino completo lê as amostras do cache em blocos que
+    cabem no orçamento em vez de juntar todas numa lista. Com prototipos a
+    galeria é compactada (galeria.py) antes de salvar. Com fragmentos > 1 o
+    snapshot do LBPH é dividido por cliente para a busca paralela (fragmentos.py).
+    """
+    print("\n" + "="*70)
+    print("TREINAMENTO DO MODELO - DIAGNOSTICO COMPLETO")
+    print("="*70 + "\n")
+
+    # Decide entre treino completo e incremental (só fotos novas)
+    etapa('varredura')
+    config = config_prototipos(prototipos, metodo_prototipos)
+    if config and not BACKENDS[backend].suporta_prototipos:
+        print(f"[AVISO] Backend {backend} nao tem galeria compactavel; ignorando --prototipos\n")
+        config = None
+    arquivos_atuais = escanear_dataset(dataset_dir)
+    modo, motivo, novos = decidir_modo(arquivos_atuais, backend, completo, prototipos=config,
+                                       fragmentos=fragmentos)
+    print(f"[INFO] Modo: {modo.upper()} ({motivo})\n")
+
+    if modo == 'nada':
+        print("[OK] Modelo ja esta atualizado. Use --completo para retreinar tudo.")
+        return None
+
+    orcamento = memoria_mb * MB if memoria_mb else None
+    if orcamento and modo == 'incremental' and INDICE_PATH.exists():
+        # O update() carrega o modelo e o índice atuais inteiros
+        if rss_atual() + 2 * tamanho_indice(INDICE_PATH) > orcamento:
+            modo = 'completo'
+            print(f"[INFO] Modo: COMPLETO (modelo atual nao cabe em {memoria_mb} MB para update())\n")
+
+    incremental = modo == 'incremental'
+    em_blocos = bool(orcamento) and not incremental
+    if em_blocos and not BACKENDS[backend].suporta_blocos:
+        print(f"[AVISO] Backend {backend} precisa de todas as amostras juntas; ignorando --memoria-mb\n")
+        em_blocos = False
+
+    # Carrega imagens (do cache quando o conteúdo não mudou)
+    etapa('leitura')
+    if incremental:
+        face_samples, ids, stats = carregar_imagens(
+            {chave: arquivos_atuais[chave] for chave in novos}, workers=workers)
+    else:
+        limpar_cache({int(chave.split('/', 1)[0]) for chave in arquivos_atuais})
+        face_samples, ids, stats = carregar_imagens(
+            arquivos_atuais, workers=workers, manter_faces=not em_blocos)
+
+    # Faces válidas por cliente (no treino em blocos as faces ainda não foram lidas)
+    contagem = Counter({client_id: s['ok'] for client_id, s in stats.items() if s['ok']})
+    total_faces = sum(contagem.values())
+
+    print(f"\n{'='*70}")
+    print("ESTATISTICAS GERAIS")
+    print(f"{'='*70}")
+
+    if incremental and not total_faces:
+        print("[AVISO] Nenhuma das fotos novas e valida; nada a atualizar")
+        return None
+
+    if not incremental and total_faces < 10:
+        print(f"[ERRO] Apenas {total_faces} imagens validas!")
+        print("[INFO] Necessario: Minimo 10 fotos por cliente")
+        print("[INFO] Recomendado: 50+ fotos por cliente")
+        print("\nSOLUCAO:")
+        print("1. Recapture com melhor qualidade")
+        print("2. Use boa iluminacao")
+        print("3. Centralize o rosto na camera")
+        sys.exit(1)
+
+    total_clientes = len(contagem)
+    media = total_faces / total_clientes
+
+    print(f"Clientes: {total_clientes}")
+    print(f"Faces validas: {total_faces}")
+    print(f"Media: {media:.1f} por cliente")
+
+    if media < 30:
+        print(f"\n[AVISO] Media baixa! Recapture mais fotos.")
+
+    # Lista todos os IDs únicos
+    ids_unicos = sorted(contagem)
+    print(f"\nIDs que serao treinados: {ids_unicos}")
+
+    # Mostra distribuição
+    print(f"\nDistribuicao de faces por cliente:")
+    for client_id in sorted(contagem.keys()):
+        print(f"  ID {client_id:3d} ({stats[client_id]['nome']:20s}): {contagem[client_id]:3d} fotos")
+
+    etapa('treino')
+    print(f"\n{'='*70}")
+    print("INICIANDO TREINAMENTO")
+    print(f"{'='*70}\n")
+
+    metadados_anteriores = ler_metadados()
+    vetores_disco = None
+    info_prototipos = None
+
+    if incremental:
+        # Só as amostras novas entram no modelo atual (LBPH update())
+        recognizer = carregar_modelo(trainer_path)
+        print(f"[INFO] Backend: {recognizer.nome} | modelo atual: versao {metadados_anteriores.get('versao')}")
+        print(f"[INFO] Atualizando com {len(face_samples)} amostras novas...")
+        recognizer.update(face_samples, np.array(ids))
+        print(f"[OK] Atualizacao concluida!")
+
+        indice = None
+        if INDICE_PATH.exists():
+            indice = IndiceIVF.carregar(INDICE_PATH)
+            if indice.versao != metadados_anteriores.get('versao'):
+                indice = None
+        if indice is not None:
+            novos_vetores = np.stack([recognizer.extrair_vetor(face) for face in face_samples])
+            indice.adicionar(novos_vetores, ids)
+            indice.compactar()  # lápides viram remoção de fato no arquivo novo
+        else:
+            vetores, rotulos = recognizer.vetores_amostras()
+            indice = IndiceIVF.construir(vetores, rotulos, metrica=recognizer.metrica)
+        print(f"[INFO] Indice IVF: {len(indice)} amostras em {len(indice.centroides)} listas")
+        galeria = galeria_vetorizada(recognizer, ler_removidos())
+
+        total_amostras = metadados_anteriores.get('amostras', 0) + len(face_samples)
+        clientes_modelo = sorted(set(metadados_anteriores.get('clientes', [])) | set(ids_unicos))
+    else:
+        # Cria e treina reconhecedor
+        recognizer = criar_reconhecedor(backend, parametros_do_backend(backend))
+
+        if recognizer.nome == 'fisher' and total_clientes < 2:
+            print("[ERRO] Fisherfaces precisa de pelo menos 2 clientes no dataset")
+            sys.exit(1)
+
+        print(f"[INFO] Backend: {recognizer.nome}")
+        if recognizer.parametros():
+            print(f"[INFO] Parametros: {recognizer.parametros()}")
+        print(f"[INFO] Treinando com {total_faces} amostras...")
+        if em_blocos:
+            bloco = tamanho_bloco(orcamento, total_faces)
+            if bloco is None:
+                print(f"[ERRO] Orcamento de {memoria_mb} MB insuficiente: "
+                      f"{rss_atual() / MB:.0f} MB ja em uso antes do treino")
+                sys.exit(1)
+            print(f"[INFO] Blocos de {bloco} amostras "
+                  f"(~{bloco * BYTES_POR_AMOSTRA_NO_BLOCO / MB:.0f} MB por bloco, orcamento {memoria_mb} MB)")
+            vetores_disco = VetoresEmDisco(histogramas_path, linhas_por_bloco=bloco)
+            recognizer.treinar_em_blocos(
+                ler_amostras_em_blocos(arquivos_atuais, contagem, bloco), vetores_disco)
         else:
-            erros += 1
-            status = "[ERRO]"
-            detalhes_erros.append(f"ID {client_id} previsto como {pred_id} (conf: {confidence:.1f})")
-        
-        print(f"  {status} Previu: ID {pred_id:3d} | Confianca: {confidence:5.1f}")
-
-taxa_acerto = (acertos / (acertos + erros) * 100) if (acertos + erros) > 0 else 0
-
-print(f"\n{'='*70}")
-print(f"RESULTADO FINAL: {acertos} acertos / {erros} erros ({taxa_acerto:.1f}%)")
-print(f"{'='*70}")
-
-if erros > 0:
-    print(f"\nERROS DETALHADOS:")
-    for erro in detalhes_erros:
-        print(f"  - {erro}")
-
-if taxa_acerto >= 90:
-    print("\n[OK] EXCELENTE! Modelo pronto.")
-elif taxa_acerto >= 70:
-    print("\n[AVISO] ACEITAVEL. Pode funcionar, mas considere recapturar.")
-else:
-    print("\n[ERRO] RUIM! Recapture TODAS as fotos!")
-    print("\nDICAS:")
-    print("  - Use iluminacao uniforme")
-    print("  - Evite sombras no rosto")
-    print("  - Centralize a face")
-    print("  - Faca pequenas variacoes de angulo")
-
-print(f"\n{'='*70}\n")
\ No newline at end of file
+            recognizer.train(face_samples, np.array(ids))
+        print(f"[OK] Treinamento concluido!")
+
+        if config:
+            etapa('compactacao')
+            info_prototipos = compactar_galeria(recognizer, config)
+
+        # Índice IVF sobre os vetores por amostra (ou protótipos) (busca aproximada no reconhece.py)
+        vetores, rotulos = recognizer.vetores_amostras()
+        indice = IndiceIVF.construir(vetores, rotulos, metrica=recognizer.metrica)
+        print(f"[INFO] Indice IVF: {len(indice)} amostras em {len(indice.centroides)} listas")
+        galeria = galeria_vetorizada(recognizer)
+
+        total_amostras = total_faces
+        clientes_modelo = ids_unicos
+
+    # Limiares calibrados (parametros.json) vão no modelo; sem eles valem os do backend
+    limiares = ler_limiares(recognizer.nome)
+    if limiares:
+        recognizer.limiares = limiares
+        print(f"[INFO] Limiares calibrados: {limiares}")
+
+    # Salva modelo (nova versão + troca atômica do trainer.yml;
+    # o reconhece.py em execução recarrega sozinho)
+    etapa('salvando')
+    print(f"\n[INFO] Salvando modelo em: {trainer_path}")
+    versao = salvar_modelo(
+        recognizer,
+        indice=indice,
+        galeria=galeria,
+        fragmentos=fragmentos,
+        manifesto={'backend': recognizer.nome, 'arquivos': arquivos_atuais},
+        backend=recognizer.nome,
+        parametros=recognizer.parametros(),
+        limiares=list(limiares) if limiares else None,
+        prototipos=info_prototipos,
+        modo=modo,
+        amostras=total_amostras,
+        clientes=clientes_modelo,
+    )
+
+    if trainer_path.exists():
+        tamanho = trainer_path.stat().st_size
+        print(f"[OK] Modelo salvo! Versao {versao} ({tamanho} bytes)")
+    else:
+        print(f"[ERRO] Arquivo nao foi criado!")
+        sys.exit(1)
+
+    # TESTE INTERNO
+    etapa('validacao')
+    if em_blocos:
+        face_samples, ids = amostras_validacao(arquivos_atuais, contagem)
+    validar_modelo(recognizer, face_samples, ids, stats)
+
+    if vetores_disco is not None:
+        vetores_disco.remover()
+    imprimir_memoria(orcamento)
+    return versao
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backend', choices=sorted(BACKENDS),
+                        default=getattr(settings, 'RECONHECIMENTO_BACKEND', BACKEND_PADRAO),
+                        help='Algoritmo do reconhecedor (padrao: settings.RECONHECIMENTO_BACKEND)')
+    parser.add_argument('--completo', action='store_true',
+                        help='Retreina tudo mesmo sem fotos removidas/alteradas')
+    parser.add_argument('--workers', type=int,
+                        help='Processos para ler/analisar o dataset (padrao: nucleos da CPU)')
+    parser.add_argument('--memoria-mb', type=int,
+                        default=getattr(settings, 'TREINO_MEMORIA_MB', None),
+                        help='Orcamento de memoria do treino em blocos (padrao: settings.TREINO_MEMORIA_MB)')
+    parser.add_argument('--prototipos', type=int,
+                        default=getattr(settings, 'TREINO_PROTOTIPOS', None),
+                        help='Compacta a galeria em ate N prototipos por cliente (padrao: settings.TREINO_PROTOTIPOS)')
+    parser.add_argument('--metodo-prototipos', choices=METODOS,
+                        default=getattr(settings, 'TREINO_PROTOTIPOS_METODO', 'medoide'))
+    parser.add_argument('--fragmentos', type=int,
+                        default=getattr(settings, 'TREINO_FRAGMENTOS', 1),
+                        help='Divide a galeria do LBPH em N fragmentos buscados em paralelo '
+                             '(padrao: settings.TREINO_FRAGMENTOS)')
+    args = parser.parse_args()
+
+    if args.prototipos is not None and args.prototipos < 1:
+        parser.error('--prototipos precisa ser pelo menos 1')
+    if args.fragmentos < 1:
+        parser.error('--fragmentos precisa ser pelo menos 1')
+    treinar(args.backend, completo=args.completo, workers=args.workers, memoria_mb=args.memoria_mb,
+            prototipos=args.prototipos, metodo_prototipos=args.metodo_prototipos, fragmentos=args.fragmentos)
+
+
+# Guarda necessária: o pool de processos reimporta este módulo (Windows)
+if __name__ == '__main__':
+    main()
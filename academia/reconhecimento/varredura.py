@@ -0,0 +1,301 @@
+"""
+Varredura dos parâmetros do LBPH (tamanho do recorte, raio, vizinhos, grade).
+
+    python academia/reconhecimento/varredura.py                         # grade padrão
+    python academia/reconhecimento/varredura.py --tamanhos 200 120 80 --grades 8 6
+    python academia/reconhecimento/varredura.py --aplicar melhor        # mede e grava a escolha
+    python academia/reconhecimento/varredura.py --de benchmark/varreduras/<arquivo>.json --aplicar 3
+
+Cada combinação treina no mesmo holdout (avaliacao.py) e prediz as amostras
+separadas; as combinações rodam em paralelo num pool de processos. A tabela
+marca com * as combinações da fronteira de Pareto: nenhuma outra é ao mesmo
+tempo mais precisa, mais rápida no predict e menor na memória.
+
+A escala da distância muda com os parâmetros (a grade e os vizinhos mudam
+o tamanho do histograma), então cada combinação tem os próprios limiares,
+calibrados no holdout para o FAR alvo (--far-alvo, calibrar_limiares do
+avaliacao.py). FAR e FRR da tabela são no limiar aceitavel calibrado.
+
+--aplicar grava a combinação e os limiares dela em parametros.json; o
+próximo treino percebe a mudança, retreina tudo e grava os limiares no
+modelo.
+"""
+import os
+import sys
+import json
+import argparse
+import itertools
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+if sys.platform == 'win32':
+    import codecs
+    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
+    sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, 'strict')
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'academia.settings')
+import django
+django.setup()
+
+from academia.reconhecimento import reconhece
+from academia.reconhecimento.avaliacao import (
+    _iniciar_worker, avaliar_fold, dividir_holdout, impostores_do_fold, taxas, curva_far_frr, percentis,
+    calibrar_limiares, FAR_ALVO,
+)
+from academia.reconhecimento.treina import carregar_imagens, dataset_dir
+from academia.reconhecimento.manifesto import escanear_dataset
+from academia.reconhecimento.parametros import (
+    PADRAO_LBPH, PARAMETROS_PATH, dimensao_lbph, ler_parametros, ler_limiares, gravar_parametros,
+)
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+SAIDA_PADRAO = BASE_DIR / 'benchmark' / 'varreduras'
+
+
+def combinacoes(tamanhos, raios, vizinhos, grades):
+    """Grade de parâmetros, sem combinações que o LBPH não aceita"""
+    for tamanho, raio, n, grade in itertools.product(tamanhos, raios, vizinhos, grades):
+        # Cada célula precisa de pixels além da borda de `raio` que o LBP descarta
+        if (tamanho - 2 * raio) // grade < 4:
+            print(f"[AVISO] Ignorando tamanho {tamanho} com grade {grade} e raio {raio}: celulas pequenas demais")
+            continue
+        yield {'tamanho_face': tamanho, 'raio': raio, 'vizinhos': n, 'grade': grade}
+
+
+def medir(treino, teste, fora_da_galeria, parametros):
+    """Tarefa do pool: avalia uma combinação no holdout"""
+    resultado = avaliar_fold('lbph', 0, treino, teste, fora_da_galeria, parametros)
+    resultado['parametros'] = parametros
+    return resultado
+
+
+def resumir(resultado, far_alvo=FAR_ALVO):
+    """Linha da tabela a partir das tentativas de uma combinação"""
+    tentativas = resultado['tentativas']
+    reais = np.array([t[0] for t in tentativas])
+    previstos = np.array([t[1] for t in tentativas])
+    distancias = np.array([t[2] for t in tentativas])
+    impostora = np.array([t[4] for t in tentativas], dtype=bool)
+    genuinas = ~impostora
+
+    padrao = reconhece.limiares_do_modelo(None)
+    limiares = calibrar_limiares(reais, previstos, distancias, impostora, padrao, far_alvo)
+    calibrado = limiares is not None
+    if not calibrado:
+        # Nenhum erro possível no holdout: não há o que calibrar
+        limiares = padrao
+    far, frr = taxas(reais, previstos, distancias, impostora, limiares[-1])
+    _, eer = curva_far_frr(reais, previstos, distancias, impostora, limiares)
+    parametros = resultado['parametros']
+    return {
+        'parametros': parametros,
+        'acuracia_top1': round(float((previstos[genuinas] == reais[genuinas]).mean()), 5),
+        'limiares': list(limiares),
+        'calibrado': calibrado,
+        'far_aceitavel': round(far, 5),
+        'frr_aceitavel': round(frr, 5),
+        'eer': eer,
+        'latencia_predict_ms': percentis([t[3] for t in tentativas]),
+        'treino_s': round(resultado['treino_s'], 3),
+        # Histogramas float32 da galeria: o que o predict percorre e o que fica na RAM
+        'modelo_bytes': dimensao_lbph(parametros) * 4 * resultado['galeria'],
+    }
+
+
+def marcar_pareto(linhas):
+    """pareto=True em quem nenhuma outra linha domina (acurácia maior, latência e tamanho menores)"""
+    def chave(linha):
+        return (-linha['acuracia_top1'], linha['latencia_predict_ms']['p50'], linha['modelo_bytes'])
+
+    for linha in linhas:
+        a = chave(linha)
+        linha['pareto'] = not any(
+            all(x <= y for x, y in zip(chave(outra), a)) and chave(outra) != a
+            for outra in linhas
+        )
+
+
+def escolher_melhor(linhas):
+    """Da fronteira: maior acurácia, depois menor EER, menor latência"""
+    fronteira = [l for l in linhas if l['pareto']] or linhas
+    return min(fronteira, key=lambda l: (-l['acuracia_top1'], l['eer']['taxa'], l['latencia_predict_ms']['p50']))
+
+
+def varrer(grade, holdout=0.2, impostores=0, workers=None, semente=0, far_alvo=FAR_ALVO):
+    arquivos = escanear_dataset(dataset_dir)
+    faces, ids, _ = carregar_imagens(arquivos, workers)
+    if not faces:
+        print("[ERRO] Nenhuma face valida no dataset!")
+        return None
+
+    ids = np.asarray(ids, dtype=np.int64)
+    clientes = sorted(int(c) for c in np.unique(ids))
+    if len(clientes) - impostores < 1:
+        print(f"[ERRO] --impostores {impostores} deixa a galeria vazia ({len(clientes)} cliente(s) no dataset)")
+        return None
+
+    # O mesmo holdout para todas as combinações: as diferenças são só dos parâmetros
+    fold = dividir_holdout(ids, holdout, semente)
+    treino, teste = np.flatnonzero(fold == 1), np.flatnonzero(fold == 0)
+    fora = impostores_do_fold(clientes, 0, impostores)
+
+    grade = list(grade)
+    workers = min(workers or os.cpu_count() or 1, len(grade))
+    print(f"\n[INFO] Varredura: {len(grade)} combinacao(oes), {len(faces)} amostras de {len(clientes)} cliente(s), "
+          f"holdout {holdout}, {impostores} impostor(es), {workers} processo(s)")
+    if workers > 1:
+        print("[INFO] Combinacoes em paralelo disputam a CPU: para latencia limpa use --workers 1")
+    if not impostores:
+        print("[AVISO] Sem --impostores o FAR so conta trocas de identidade entre clientes da galeria; "
+              "para calibrar os limiares use --impostores 1 ou mais")
+
+    faces = np.stack(faces)
+    resultados = []
+
+    def concluir(feitas, resultado):
+        if 'erro' in resultado:
+            print(f"[{feitas}/{len(grade)}] {resultado['parametros']}: [ERRO] {resultado['erro']}")
+            return
+        linha = resumir(resultado, far_alvo)
+        resultados.append(linha)
+        print(f"[{feitas}/{len(grade)}] {linha['parametros']}: acuracia {linha['acuracia_top1'] * 100:.2f}%, "
+              f"predict p50 {linha['latencia_predict_ms']['p50']:.2f} ms")
+
+    if workers == 1:
+        _iniciar_worker(faces, ids)
+        for feitas, parametros in enumerate(grade, start=1):
+            concluir(feitas, medir(treino, teste, fora, parametros))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker,
+                                 initargs=(faces, ids)) as pool:
+            futuros = [pool.submit(medir, treino, teste, fora, parametros) for parametros in grade]
+            for feitas, futuro in enumerate(as_completed(futuros), start=1):
+                concluir(feitas, futuro.result())
+
+    if not resultados:
+        return None
+    resultados.sort(key=lambda l: (-l['acuracia_top1'], l['latencia_predict_ms']['p50']))
+    marcar_pareto(resultados)
+    return {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'holdout': holdout,
+        'impostores': impostores,
+        'semente': semente,
+        'amostras': int(len(ids)),
+        'clientes': len(clientes),
+        'far_alvo': far_alvo,
+        'atual': ler_parametros(),
+        'combinacoes': resultados,
+    }
+
+
+def imprimir_tabela(varredura):
+    print(f"\n{'='*96}")
+    print(f"VARREDURA LBPH - {varredura['amostras']} amostras, {varredura['clientes']} clientes, "
+          f"holdout {varredura['holdout']} ({varredura['data']})")
+    print(f"{'='*96}")
+    print(f"{'#':>3s}   {'face':>4s} {'raio':>4s} {'viz':>3s} {'grade':>5s} {'acuracia':>9s} {'limiar':>8s} "
+          f"{'FAR':>7s} {'FRR':>7s} {'EER':>7s} {'p50 ms':>7s} {'p95 ms':>7s} {'modelo':>9s} {'treino':>7s}")
+    for numero, l in enumerate(varredura['combinacoes'], start=1):
+        p = l['parametros']
+        marca = '*' if l['pareto'] else ' '
+        atual = ' <- atual' if p == varredura.get('atual') else ''
+        limiar = f"{l['limiares'][-1]:8.2f}" if l['calibrado'] else f"{'padrao':>8s}"
+        print(f"{numero:3d} {marca} {p['tamanho_face']:4d} {p['raio']:4d} {p['vizinhos']:3d} {p['grade']:5d} "
+              f"{l['acuracia_top1'] * 100:8.2f}% {limiar} "
+              f"{l['far_aceitavel'] * 100:6.2f}% {l['frr_aceitavel'] * 100:6.2f}% "
+              f"{l['eer']['taxa'] * 100:6.2f}% {l['latencia_predict_ms']['p50']:7.2f} "
+              f"{l['latencia_predict_ms']['p95']:7.2f} {l['modelo_bytes'] / 1024 ** 2:7.2f}MB "
+              f"{l['treino_s']:6.2f}s{atual}")
+    print(f"\n* fronteira de Pareto (acuracia x latencia x tamanho). Limiar aceitavel calibrado para "
+          f"FAR <= {varredura['far_alvo'] * 100:g}% (padrao = sem erros no holdout para calibrar); "
+          f"FAR/FRR nele. O EER independe do limiar.")
+    print(f"{'='*96}\n")
+
+
+def aplicar(varredura, escolha, origem):
+    """Grava a combinação escolhida (número da tabela ou 'melhor') e os limiares dela em parametros.json"""
+    linhas = varredura['combinacoes']
+    if escolha == 'melhor':
+        linha = escolher_melhor(linhas)
+    else:
+        try:
+            linha = linhas[int(escolha) - 1]
+        except (ValueError, IndexError):
+            print(f"[ERRO] --aplicar {escolha}: use 'melhor' ou um numero de 1 a {len(linhas)}")
+            return False
+
+    parametros = linha['parametros']
+    limiares = tuple(linha['limiares']) if linha['calibrado'] else None
+    if parametros == ler_parametros() and limiares == ler_limiares('lbph'):
+        print(f"[INFO] {parametros} com limiares {limiares or 'padrao'} ja e a configuracao atual")
+        return True
+    gravar_parametros(parametros, limiares=limiares, varredura=str(origem), far_alvo=varredura['far_alvo'],
+                      acuracia_top1=linha['acuracia_top1'], predict_p50_ms=linha['latencia_predict_ms']['p50'],
+                      gravado_em=varredura['data'])
+    print(f"[OK] {parametros} com limiares {limiares or 'padrao'} gravado em {PARAMETROS_PATH}")
+    print("[INFO] Retreine o modelo: o proximo treino sera completo com os novos parametros e limiares")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Varredura dos parametros do LBPH (fronteira de Pareto)')
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[200, 150, 100],
+                        help='Lado do recorte da face em pixels (padrao: 200 150 100)')
+    parser.add_argument('--raios', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--vizinhos', type=int, nargs='+', default=[PADRAO_LBPH['vizinhos']],
+                        help='Vizinhos do LBP; o histograma cresce 2^vizinhos (padrao: 8)')
+    parser.add_argument('--grades', type=int, nargs='+', default=[8, 6, 4], help='Celulas por lado (padrao: 8 6 4)')
+    parser.add_argument('--holdout', type=float, default=0.2, help='Fracao de teste de cada cliente (padrao: 0.2)')
+    parser.add_argument('--impostores', type=int, default=0,
+                        help='Clientes deixados fora da galeria (tentativas impostoras para o FAR)')
+    parser.add_argument('--far-alvo', type=float, default=FAR_ALVO,
+                        help=f'FAR tolerado no limiar aceitavel calibrado (padrao: {FAR_ALVO})')
+    parser.add_argument('--workers', type=int, help='Processos (padrao: nucleos da CPU)')
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--json', help=f'Arquivo da varredura (padrao: {SAIDA_PADRAO}/<data>.json)')
+    parser.add_argument('--de', metavar='JSON', help='Usa uma varredura salva em vez de medir de novo')
+    parser.add_argument('--aplicar', metavar='N|melhor',
+                        help='Grava a combinacao N da tabela (ou a melhor da fronteira) em parametros.json')
+    args = parser.parse_args()
+
+    if not 0 < args.holdout < 1:
+        parser.error('--holdout precisa estar entre 0 e 1')
+    if any(n < 1 or n > 16 for n in args.vizinhos):
+        parser.error('--vizinhos precisa estar entre 1 e 16')
+    if not 0 < args.far_alvo < 1:
+        parser.error('--far-alvo precisa estar entre 0 e 1')
+
+    if args.de:
+        destino = Path(args.de)
+        with open(destino, encoding='utf-8') as f:
+            varredura = json.load(f)
+        if 'far_alvo' not in varredura:
+            print(f"[ERRO] {destino} e de antes da calibracao dos limiares por combinacao; rode a varredura de novo")
+            sys.exit(1)
+        varredura['atual'] = ler_parametros()
+    else:
+        grade = combinacoes(args.tamanhos, args.raios, args.vizinhos, args.grades)
+        varredura = varrer(grade, args.holdout, args.impostores, args.workers, args.semente, args.far_alvo)
+        if varredura is None:
+            sys.exit(1)
+        destino = Path(args.json) if args.json else SAIDA_PADRAO / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        with open(destino, 'w', encoding='utf-8') as f:
+            json.dump(varredura, f, indent=2)
+
+    imprimir_tabela(varredura)
+    if not args.de:
+        print(f"[OK] Varredura salva em {destino}")
+
+    if args.aplicar and not aplicar(varredura, args.aplicar, destino):
+        sys.exit(1)
+
+
+# Guarda necessária: o pool de processos reimporta este módulo (Windows)
+if __name__ == '__main__':
+    main()
@@ -139,3 +139,36 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'login'
+
+# Câmeras do reconhecimento facial (índice da webcam, arquivo ou URL).
+# Com mais de uma, o reconhecimento roda pelo multicamera.py
+CAMERAS_RECONHECIMENTO = [0]
+
+# Backend do reconhecimento facial usado pelo treina.py: 'lbph' (padrão),
+# 'fisher' ou 'embeddings' (dlib/face_recognition). O reconhece.py usa o
+# backend gravado no próprio trainer.yml.
+RECONHECIMENTO_BACKEND = 'lbph'
+
+# Orçamento de memória (MB) do treino completo: as amostras são lidas do cache
+# em blocos que cabem nele. None = carrega todas as faces de uma vez.
+TREINO_MEMORIA_MB = None
+
+# Galeria compacta do LBPH: depois do treino cada cliente fica com no máximo
+# N protótipos float16 ('medoide' ou 'centroide'); memória e predict crescem
+# com os clientes, não com as fotos. None = um histograma por foto.
+TREINO_PROTOTIPOS = None
+TREINO_PROTOTIPOS_METODO = 'medoide'
+
+# Fragmentos da galeria do LBPH: o snapshot é dividido por cliente em N
+# partes e o reconhecimento busca cada uma num processo (até o número de
+# núcleos). 1 = busca num processo só.
+TREINO_FRAGMENTOS = 1
+
+# Fila de tarefas (treino, captura, exportação): quantas rodam ao mesmo tempo
+# e se o próprio processo do Django executa (False = só pelo
+# `python manage.py processar_tarefas`).
+TAREFAS_CONCORRENCIA = 2
+TAREFAS_TRABALHADOR_LOCAL = True
+
+# Cadastro facial pelo navegador: lotes de frames processados em paralelo
+CAPTURA_WEB_WORKERS = 2
@@ -0,0 +1,240 @@
+# gym/acesso.py
+"""
+Situação do cliente (status + plano ativo) e decisão de acesso.
+
+Um único cálculo usado pelo reconhecimento facial (verificar_acesso_cliente)
+e pelas views (lista de clientes). A decisão fica em cache por cliente até
+a meia-noite; signals de Cliente/ClientePlano/Pagamento invalidam o cliente
+no próprio processo e os marcadores em AlteracaoCadastro avisam os outros
+processos (reconhece.py, outros workers do servidor).
+"""
+import threading
+import time
+from datetime import date, timedelta
+
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Cliente, ClientePlano, AlteracaoCadastro
+
+# Ids relidos atrás do maior já visto (transações que comitam fora de ordem)
+JANELA_MARCADORES = 1000
+# Marcadores mais velhos que isso já foram lidos por todo processo vivo
+RETENCAO_MARCADORES = timedelta(days=1)
+INTERVALO_PODA = 600    # segundos entre podas no mesmo processo
+
+_ultima_poda = None
+_poda_lock = threading.Lock()
+
+
+def buscar_dados_clientes(ids=None):
+    """Status e plano ativo de vários clientes em 2 consultas"""
+    clientes = Cliente.objects.all()
+    planos = ClientePlano.objects.filter(ativo=True).select_related('plano').order_by('id')
+    if ids is not None:
+        clientes = clientes.filter(id__in=ids)
+        planos = planos.filter(cliente_id__in=ids)
+
+    dados = {
+        pk: {'nome': nome, 'status': status, 'plano': None, 'data_fim': None}
+        for pk, nome, status in clientes.values_list('id', 'nome', 'status')
+    }
+
+    # Mesmo critério do antigo .first(): primeiro plano ativo por id
+    vistos = set()
+    for plano in planos:
+        if plano.cliente_id in vistos or plano.cliente_id not in dados:
+            continue
+        vistos.add(plano.cliente_id)
+        dados[plano.cliente_id]['plano'] = plano.plano.nome
+        dados[plano.cliente_id]['data_fim'] = plano.data_fim
+
+    return dados
+
+
+def calcular_situacao(dados, hoje=None):
+    """Decisão de acesso a partir dos dados do cliente (sem banco)"""
+    hoje = hoje or date.today()
+    situacao = {
+        'nome': dados['nome'],
+        'plano': dados['plano'],
+        'data_fim': dados['data_fim'],
+        'dias_restantes': None,
+    }
+
+    if dados['plano'] is not None and dados['data_fim'] is not None:
+        situacao['dias_restantes'] = (dados['data_fim'] - hoje).days
+    dias = situacao['dias_restantes']
+
+    if not dados['status']:
+        pode_entrar, mensagem, saldo = False, "Cliente INATIVO", 0
+    elif dados['plano'] is None:
+        pode_entrar, mensagem, saldo = False, "SEM PLANO ATIVO", 0
+    elif dias is None:
+        pode_entrar, mensagem, saldo = False, "PLANO SEM DATA FIM", 0
+    elif dias < 0:
+        pode_entrar, mensagem, saldo = False, f"PLANO VENCIDO ({-dias} dias)", dias
+    elif dias == 0:
+        pode_entrar, mensagem, saldo = True, "VENCE HOJE!", 0
+    elif dias <= 3:
+        pode_entrar, mensagem, saldo = True, f"Vence em {dias} dias", dias
+    else:
+        pode_entrar, mensagem, saldo = True, "ACESSO LIBERADO", dias
+
+    situacao.update({'pode_entrar': pode_entrar, 'mensagem': mensagem, 'dias': saldo})
+    return situacao
+
+
+def rotulo_vencimento(situacao):
+    """(texto, classe css) do vencimento para as listagens"""
+    if situacao['plano'] is None:
+        return 'Sem plano', 'text-secondary'
+
+    dias = situacao['dias_restantes']
+    if dias is None:
+        return 'Sem data de vencimento', 'text-secondary'
+    if dias < 0:
+        return f'Vencido há {abs(dias)} dias', 'text-danger'
+    if dias == 0:
+        return 'Vence hoje', 'text-warning'
+    if dias <= 7:
+        return f'Vence em {dias} dias', 'text-warning'
+    return situacao['data_fim'].strftime('%d/%m/%Y'), 'text-success'
+
+
+class LeitorMarcadores:
+    """
+    Marcadores de AlteracaoCadastro ainda não aplicados. O id é
+    autoincremento, mas as transações comitam fora de ordem: um id menor
+    pode aparecer depois de um maior já lido. Por isso cada consulta relê os
+    últimos `janela` ids e o leitor lembra quais já aplicou. Aplicar de novo
+    é inofensivo (só recarrega ou invalida o cliente).
+    """
+
+    def __init__(self, janela=JANELA_MARCADORES):
+        self.janela = janela
+        self.ultimo = None      # maior id aplicado
+        self._vistos = set()    # ids aplicados dentro da janela
+
+    def consultar(self):
+        """[(id, cliente_pk)] da janela (uma consulta; não muda o estado)"""
+        base = self.ultimo
+        if base is None:
+            base = AlteracaoCadastro.objects.aggregate(m=Max('id'))['m'] or 0
+        return list(
+            AlteracaoCadastro.objects
+            .filter(id__gt=base - self.janela)
+            .values_list('id', 'cliente_pk')
+        )
+
+    def novos(self, marcadores):
+        return [(m_id, cliente_pk) for m_id, cliente_pk in marcadores if m_id not in self._vistos]
+
+    def confirmar(self, marcadores):
+        """Marca como aplicados (só depois de aplicar: falha = tenta de novo)"""
+        if self.ultimo is None:
+            self.ultimo = 0
+        if not marcadores:
+            return
+        self._vistos.update(m_id for m_id, _ in marcadores)
+        self.ultimo = max(self.ultimo, max(m_id for m_id, _ in marcadores))
+        limite = self.ultimo - self.janela
+        self._vistos = {m_id for m_id in self._vistos if m_id > limite}
+
+
+def podar_marcadores(forcar=False):
+    """
+    Apaga os marcadores além da retenção; no máximo uma vez por
+    INTERVALO_PODA por processo (chamado pelos signals e pelo cache do
+    reconhecimento). Devolve quantos apagou.
+    """
+    global _ultima_poda
+    agora = time.monotonic()
+    with _poda_lock:
+        if not forcar and _ultima_poda is not None and agora - _ultima_poda < INTERVALO_PODA:
+            return 0
+        _ultima_poda = agora
+    apagados, _ = AlteracaoCadastro.objects.filter(data__lt=timezone.now() - RETENCAO_MARCADORES).delete()
+    return apagados
+
+
+class CacheSituacoes:
+    """Decisões de acesso em cache até a meia-noite ou até invalidação"""
+
+    def __init__(self, carregador=buscar_dados_clientes):
+        self.carregador = carregador
+        self._dados = {}        # cliente_id -> dados brutos
+        self._situacoes = {}    # cliente_id -> decisão do dia
+        self._dia = None
+        self._marcadores = LeitorMarcadores()
+        self._lock = threading.Lock()
+
+    def _virar_dia(self):
+        hoje = date.today()
+        if self._dia != hoje:
+            # Meia-noite: recalcula a partir dos dados guardados, sem banco
+            self._dia = hoje
+            self._situacoes = {}
+
+    def preencher(self, dados):
+        """Coloca dados já carregados (ex.: roster do reconhecimento)"""
+        with self._lock:
+            self._dados.update(dados)
+            for cliente_id in dados:
+                self._situacoes.pop(cliente_id, None)
+
+    def invalidar(self, ids=None):
+        with self._lock:
+            self._invalidar(ids)
+
+    def _invalidar(self, ids=None):
+        if ids is None:
+            self._dados.clear()
+            self._situacoes.clear()
+            return
+        for cliente_id in ids:
+            self._dados.pop(cliente_id, None)
+            self._situacoes.pop(cliente_id, None)
+
+    def sincronizar(self):
+        """Invalida clientes marcados por outros processos desde a última vez"""
+        marcadores = self._marcadores.consultar()
+        with self._lock:
+            if self._marcadores.ultimo is None:
+                # Primeira vez: o que já existe não muda nada no cache vazio
+                self._marcadores.confirmar(marcadores)
+                return
+            novos = self._marcadores.novos(marcadores)
+            if novos:
+                self._invalidar({cliente_pk for _, cliente_pk in novos})
+                self._marcadores.confirmar(novos)
+
+    def obter_varios(self, ids):
+        """{cliente_id: situação}; carrega os que faltam numa consulta só"""
+        ids = list(ids)
+        with self._lock:
+            self._virar_dia()
+            faltando = [i for i in ids if i not in self._dados]
+
+        if faltando:
+            novos = self.carregador(faltando)
+            with self._lock:
+                self._dados.update(novos)
+
+        resultado = {}
+        with self._lock:
+            for cliente_id in ids:
+                if cliente_id not in self._dados:
+                    continue
+                if cliente_id not in self._situacoes:
+                    self._situacoes[cliente_id] = calcular_situacao(self._dados[cliente_id], self._dia)
+                resultado[cliente_id] = self._situacoes[cliente_id]
+        return resultado
+
+    def obter(self, cliente_id):
+        """Situação do cliente ou None se ele não existe"""
+        return self.obter_varios([cliente_id]).get(cliente_id)
+
+
+# Cache do processo (views e reconhece.py)
+situacoes = CacheSituacoes()
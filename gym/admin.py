@@ -1,6 +1,7 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.models import Group
-from .models import Cliente, Plano, Pagamento, Servico, Presenca, ClientePlano, TipoPlano, DiaSemana
+from .tarefas import enfileirar
+from .models import Cliente, Plano, Pagamento, Servico, Presenca, ClientePlano, TipoPlano, DiaSemana, Tarefa
 
 # Customiza o título do admin
 admin.site.site_header = "Academia System - Administração"
@@ -13,6 +14,7 @@ class ClienteAdmin(admin.ModelAdmin):
     list_display = ('nome', 'identidade', 'telefone', 'email', 'status')
     list_filter = ('status',)
     search_fields = ('nome', 'identidade', 'email', 'telefone')
+    actions = ['cadastrar_pelas_fotos_de_perfil']
     
     fieldsets = (
         ('Informações Pessoais', {
@@ -26,6 +28,20 @@ class ClienteAdmin(admin.ModelAdmin):
         }),
     )
 
+    @admin.action(description='Cadastrar reconhecimento facial pela foto de perfil')
+    def cadastrar_pelas_fotos_de_perfil(self, request, queryset):
+        ids = list(queryset.exclude(imagem='').exclude(imagem__isnull=True).values_list('pk', flat=True))
+        if not ids:
+            self.message_user(request, 'Nenhum dos clientes selecionados tem foto de perfil.', messages.WARNING)
+            return
+        tarefa, criada = enfileirar('cadastro_fotos', 'cadastro_fotos', {'clientes': ids}, request.user)
+        if criada:
+            self.message_user(request, f'Cadastro de {len(ids)} cliente(s) enfileirado (tarefa #{tarefa.pk}). '
+                                       f'Depois, treine o modelo.', messages.SUCCESS)
+        else:
+            self.message_user(request, f'Já existe um cadastro pelas fotos em andamento (tarefa #{tarefa.pk}).',
+                              messages.WARNING)
+
 # Plano Admin 
 @admin.register(Plano)
 class PlanoAdmin(admin.ModelAdmin):
@@ -86,6 +102,14 @@ class DiaSemanaAdmin(admin.ModelAdmin):
     list_display = ('nome',)
     search_fields = ('nome',)
 
+# Tarefa Admin
+@admin.register(Tarefa)
+class TarefaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'status', 'etapa', 'progresso', 'usuario', 'criada_em', 'concluida_em')
+    list_filter = ('tipo', 'status')
+    readonly_fields = ('chave', 'chave_ativa', 'etapas', 'saida', 'resultado', 'criada_em',
+                       'iniciada_em', 'concluida_em', 'atualizada_em')
+
 # Remove grupo (opcional)
 try:
     admin.site.unregister(Group)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GymConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'gym'
+
+    def ready(self):
+        # Registra os signals (marcadores do cache do reconhecimento)
+        from . import signals  # noqa: F401
@@ -0,0 +1,196 @@
+# gym/captura_web.py
+"""
+Cadastro facial pelo navegador da recepção.
+
+A página (getUserMedia) manda lotes de frames JPEG; cada lote roda num pool
+limitado de threads (o OpenCV solta o GIL na detecção e na codificação):
+decodifica, detecta um rosto por frame, recorta e oferece ao MotorCaptura
+do cliente, que aplica o filtro de qualidade e de duplicatas e grava em
+dataset/<id>/ em background. A resposta traz aceitas/recusadas do lote e o
+total da sessão, para a página parar assim que a meta for atingida.
+
+Uma sessão (id gerado pela página) mantém o mesmo MotorCaptura entre os
+lotes, então duplicatas são barradas entre lotes também; sessões sem lote
+há SESSAO_EXPIRA segundos são fechadas.
+"""
+import struct
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturoTimeout
+from pathlib import Path
+
+import cv2
+import numpy as np
+from django.conf import settings
+
+from academia.reconhecimento.motor_captura import MotorCaptura
+
+WORKERS_PADRAO = 2
+LOTES_NA_FILA = 4           # lotes aguardando além dos que estão rodando
+FRAMES_POR_LOTE = 20
+BYTES_POR_FRAME = 2 * 1024 * 1024
+META_PADRAO = 30
+SESSAO_EXPIRA = 300         # segundos
+PADRAO_NOME = '{n:03d}.jpg'  # mesmo do captura.py
+
+DATASET_DIR = Path(settings.BASE_DIR) / 'dataset'
+
+
+class FilaCheia(Exception):
+    """Todos os workers e vagas da fila ocupados: a página tenta de novo"""
+
+
+class LoteDemorado(Exception):
+    """O lote não terminou no prazo (segue rodando no pool): a página tenta de novo"""
+
+
+class LoteInvalido(ValueError):
+    pass
+
+
+_local = threading.local()
+
+
+def _detector():
+    # CascadeClassifier não é seguro entre threads: um por worker
+    if not hasattr(_local, 'detector'):
+        _local.detector = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    return _local.detector
+
+
+def separar_frames_binarios(corpo):
+    """Corpo application/octet-stream: [tamanho uint32 big-endian][JPEG] repetidos"""
+    frames = []
+    posicao = 0
+    while posicao < len(corpo):
+        if posicao + 4 > len(corpo):
+            raise LoteInvalido('cabeçalho de frame incompleto')
+        (tamanho,) = struct.unpack_from('>I', corpo, posicao)
+        posicao += 4
+        if tamanho > BYTES_POR_FRAME or posicao + tamanho > len(corpo):
+            raise LoteInvalido('frame maior que o corpo ou que o limite')
+        frames.append(corpo[posicao:posicao + tamanho])
+        posicao += tamanho
+    return frames
+
+
+class Sessao:
+    def __init__(self, cliente_id, sessao_id, meta):
+        self.cliente_id = cliente_id
+        self.sessao_id = sessao_id
+        self.meta = meta
+        self.motor = MotorCaptura(DATASET_DIR / str(cliente_id), PADRAO_NOME)
+        self.lock = threading.Lock()  # MotorCaptura não é thread-safe
+        self.ultimo_uso = time.monotonic()
+        self.fechada = False
+
+    def fechar(self):
+        with self.lock:
+            if not self.fechada:
+                self.fechada = True
+                self.motor.fechar()
+
+
+class CapturaWeb:
+    """Pool limitado + sessões por cliente"""
+
+    def __init__(self, workers=None, lotes_na_fila=LOTES_NA_FILA):
+        self.workers = workers or getattr(settings, 'CAPTURA_WEB_WORKERS', WORKERS_PADRAO)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='captura-web')
+        self._vagas = threading.BoundedSemaphore(self.workers + lotes_na_fila)
+        self._sessoes = {}
+        self._lock = threading.Lock()
+
+    def _sessao(self, cliente_id, sessao_id, meta):
+        with self._lock:
+            fechar = self._expirar()
+            sessao = self._sessoes.get(cliente_id)
+            if sessao is None or sessao.sessao_id != sessao_id:
+                if sessao is not None:
+                    fechar.append(sessao)
+                sessao = self._sessoes[cliente_id] = Sessao(cliente_id, sessao_id, meta)
+            sessao.ultimo_uso = time.monotonic()
+        # fechar() espera o gravador: fora do lock, para não travar as outras sessões
+        for antiga in fechar:
+            antiga.fechar()
+        return sessao
+
+    def _expirar(self):
+        """Tira as sessões expiradas do dicionário e as devolve para fechar"""
+        limite = time.monotonic() - SESSAO_EXPIRA
+        expiradas = []
+        for cliente_id, sessao in list(self._sessoes.items()):
+            if sessao.ultimo_uso < limite:
+                expiradas.append(sessao)
+                del self._sessoes[cliente_id]
+        return expiradas
+
+    def encerrar(self, cliente_id):
+        """Fecha a sessão (espera as fotos aceitas serem gravadas); devolve quantas foram salvas"""
+        with self._lock:
+            sessao = self._sessoes.pop(cliente_id, None)
+        if sessao is None:
+            return 0
+        sessao.fechar()
+        return sessao.motor.gravador.salvos
+
+    def processar(self, cliente_id, sessao_id, frames, meta=META_PADRAO, timeout=60):
+        """
+        Roda o lote no pool e devolve o resumo; FilaCheia se não houver vaga,
+        LoteDemorado se não terminar em `timeout` segundos
+        """
+        if len(frames) > FRAMES_POR_LOTE:
+            raise LoteInvalido(f'no máximo {FRAMES_POR_LOTE} frames por lote')
+        if not self._vagas.acquire(blocking=False):
+            raise FilaCheia()
+        try:
+            sessao = self._sessao(cliente_id, sessao_id, meta)
+            futuro = self._pool.submit(self._processar_lote, sessao, frames)
+        except Exception:
+            self._vagas.release()
+            raise
+        futuro.add_done_callback(lambda _: self._vagas.release())
+        try:
+            return futuro.result(timeout=timeout)
+        except FuturoTimeout:
+            raise LoteDemorado() from None
+
+    def _processar_lote(self, sessao, frames):
+        recusadas = Counter()
+        aceitas = 0
+        for dados in frames:
+            if sessao.motor.aceitas >= sessao.meta:
+                break
+            gray = cv2.imdecode(np.frombuffer(dados, np.uint8), cv2.IMREAD_GRAYSCALE)
+            if gray is None:
+                recusadas['Frame invalido'] += 1
+                continue
+
+            faces = _detector().detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5, minSize=(100, 100))
+            if len(faces) != 1:
+                recusadas['Nenhum rosto' if len(faces) == 0 else 'Multiplas faces'] += 1
+                continue
+
+            (x, y, w, h) = faces[0]
+            with sessao.lock:
+                if sessao.fechada:
+                    break
+                salvo, motivo = sessao.motor.oferecer(gray[y:y+h, x:x+w])
+            if salvo:
+                aceitas += 1
+            else:
+                recusadas[motivo.split(' (')[0]] += 1
+
+        total = sessao.motor.aceitas
+        return {
+            'aceitas': aceitas,
+            'recusadas': sum(recusadas.values()),
+            'motivos': dict(recusadas.most_common()),
+            'total': total,
+            'meta': sessao.meta,
+            'concluido': total >= sessao.meta,
+        }
+
+
+captura_web = CapturaWeb()
@@ -0,0 +1,147 @@
+# gym/exportacao.py
+"""
+Exportações CSV de presenças e pagamentos.
+
+As views de download direto e a tarefa de exportação em background
+(gym/tarefas.py) usam as mesmas funções; `progresso(feitas, total)` é
+chamado a cada bloco de linhas.
+"""
+import csv
+from datetime import date, datetime
+
+from .models import Cliente, Pagamento, Presenca
+
+LINHAS_POR_PROGRESSO = 500
+
+
+def filtrar_presencas(filtros):
+    """Mesmos filtros da listagem: cliente, data_inicio, data_fim, tipo"""
+    cliente_id = filtros.get('cliente', '')
+    data_inicio = filtros.get('data_inicio', '')
+    data_fim = filtros.get('data_fim', '')
+    tipo = filtros.get('tipo', '')
+
+    presencas = Presenca.objects.select_related('cliente', 'usuario').all()
+
+    if cliente_id:
+        presencas = presencas.filter(cliente_id=cliente_id)
+
+    if data_inicio:
+        try:
+            data_inicio_obj = datetime.strptime(data_inicio, '%Y-%m-%d').date()
+            presencas = presencas.filter(data__gte=data_inicio_obj)
+        except ValueError:
+            pass
+
+    if data_fim:
+        try:
+            data_fim_obj = datetime.strptime(data_fim, '%Y-%m-%d').date()
+            presencas = presencas.filter(data__lte=data_fim_obj)
+        except ValueError:
+            pass
+
+    if tipo:
+        presencas = presencas.filter(tipo=tipo)
+
+    return presencas.order_by('-data', '-hora')
+
+
+def nome_arquivo_presencas(filtros):
+    """Nome do arquivo com filtros"""
+    nome_arquivo = f'presencas_{date.today().strftime("%Y%m%d")}'
+    cliente_id = filtros.get('cliente', '')
+    if cliente_id:
+        cliente = Cliente.objects.get(pk=cliente_id)
+        nome_arquivo += f'_{cliente.nome.replace(" ", "_")}'
+    if filtros.get('data_inicio') or filtros.get('data_fim'):
+        nome_arquivo += '_periodo'
+    return nome_arquivo + '.csv'
+
+
+def _escrever(arquivo, cabecalho, linhas, total, progresso):
+    writer = csv.writer(arquivo, delimiter=';')
+    writer.writerow(cabecalho)
+    feitas = 0
+    for linha in linhas:
+        writer.writerow(linha)
+        feitas += 1
+        if progresso and feitas % LINHAS_POR_PROGRESSO == 0:
+            progresso(feitas, total)
+    if progresso:
+        progresso(feitas, total)
+    return feitas
+
+
+def escrever_presencas(arquivo, presencas, progresso=None):
+    """Escreve o CSV de presenças; devolve o número de linhas"""
+    cabecalho = [
+        'ID',
+        'Cliente',
+        'Identidade',
+        'Tipo',
+        'Data',
+        'Hora',
+        'Registrado por'
+    ]
+    linhas = (
+        [
+            p.id,
+            p.cliente.nome,
+            p.cliente.identidade,
+            'IA Facial' if p.tipo == 'facial' else 'Manual',
+            p.data.strftime('%d/%m/%Y'),
+            p.hora.strftime('%H:%M:%S'),
+            p.usuario.username if p.usuario else 'Sistema'
+        ]
+        for p in presencas.iterator(chunk_size=LINHAS_POR_PROGRESSO)
+    )
+    total = presencas.count() if progresso else None
+    return _escrever(arquivo, cabecalho, linhas, total, progresso)
+
+
+def listar_pagamentos():
+    return Pagamento.objects.select_related('cliente', 'plano', 'plano__tipo', 'usuario').all()
+
+
+def escrever_pagamentos(arquivo, pagamentos, progresso=None):
+    """Escreve o CSV de pagamentos; devolve o número de linhas"""
+    cabecalho = [
+        'ID',
+        'Cliente',
+        'Identidade',
+        'Plano',
+        'Tipo de Plano',
+        'Método',
+        'Valor do Plano',
+        'Juros',
+        'Descontos',
+        'Total Pago',
+        'Data/Hora',
+        'Registrado por'
+    ]
+    linhas = (
+        [
+            p.id,
+            p.cliente.nome,
+            p.cliente.identidade,
+            p.plano.nome,
+            p.plano.tipo.get_nome_display(),
+            p.get_metodo_display(),
+            f'R$ {p.plano.preco:.2f}'.replace('.', ','),
+            f'R$ {(p.juros or 0):.2f}'.replace('.', ','),
+            f'R$ {(p.descontos or 0):.2f}'.replace('.', ','),
+            f'R$ {p.total:.2f}'.replace('.', ','),
+            p.data.strftime('%d/%m/%Y %H:%M:%S'),
+            p.usuario.username if p.usuario else 'Sistema'
+        ]
+        for p in pagamentos.iterator(chunk_size=LINHAS_POR_PROGRESSO)
+    )
+    total = pagamentos.count() if progresso else None
+    return _escrever(arquivo, cabecalho, linhas, total, progresso)
+
+
+# formato -> (queryset a partir dos filtros, nome do arquivo, escritor)
+EXPORTACOES = {
+    'presencas': (filtrar_presencas, nome_arquivo_presencas, escrever_presencas),
+    'pagamentos': (lambda filtros: listar_pagamentos(), lambda filtros: 'pagamentos.csv', escrever_pagamentos),
+}
@@ -0,0 +1,91 @@
+"""
+Cadastro facial em lote pelas fotos de perfil (Cliente.imagem).
+
+    python manage.py cadastrar_fotos_perfil                # todos com foto
+    python manage.py cadastrar_fotos_perfil --clientes 7 12
+    python manage.py cadastrar_fotos_perfil --pular-com-fotos --workers 4
+
+Cada foto é processada num pool de processos (academia/reconhecimento/
+fotos_perfil.py); depois é só treinar o modelo.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from gym.models import Cliente
+from academia.reconhecimento.fotos_perfil import processar_foto, tem_fotos_de_camera, VARIACOES
+
+
+class Command(BaseCommand):
+    help = 'Gera amostras de treino em dataset/<id>/ a partir das fotos de perfil dos clientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, nargs='+',
+                            help='IDs dos clientes (padrão: todos os que têm foto)')
+        parser.add_argument('--workers', type=int,
+                            help='Processos (padrão: núcleos da CPU)')
+        parser.add_argument('--variacoes', type=int, default=len(VARIACOES),
+                            choices=range(1, len(VARIACOES) + 1), metavar=f'1-{len(VARIACOES)}',
+                            help=f'Amostras por foto (padrão: {len(VARIACOES)})')
+        parser.add_argument('--pular-com-fotos', action='store_true',
+                            help='Não mexe em clientes que já têm fotos capturadas pela câmera')
+        parser.add_argument('--sem-qualidade', action='store_true',
+                            help='Aceita foto desfocada, mal exposta ou fora de pose')
+
+    def handle(self, *args, **options):
+        dataset_dir = Path(settings.BASE_DIR) / 'dataset'
+
+        clientes = Cliente.objects.exclude(imagem='').exclude(imagem__isnull=True).order_by('pk')
+        if options['clientes']:
+            clientes = clientes.filter(pk__in=options['clientes'])
+
+        tarefas = []
+        for cliente in clientes:
+            if options['pular_com_fotos'] and tem_fotos_de_camera(dataset_dir, cliente.pk):
+                self.stdout.write(f"[INFO] Cliente {cliente.pk} ({cliente.nome}) ja tem fotos da camera, pulando")
+                continue
+            tarefas.append((cliente.pk, cliente.nome, cliente.imagem.path))
+
+        if not tarefas:
+            self.stdout.write("[AVISO] Nenhum cliente com foto de perfil para processar")
+            return
+
+        workers = min(options['workers'] or os.cpu_count() or 1, len(tarefas))
+        self.stdout.write(f"[INFO] {len(tarefas)} foto(s) de perfil, {workers} processo(s), "
+                          f"{options['variacoes']} amostra(s) por foto")
+
+        nomes = {cliente_id: nome for cliente_id, nome, _ in tarefas}
+        argumentos = dict(dataset_dir=str(dataset_dir), variacoes=options['variacoes'],
+                          filtrar_qualidade=not options['sem_qualidade'])
+        cadastrados, amostras, falhas = 0, 0, []
+
+        def concluir(feitas, resultado):
+            nonlocal cadastrados, amostras
+            cliente_id, gravadas, erro = resultado
+            if erro:
+                falhas.append((cliente_id, erro))
+                self.stdout.write(f"[{feitas}/{len(tarefas)}] CLIENTE {cliente_id} ({nomes[cliente_id]}): [ERRO] {erro}")
+            else:
+                cadastrados += 1
+                amostras += gravadas
+                self.stdout.write(f"[{feitas}/{len(tarefas)}] CLIENTE {cliente_id} ({nomes[cliente_id]}): "
+                                  f"{gravadas} amostra(s)")
+
+        if workers == 1:
+            for feitas, (cliente_id, _, caminho) in enumerate(tarefas, start=1):
+                concluir(feitas, processar_foto(cliente_id, caminho, **argumentos))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futuros = [pool.submit(processar_foto, cliente_id, caminho, **argumentos)
+                           for cliente_id, _, caminho in tarefas]
+                for feitas, futuro in enumerate(as_completed(futuros), start=1):
+                    concluir(feitas, futuro.result())
+
+        self.stdout.write(f"\n[INFO] {cadastrados} cliente(s) cadastrado(s), {amostras} amostra(s) gravada(s)")
+        if falhas:
+            self.stdout.write(f"[AVISO] {len(falhas)} foto(s) sem rosto utilizavel: recapture pela camera")
+        if cadastrados:
+            self.stdout.write("[INFO] Agora treine o modelo (Treinar Modelo ou python academia/reconhecimento/treina.py)")
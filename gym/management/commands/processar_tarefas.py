@@ -0,0 +1,25 @@
+"""
+Trabalhador dedicado da fila de tarefas (treino, captura, exportação).
+
+    python manage.py processar_tarefas --concorrencia 2
+
+Com TAREFAS_TRABALHADOR_LOCAL = False o runserver só enfileira e este
+comando executa.
+"""
+from django.core.management.base import BaseCommand
+
+from gym.tarefas import Trabalhador
+
+
+class Command(BaseCommand):
+    help = 'Executa as tarefas pendentes da fila (Ctrl+C para parar)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concorrencia', type=int, default=None,
+                            help='Tarefas simultâneas (padrão: settings.TAREFAS_CONCORRENCIA)')
+
+    def handle(self, *args, **options):
+        trabalhador = Trabalhador(concorrencia=options['concorrencia'])
+        self.stdout.write(f"[INFO] Processando tarefas (concorrência {trabalhador.concorrencia}). Ctrl+C para parar.")
+        trabalhador.executar_para_sempre()
+        self.stdout.write("[INFO] Trabalhador parado.")
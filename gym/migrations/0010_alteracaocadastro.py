@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0009_alter_diasemana_options_alter_diasemana_nome'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlteracaoCadastro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cliente_pk', models.BigIntegerField(db_index=True)),
+                ('data', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Alteração de Cadastro',
+                'verbose_name_plural': 'Alterações de Cadastro',
+            },
+        ),
+    ]
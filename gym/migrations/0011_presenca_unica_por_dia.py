@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def remover_presencas_duplicadas(apps, schema_editor):
+    """Mantém só a primeira presença de cada cliente por dia"""
+    Presenca = apps.get_model('gym', 'Presenca')
+
+    vistos = set()
+    duplicadas = []
+    registros = Presenca.objects.order_by('cliente_id', 'data', 'hora', 'id').values_list('id', 'cliente_id', 'data')
+    for pk, cliente_id, data in registros.iterator():
+        chave = (cliente_id, data)
+        if chave in vistos:
+            duplicadas.append(pk)
+        else:
+            vistos.add(chave)
+
+    for inicio in range(0, len(duplicadas), 1000):
+        Presenca.objects.filter(pk__in=duplicadas[inicio:inicio + 1000]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0010_alteracaocadastro'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remover_presencas_duplicadas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='presenca',
+            constraint=models.UniqueConstraint(fields=('cliente', 'data'), name='presenca_unica_por_dia'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0011_presenca_unica_por_dia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarefa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('treino', 'Treinamento do modelo'), ('captura', 'Captura de fotos'), ('exportacao', 'Exportação CSV')], max_length=20)),
+                ('chave', models.CharField(db_index=True, max_length=100)),
+                ('chave_ativa', models.CharField(blank=True, max_length=100, null=True, unique=True)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('executando', 'Executando'), ('concluida', 'Concluída'), ('falhou', 'Falhou')], db_index=True, default='pendente', max_length=20)),
+                ('parametros', models.JSONField(blank=True, default=dict)),
+                ('etapa', models.CharField(blank=True, max_length=50)),
+                ('progresso', models.FloatField(default=0)),
+                ('etapas', models.JSONField(blank=True, default=list)),
+                ('mensagem', models.TextField(blank=True)),
+                ('saida', models.TextField(blank=True)),
+                ('resultado', models.JSONField(blank=True, default=dict)),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('iniciada_em', models.DateTimeField(blank=True, null=True)),
+                ('concluida_em', models.DateTimeField(blank=True, null=True)),
+                ('atualizada_em', models.DateTimeField(auto_now_add=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Tarefa',
+                'verbose_name_plural': 'Tarefas',
+                'ordering': ['-criada_em'],
+            },
+        ),
+    ]
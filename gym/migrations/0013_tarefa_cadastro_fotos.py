@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0012_tarefa'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tarefa',
+            name='tipo',
+            field=models.CharField(choices=[('treino', 'Treinamento do modelo'), ('captura', 'Captura de fotos'), ('exportacao', 'Exportação CSV'), ('cadastro_fotos', 'Cadastro pelas fotos de perfil')], max_length=20),
+        ),
+    ]
@@ -153,10 +153,73 @@ class Presenca(models.Model):
         verbose_name = "Presença"
         verbose_name_plural = "Presenças"
         ordering = ['-data', '-hora']
+        constraints = [
+            # Uma presença por cliente por dia (garantido pelo banco)
+            models.UniqueConstraint(fields=['cliente', 'data'], name='presenca_unica_por_dia'),
+        ]
     
     def __str__(self):
         return f"{self.cliente.nome} - {self.data} {self.tipo}"
     
+# -----------------------------
+# Marcador de alterações do cadastro
+# -----------------------------
+class AlteracaoCadastro(models.Model):
+    """Registra clientes alterados para o cache do reconhecimento facial"""
+    cliente_pk = models.BigIntegerField(db_index=True)  # sem FK: sobrevive à exclusão do cliente
+    data = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Alteração de Cadastro"
+        verbose_name_plural = "Alterações de Cadastro"
+
+    def __str__(self):
+        return f"Cliente {self.cliente_pk} - {self.data}"
+
+# -----------------------------
+# Fila de tarefas em background
+# -----------------------------
+class Tarefa(models.Model):
+    """Tarefa da fila persistente (treino, captura, exportação, cadastro), executada pelo gym/tarefas.py"""
+    TIPOS = [
+        ('treino', 'Treinamento do modelo'),
+        ('captura', 'Captura de fotos'),
+        ('exportacao', 'Exportação CSV'),
+        ('cadastro_fotos', 'Cadastro pelas fotos de perfil'),
+    ]
+    STATUS = [
+        ('pendente', 'Pendente'),
+        ('executando', 'Executando'),
+        ('concluida', 'Concluída'),
+        ('falhou', 'Falhou'),
+    ]
+
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    chave = models.CharField(max_length=100, db_index=True)
+    # Igual à chave enquanto pendente/executando (None depois): o unique barra duplicatas
+    chave_ativa = models.CharField(max_length=100, null=True, blank=True, unique=True)
+    status = models.CharField(max_length=20, choices=STATUS, default='pendente', db_index=True)
+    parametros = models.JSONField(default=dict, blank=True)
+    etapa = models.CharField(max_length=50, blank=True)
+    progresso = models.FloatField(default=0)  # 0 a 1, dentro da etapa atual
+    etapas = models.JSONField(default=list, blank=True)  # [{nome, inicio, segundos}]
+    mensagem = models.TextField(blank=True)
+    saida = models.TextField(blank=True)  # últimas linhas do processo
+    resultado = models.JSONField(default=dict, blank=True)
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    criada_em = models.DateTimeField(auto_now_add=True)
+    iniciada_em = models.DateTimeField(null=True, blank=True)
+    concluida_em = models.DateTimeField(null=True, blank=True)
+    atualizada_em = models.DateTimeField(auto_now_add=True)  # batimento do trabalhador
+
+    class Meta:
+        verbose_name = "Tarefa"
+        verbose_name_plural = "Tarefas"
+        ordering = ['-criada_em']
+
+    def __str__(self):
+        return f"#{self.pk} {self.get_tipo_display()} - {self.get_status_display()}"
+
 # ========================
 # Servicios y Días
 # ========================
@@ -0,0 +1,176 @@
+# gym/presencas.py
+"""
+Registro de presenças idempotente.
+
+A regra "uma presença por cliente por dia" é garantida pela constraint
+presenca_unica_por_dia; aqui só evitamos ida ao banco à toa. O reconhecimento
+facial usa o EscritorPresencas, que junta as presenças e grava cada lote com
+um único bulk_create(ignore_conflicts=True). Quem enfileira pode passar
+`ao_gravar(cliente_id, ok, erro, ja_registrada)` para saber se o lote foi
+gravado, falhou ou se o banco já tinha a presença (conflito ignorado).
+"""
+import threading
+from datetime import date
+
+from django.db import connection
+from django.db.models import Max
+
+from .models import Presenca
+
+INTERVALO_GRAVACAO = 1.0    # segundos entre lotes
+TAMANHO_LOTE = 100
+
+
+def registrar_presenca_manual(cliente, usuario, tipo='manual'):
+    """Registra (ou encontra) a presença de hoje; devolve (presenca, criada)"""
+    return Presenca.objects.get_or_create(
+        cliente=cliente,
+        data=date.today(),
+        defaults={'usuario': usuario, 'tipo': tipo},
+    )
+
+
+class EscritorPresencas:
+    """Grava presenças em lote numa thread em background"""
+
+    def __init__(self, intervalo=INTERVALO_GRAVACAO, tamanho_lote=TAMANHO_LOTE):
+        self.intervalo = intervalo
+        self.tamanho_lote = tamanho_lote
+        self._pendentes = {}            # cliente_id -> tipo (dedupe dentro do lote)
+        self._avisos = {}               # cliente_id -> [ao_gravar, falha já avisada]
+        self._registrados = set()       # clientes já gravados hoje
+        self._dia = None
+        self._lock = threading.Lock()
+        self._inicio = threading.Lock()
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread = None
+
+        # Estatísticas
+        self.lotes = 0
+        self.enviados = 0
+        self.ja_registradas = 0     # já estavam no banco (conflito ignorado)
+        self.falhas = 0             # lotes que falharam (voltam para a fila)
+        self.nao_gravadas = 0       # presenças pendentes quando a thread parou
+
+    def _virar_dia(self):
+        hoje = date.today()
+        if self._dia != hoje:
+            self._dia = hoje
+            self._registrados = set()
+
+    def registrar(self, cliente_id, tipo='facial', ao_gravar=None):
+        """
+        Enfileira a presença; False se o cliente já foi registrado hoje.
+        `ao_gravar(cliente_id, ok, erro, ja_registrada)` é chamado pela
+        thread do escritor quando o lote é gravado, e na primeira falha dele.
+        """
+        if self._thread is None:
+            # Carrega as presenças de hoje antes de aceitar a primeira
+            self.iniciar()
+        with self._lock:
+            self._virar_dia()
+            if cliente_id in self._registrados or cliente_id in self._pendentes:
+                return False
+            self._pendentes[cliente_id] = tipo
+            if ao_gravar is not None:
+                self._avisos[cliente_id] = [ao_gravar, False]
+            cheio = len(self._pendentes) >= self.tamanho_lote
+
+        if cheio:
+            self._acordar.set()
+        return True
+
+    def descarregar(self):
+        """Grava o lote pendente em uma ida ao banco; devolve o tamanho do lote"""
+        with self._lock:
+            lote, self._pendentes = self._pendentes, {}
+        if not lote:
+            return 0
+
+        objetos = [Presenca(cliente_id=cliente_id, tipo=tipo, usuario=None)
+                   for cliente_id, tipo in lote.items()]
+        try:
+            ultimo = Presenca.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0
+            # Conflito com a constraint = já registrado hoje: ignorado
+            Presenca.objects.bulk_create(objetos, ignore_conflicts=True)
+            # O ignore_conflicts não diz quem entrou: as linhas novas têm id maior
+            gravados = set(Presenca.objects.filter(id__gt=ultimo, cliente_id__in=list(lote))
+                           .values_list('cliente_id', flat=True))
+        except Exception as e:
+            self.falhas += 1
+            print(f"[ERRO] Falha ao gravar lote de {len(lote)} presenca(s): {e}")
+            with self._lock:
+                for cliente_id, tipo in lote.items():
+                    self._pendentes.setdefault(cliente_id, tipo)
+                # Avisa uma vez por presença; as tentativas seguintes são silenciosas
+                novos = [(cliente_id, aviso) for cliente_id, aviso in self._avisos.items()
+                         if cliente_id in lote and not aviso[1]]
+                for _, aviso in novos:
+                    aviso[1] = True
+            self._avisar([(cliente_id, aviso[0]) for cliente_id, aviso in novos], False, str(e))
+            return 0
+
+        ja_registradas = set(lote) - gravados
+        with self._lock:
+            self._registrados.update(lote)
+            avisos = [(cliente_id, self._avisos.pop(cliente_id)[0])
+                      for cliente_id in lote if cliente_id in self._avisos]
+        self.lotes += 1
+        self.enviados += len(gravados)
+        self.ja_registradas += len(ja_registradas)
+        print(f"[OK] Lote de presencas gravado: {sorted(gravados)}"
+              + (f" | ja registradas hoje: {sorted(ja_registradas)}" if ja_registradas else ''))
+        self._avisar([a for a in avisos if a[0] in gravados], True)
+        self._avisar([a for a in avisos if a[0] in ja_registradas], True, ja_registrada=True)
+        return len(gravados)
+
+    def _avisar(self, avisos, ok, erro=None, ja_registrada=False):
+        for cliente_id, ao_gravar in avisos:
+            try:
+                ao_gravar(cliente_id, ok, erro, ja_registrada)
+            except Exception as e:
+                print(f"[AVISO] Falha no aviso da presenca de {cliente_id}: {e}")
+
+    def _carregar_registrados(self):
+        """Clientes com presença hoje (uma consulta, na partida)"""
+        with self._lock:
+            self._virar_dia()
+            self._registrados.update(
+                Presenca.objects.filter(data=self._dia).values_list('cliente_id', flat=True)
+            )
+
+    def _loop(self):
+        try:
+            while not self._parar.is_set():
+                self._acordar.wait(self.intervalo)
+                self._acordar.clear()
+                self.descarregar()
+            self.descarregar()
+        finally:
+            connection.close()
+
+    def iniciar(self):
+        """Lê as presenças de hoje (na thread de quem chama) e sobe a thread do escritor"""
+        with self._inicio:
+            if self._thread is not None:
+                return
+            try:
+                self._carregar_registrados()
+            except Exception as e:
+                print(f"[AVISO] Nao foi possivel ler as presencas de hoje: {e}")
+            thread = threading.Thread(target=self._loop, name='escritor-presencas', daemon=True)
+            thread.start()
+            self._thread = thread
+
+    def parar(self, timeout=10):
+        """Para a thread gravando o que ainda estiver pendente"""
+        self._parar.set()
+        self._acordar.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        with self._lock:
+            perdidas = sorted(self._pendentes)
+        if perdidas:
+            self.nao_gravadas += len(perdidas)
+            print(f"[ERRO] {len(perdidas)} presenca(s) NAO gravada(s) ao encerrar: clientes {perdidas}")
@@ -0,0 +1,33 @@
+# gym/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Cliente, ClientePlano, Pagamento, AlteracaoCadastro
+from .acesso import situacoes, podar_marcadores
+
+
+def _marcar(cliente_pk):
+    # Invalida a decisão de acesso neste processo e deixa o marcador para os
+    # outros (reconhece.py lê os marcadores novos periodicamente)
+    situacoes.invalidar([cliente_pk])
+    AlteracaoCadastro.objects.create(cliente_pk=cliente_pk)
+    # Sem o reconhecimento rodando a tabela também não cresce sem limite
+    podar_marcadores()
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+def marcar_cliente_alterado(sender, instance, **kwargs):
+    _marcar(instance.pk)
+
+
+@receiver(post_save, sender=ClientePlano)
+@receiver(post_delete, sender=ClientePlano)
+def marcar_plano_alterado(sender, instance, **kwargs):
+    _marcar(instance.cliente_id)
+
+
+@receiver(post_save, sender=Pagamento)
+@receiver(post_delete, sender=Pagamento)
+def marcar_pagamento_alterado(sender, instance, **kwargs):
+    _marcar(instance.cliente_id)
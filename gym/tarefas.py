@@ -0,0 +1,441 @@
+# gym/tarefas.py
+"""
+Fila persistente de tarefas (tabela Tarefa) com trabalhador local.
+
+As views só enfileiram e voltam na hora; o Trabalhador pega as tarefas
+pendentes, roda até `TAREFAS_CONCORRENCIA` ao mesmo tempo e grava etapa,
+progresso, tempos e as últimas linhas de saída no banco, que o endpoint
+tarefa_status devolve em JSON. O trabalhador roda em threads do próprio
+processo do Django (TAREFAS_TRABALHADOR_LOCAL) ou sozinho com
+`python manage.py processar_tarefas`.
+
+Duplicatas: chave_ativa é única e só fica preenchida enquanto a tarefa está
+pendente/executando, então um segundo "Treinar" ou uma segunda captura
+devolvem a tarefa que já existe. Tarefas sem batimento por TAREFA_PERDIDA
+segundos (servidor reiniciado no meio) são marcadas como falhas.
+"""
+import os
+import re
+import sys
+import threading
+import subprocess
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .models import Tarefa
+
+CONCORRENCIA_PADRAO = 2
+INTERVALO_FILA = 1.0        # segundos entre verificações da fila
+INTERVALO_BATIMENTO = 15    # segundos
+TAREFA_PERDIDA = 120        # segundos sem batimento
+INTERVALO_GRAVACAO = 0.5    # mínimo entre gravações de progresso
+LINHAS_SAIDA = 40
+
+RECONHECIMENTO_DIR = Path(settings.BASE_DIR) / 'academia' / 'reconhecimento'
+EXPORTACOES_DIR = Path(settings.MEDIA_ROOT) / 'exportacoes'
+
+# Processos de captura em execução neste processo (a câmera é uma só)
+capture_lock = threading.Lock()
+capture_processes = {}  # cliente_id -> Popen
+
+ATIVAS = ('pendente', 'executando')
+
+
+def enfileirar(tipo, chave, parametros=None, usuario=None):
+    """(tarefa, criada); se já existe tarefa ativa com a chave, devolve ela"""
+    for _ in range(3):
+        try:
+            with transaction.atomic():
+                tarefa = Tarefa.objects.create(
+                    tipo=tipo,
+                    chave=chave,
+                    chave_ativa=chave,
+                    parametros=parametros or {},
+                    usuario=usuario if usuario and usuario.is_authenticated else None,
+                )
+        except IntegrityError:
+            existente = Tarefa.objects.filter(chave_ativa=chave).first()
+            if existente is not None:
+                return existente, False
+            continue  # terminou entre o insert e a consulta: tenta de novo
+        if getattr(settings, 'TAREFAS_TRABALHADOR_LOCAL', True):
+            trabalhador.acordar()
+        return tarefa, True
+    raise RuntimeError(f"Nao foi possivel enfileirar a tarefa {chave}")
+
+
+def serializar(tarefa):
+    """Estado da tarefa para o endpoint JSON"""
+    agora = timezone.now()
+    etapas = list(tarefa.etapas)
+    if tarefa.status == 'executando' and etapas and etapas[-1].get('segundos') is None:
+        # Etapa em andamento: tempo até agora
+        inicio = datetime.fromisoformat(etapas[-1]['inicio'])
+        etapas[-1] = {**etapas[-1], 'segundos': round((agora - inicio).total_seconds(), 1)}
+    fim = tarefa.concluida_em or agora
+    return {
+        'id': tarefa.pk,
+        'tipo': tarefa.tipo,
+        'tipo_display': tarefa.get_tipo_display(),
+        'status': tarefa.status,
+        'status_display': tarefa.get_status_display(),
+        'etapa': tarefa.etapa,
+        'progresso': round(tarefa.progresso, 3),
+        'etapas': etapas,
+        'mensagem': tarefa.mensagem,
+        'saida': tarefa.saida.splitlines()[-10:],
+        'resultado': tarefa.resultado,
+        'criada_em': tarefa.criada_em.isoformat(),
+        'iniciada_em': tarefa.iniciada_em.isoformat() if tarefa.iniciada_em else None,
+        'concluida_em': tarefa.concluida_em.isoformat() if tarefa.concluida_em else None,
+        'segundos': round((fim - tarefa.iniciada_em).total_seconds(), 1) if tarefa.iniciada_em else None,
+        'ativa': tarefa.status in ATIVAS,
+    }
+
+
+class Acompanhamento:
+    """Grava etapa, progresso e saída de uma tarefa (com limite de frequência)"""
+
+    def __init__(self, tarefa):
+        self.tarefa = tarefa
+        self.etapas = list(tarefa.etapas)
+        self.saida = deque(tarefa.saida.splitlines(), maxlen=LINHAS_SAIDA)
+        self._ultima_gravacao = 0.0
+        self._lock = threading.Lock()
+
+    def _gravar(self, forcar=False, **campos):
+        agora = timezone.now()
+        with self._lock:
+            if not forcar and (agora.timestamp() - self._ultima_gravacao) < INTERVALO_GRAVACAO:
+                for campo, valor in campos.items():
+                    setattr(self.tarefa, campo, valor)
+                return
+            self._ultima_gravacao = agora.timestamp()
+            for campo, valor in campos.items():
+                setattr(self.tarefa, campo, valor)
+            try:
+                Tarefa.objects.filter(pk=self.tarefa.pk).update(
+                    etapa=self.tarefa.etapa,
+                    progresso=self.tarefa.progresso,
+                    etapas=self.etapas,
+                    saida='\n'.join(self.saida),
+                    atualizada_em=agora,
+                    **{c: getattr(self.tarefa, c) for c in campos if c not in ('etapa', 'progresso')},
+                )
+            except DatabaseError:
+                # Progresso é só informativo; o estado final (forcar) não pode se perder
+                if forcar:
+                    raise
+
+    def _fechar_etapa(self, agora):
+        if self.etapas and self.etapas[-1].get('segundos') is None:
+            inicio = datetime.fromisoformat(self.etapas[-1]['inicio'])
+            self.etapas[-1]['segundos'] = round((agora - inicio).total_seconds(), 2)
+
+    def etapa(self, nome):
+        agora = timezone.now()
+        self._fechar_etapa(agora)
+        self.etapas.append({'nome': nome, 'inicio': agora.isoformat(), 'segundos': None})
+        self._gravar(forcar=True, etapa=nome, progresso=0.0)
+
+    def progresso(self, feitas, total):
+        if total:
+            self._gravar(progresso=min(1.0, feitas / total))
+
+    def linha(self, texto):
+        self.saida.append(texto)
+        self._gravar()
+
+    def batimento(self):
+        self._gravar(forcar=True)
+
+    def terminar(self, status, mensagem='', resultado=None):
+        agora = timezone.now()
+        self._fechar_etapa(agora)
+        self._gravar(
+            forcar=True,
+            status=status,
+            mensagem=mensagem,
+            resultado=resultado or {},
+            progresso=1.0 if status == 'concluida' else self.tarefa.progresso,
+            concluida_em=agora,
+            chave_ativa=None,
+        )
+
+
+# ----- executores por tipo -----
+
+EXECUTORES = {}
+
+
+def executor(tipo):
+    def registrar(funcao):
+        EXECUTORES[tipo] = funcao
+        return funcao
+    return registrar
+
+
+def _rodar_script(acompanhamento, comando, interpretar, ao_iniciar=None, **popen):
+    """Roda um script e passa cada linha de saída para `interpretar`; devolve o código de saída"""
+    env = {**os.environ, 'PYTHONUNBUFFERED': '1', 'PYTHONIOENCODING': 'utf-8'}
+    processo = subprocess.Popen(
+        comando,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        encoding='utf-8',
+        errors='replace',
+        env=env,
+        **popen,
+    )
+    if ao_iniciar:
+        ao_iniciar(processo)
+    for linha in processo.stdout:
+        linha = linha.rstrip()
+        if not linha:
+            continue
+        acompanhamento.linha(linha)
+        interpretar(linha)
+    return processo.wait()
+
+
+RE_ETAPA = re.compile(r'^\[ETAPA\] (\S+)')
+RE_CLIENTE = re.compile(r'^\[(\d+)/(\d+)\] CLIENTE')
+RE_RESULTADO = re.compile(r'RESULTADO FINAL: (\d+) acertos / (\d+) erros \(([\d.]+)%\)')
+RE_VERSAO = re.compile(r'Modelo salvo! Versao (\S+)')
+
+
+@executor('treino')
+def executar_treino(tarefa, acompanhamento):
+    """treina.py em subprocesso; etapas pelas linhas [ETAPA] e clientes [n/total]"""
+    resultado = {}
+
+    def interpretar(linha):
+        if m := RE_ETAPA.match(linha):
+            acompanhamento.etapa(m.group(1))
+        elif m := RE_CLIENTE.match(linha):
+            acompanhamento.progresso(int(m.group(1)), int(m.group(2)))
+        elif m := RE_VERSAO.search(linha):
+            resultado['versao'] = m.group(1)
+        elif m := RE_RESULTADO.search(linha):
+            resultado['acertos'], resultado['erros'] = int(m.group(1)), int(m.group(2))
+            resultado['taxa'] = float(m.group(3))
+        elif 'Modelo ja esta atualizado' in linha:
+            resultado['atualizado'] = True
+
+    comando = [sys.executable, str(RECONHECIMENTO_DIR / 'treina.py')]
+    backend = tarefa.parametros.get('backend')
+    if backend:
+        comando += ['--backend', backend]
+    if tarefa.parametros.get('modo') == 'completo':
+        # A view já decidiu pelo completo; o treina.py não precisa adivinhar de novo
+        comando.append('--completo')
+    codigo = _rodar_script(acompanhamento, comando, interpretar)
+    if codigo != 0:
+        raise RuntimeError(f"treina.py terminou com codigo {codigo}")
+    if 'versao' in resultado:
+        mensagem = f"Modelo treinado (versão {resultado['versao']})"
+    else:
+        mensagem = "Modelo já estava atualizado"
+    return mensagem, resultado
+
+
+RE_FOTO = re.compile(r'^\[\+\] (\d+)/(\d+)')
+
+
+@executor('captura')
+def executar_captura(tarefa, acompanhamento):
+    """coleta.py (janela da câmera no servidor); progresso pelas linhas [+] n/total"""
+    cliente_id = int(tarefa.parametros['cliente_id'])
+    quantidade = int(tarefa.parametros.get('quantidade', 30))
+    fotos = {'salvas': 0}
+
+    def interpretar(linha):
+        if m := RE_FOTO.match(linha):
+            fotos['salvas'] = int(m.group(1))
+            acompanhamento.progresso(int(m.group(1)), int(m.group(2)))
+
+    def registrar_processo(processo):
+        with capture_lock:
+            capture_processes[cliente_id] = processo
+
+    acompanhamento.etapa('captura')
+    creationflags = subprocess.CREATE_NEW_CONSOLE if os.name == 'nt' else 0
+    comando = [sys.executable, str(RECONHECIMENTO_DIR / 'coleta.py'),
+               '--id', str(cliente_id), '--count', str(quantidade)]
+    try:
+        codigo = _rodar_script(acompanhamento, comando, interpretar,
+                               ao_iniciar=registrar_processo, creationflags=creationflags)
+    finally:
+        with capture_lock:
+            capture_processes.pop(cliente_id, None)
+    if codigo != 0:
+        raise RuntimeError(f"coleta.py terminou com codigo {codigo}")
+    return f"{fotos['salvas']} foto(s) capturada(s)", fotos
+
+
+@executor('cadastro_fotos')
+def executar_cadastro_fotos(tarefa, acompanhamento):
+    """manage.py cadastrar_fotos_perfil; progresso pelas linhas [n/total] CLIENTE"""
+    resultado = {'cadastrados': 0, 'falhas': 0}
+
+    def interpretar(linha):
+        if m := RE_CLIENTE.match(linha):
+            acompanhamento.progresso(int(m.group(1)), int(m.group(2)))
+            resultado['falhas' if '[ERRO]' in linha else 'cadastrados'] += 1
+
+    acompanhamento.etapa('cadastro')
+    comando = [sys.executable, str(Path(settings.BASE_DIR) / 'manage.py'), 'cadastrar_fotos_perfil']
+    clientes = tarefa.parametros.get('clientes')
+    if clientes:
+        comando += ['--clientes', *map(str, clientes)]
+    if tarefa.parametros.get('pular_com_fotos'):
+        comando.append('--pular-com-fotos')
+    codigo = _rodar_script(acompanhamento, comando, interpretar)
+    if codigo != 0:
+        raise RuntimeError(f"cadastrar_fotos_perfil terminou com codigo {codigo}")
+    mensagem = f"{resultado['cadastrados']} cliente(s) cadastrado(s) pela foto de perfil"
+    if resultado['falhas']:
+        mensagem += f", {resultado['falhas']} sem rosto utilizável"
+    return mensagem, resultado
+
+
+@executor('exportacao')
+def executar_exportacao(tarefa, acompanhamento):
+    """CSV gravado em MEDIA_ROOT/exportacoes/, baixado por tarefa_arquivo"""
+    from .exportacao import EXPORTACOES
+
+    formato = tarefa.parametros['formato']
+    filtros = tarefa.parametros.get('filtros', {})
+    consultar, nomear, escrever = EXPORTACOES[formato]
+
+    acompanhamento.etapa('consulta')
+    registros = consultar(filtros)
+    nome_arquivo = nomear(filtros)
+
+    acompanhamento.etapa('escrita')
+    EXPORTACOES_DIR.mkdir(parents=True, exist_ok=True)
+    destino = EXPORTACOES_DIR / f"{tarefa.pk}-{nome_arquivo}"
+    with open(destino, 'w', newline='', encoding='utf-8-sig') as arquivo:
+        linhas = escrever(arquivo, registros, progresso=acompanhamento.progresso)
+    return f"{linhas} linha(s) exportada(s)", {
+        'arquivo': str(destino.relative_to(settings.MEDIA_ROOT)),
+        'nome': nome_arquivo,
+        'linhas': linhas,
+    }
+
+
+# ----- trabalhador -----
+
+class Trabalhador:
+    """Pega tarefas pendentes e executa em threads, com limite de concorrência"""
+
+    def __init__(self, concorrencia=None, intervalo=INTERVALO_FILA):
+        self.concorrencia = concorrencia or getattr(settings, 'TAREFAS_CONCORRENCIA', CONCORRENCIA_PADRAO)
+        self.intervalo = intervalo
+        self._vagas = threading.Semaphore(self.concorrencia)
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def acordar(self):
+        self.iniciar()
+        self._acordar.set()
+
+    def iniciar(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='trabalhador-tarefas', daemon=True)
+                self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+
+    def _loop(self):
+        while not self._parar.is_set():
+            try:
+                self.recuperar_perdidas()
+                self.despachar()
+            except Exception as e:
+                print(f"[AVISO] Falha na fila de tarefas: {e}")
+            finally:
+                close_old_connections()
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+
+    def executar_para_sempre(self):
+        """Loop em primeiro plano (manage.py processar_tarefas)"""
+        self._thread = threading.current_thread()
+        try:
+            self._loop()
+        except KeyboardInterrupt:
+            self.parar()
+
+    def recuperar_perdidas(self):
+        """Tarefas 'executando' sem batimento: o processo que rodava morreu"""
+        limite = timezone.now() - timedelta(seconds=TAREFA_PERDIDA)
+        return Tarefa.objects.filter(status='executando', atualizada_em__lt=limite).update(
+            status='falhou',
+            mensagem='Interrompida (servidor reiniciado durante a execução)',
+            chave_ativa=None,
+            concluida_em=timezone.now(),
+        )
+
+    def _reservar(self):
+        """A pendente mais antiga; o UPDATE condicional garante um dono só"""
+        # Limite global: outros processos (runserver + processar_tarefas) contam
+        if Tarefa.objects.filter(status='executando').count() >= self.concorrencia:
+            return None
+        pendentes = Tarefa.objects.filter(status='pendente').order_by('criada_em')
+        for pk in pendentes.values_list('pk', flat=True)[:10]:
+            agora = timezone.now()
+            if Tarefa.objects.filter(pk=pk, status='pendente').update(
+                    status='executando', iniciada_em=agora, atualizada_em=agora):
+                return Tarefa.objects.get(pk=pk)
+        return None
+
+    def despachar(self):
+        while self._vagas.acquire(blocking=False):
+            tarefa = self._reservar()
+            if tarefa is None:
+                self._vagas.release()
+                return
+            threading.Thread(target=self._executar, args=(tarefa,),
+                             name=f'tarefa-{tarefa.pk}', daemon=True).start()
+
+    def _executar(self, tarefa):
+        acompanhamento = Acompanhamento(tarefa)
+        terminou = threading.Event()
+
+        def bater():
+            try:
+                while not terminou.wait(INTERVALO_BATIMENTO):
+                    acompanhamento.batimento()
+            finally:
+                connection.close()
+
+        batimento = threading.Thread(target=bater, name=f'batimento-{tarefa.pk}', daemon=True)
+        batimento.start()
+        print(f"[TAREFA] #{tarefa.pk} {tarefa.tipo} iniciada")
+        try:
+            mensagem, resultado = EXECUTORES[tarefa.tipo](tarefa, acompanhamento)
+            acompanhamento.terminar('concluida', mensagem, resultado)
+            print(f"[TAREFA] #{tarefa.pk} concluida: {mensagem}")
+        except Exception as e:
+            acompanhamento.terminar('falhou', str(e))
+            print(f"[TAREFA] #{tarefa.pk} falhou: {e}")
+        finally:
+            terminou.set()
+            self._vagas.release()
+            connection.close()
+            self._acordar.set()
+
+
+trabalhador = Trabalhador()
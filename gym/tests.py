@@ -1,3 +1,116 @@
-from django.test import TestCase
+import tempfile
+from datetime import date, time
+from pathlib import Path
 
-# Create your tests here.
+import cv2
+import numpy as np
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TransactionTestCase
+
+from academia.reconhecimento.lbph_vetorizado import GaleriaLBPH, histogramas
+
+
+def _faces_sinteticas(clientes=4, fotos=5, lado=64, semente=0):
+    """Faces sintéticas: um padrão suave por cliente + ruído por foto (rótulo 10, 20, ...)"""
+    rng = np.random.default_rng(semente)
+    bases = [cv2.GaussianBlur(rng.integers(0, 256, (lado, lado)).astype(np.uint8), (5, 5), 0)
+             for _ in range(clientes)]
+    faces, rotulos = [], []
+    for i, base in enumerate(bases):
+        for _ in range(fotos):
+            faces.append(np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8))
+            rotulos.append((i + 1) * 10)
+    return bases, faces, np.array(rotulos, dtype=np.int32)
+
+
+class LBPHVetorizadoTests(SimpleTestCase):
+    lado = 64
+    parametros = {'tamanho_face': 64, 'raio': 1, 'vizinhos': 8, 'grade': 8}
+
+    def setUp(self):
+        bases, self.faces, self.rotulos = _faces_sinteticas(lado=self.lado)
+        # Mesmas bases com ruído novo (fora da galeria) e uma face de ninguém
+        rng = np.random.default_rng(1)
+        self.consultas = [np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8) for base in bases]
+        self.consultas.append(rng.integers(0, 256, (self.lado, self.lado)).astype(np.uint8))
+
+        self.opencv = cv2.face.LBPHFaceRecognizer_create(radius=1, neighbors=8, grid_x=8, grid_y=8)
+        self.opencv.train(self.faces, self.rotulos)
+        self.pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(self.pasta.cleanup)
+
+    def _salvar(self, nome='trainer.snap', **cabecalho):
+        caminho = Path(self.pasta.name) / nome
+        GaleriaLBPH.salvar(caminho, histogramas(np.stack(self.faces)), self.rotulos, self.parametros,
+                           versao='teste', **cabecalho)
+        return caminho
+
+    def test_histogramas_iguais_aos_do_opencv(self):
+        esperados = np.vstack([h.reshape(1, -1) for h in self.opencv.getHistograms()])
+        np.testing.assert_allclose(histogramas(np.stack(self.faces)), esperados, rtol=0, atol=1e-7)
+
+    def test_top1_igual_ao_predict_do_opencv(self):
+        galeria = GaleriaLBPH.carregar(self._salvar(), mmap=False)
+        resultados = galeria.buscar(galeria.extrair(self.consultas), k=1)
+        for consulta, resultado in zip(self.consultas, resultados):
+            rotulo, distancia = self.opencv.predict(consulta)
+            self.assertEqual(resultado[0][0], rotulo)
+            self.assertAlmostEqual(resultado[0][1], distancia, delta=distancia * 1e-4)
+
+    def test_fragmentos_nao_mudam_o_resultado(self):
+        inteira = GaleriaLBPH.carregar(self._salvar(), mmap=False)
+        fragmentada = GaleriaLBPH.carregar(self._salvar('fragmentado.snap', fragmentos=3), mmap=False)
+        consultas = inteira.extrair(self.consultas)
+        self.assertEqual([r[0][0] for r in inteira.buscar(consultas)],
+                         [r[0][0] for r in fragmentada.buscar(consultas)])
+
+    def test_snapshot_preserva_limiares(self):
+        galeria = GaleriaLBPH.carregar(self._salvar(limiares=[55.0, 65.0, 85.0]))
+        self.assertEqual(galeria.limiares, (55.0, 65.0, 85.0))
+        self.assertEqual(galeria.fragmento(0).limiares, (55.0, 65.0, 85.0))
+        self.assertEqual(galeria.parametros, self.parametros)
+        self.assertEqual(galeria.versao, 'teste')
+        self.assertEqual(len(galeria), len(self.rotulos))
+
+    def test_snapshot_sem_limiares(self):
+        self.assertIsNone(GaleriaLBPH.carregar(self._salvar()).limiares)
+
+
+class PresencaUnicaPorDiaMigrationTests(TransactionTestCase):
+    """0011: o RunPython tira as duplicadas antes da constraint entrar"""
+    antes = [('gym', '0010_alteracaocadastro')]
+    depois = [('gym', '0011_presenca_unica_por_dia')]
+
+    def _migrar(self, alvo):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(alvo)
+        return executor.loader.project_state(alvo).apps
+
+    def tearDown(self):
+        # Volta ao schema atual para os outros testes
+        self._migrar(MigrationExecutor(connection).loader.graph.leaf_nodes('gym'))
+
+    def test_remove_duplicadas_e_barra_novas(self):
+        apps = self._migrar(self.antes)
+        Cliente = apps.get_model('gym', 'Cliente')
+        Presenca = apps.get_model('gym', 'Presenca')
+        ana = Cliente.objects.create(identidade='1', nome='Ana')
+        bruno = Cliente.objects.create(identidade='2', nome='Bruno')
+        hoje, ontem = date(2026, 10, 18), date(2026, 10, 17)
+        for cliente, dia, hora in [(ana, hoje, time(9)), (ana, hoje, time(8)), (ana, hoje, time(10)),
+                                   (ana, ontem, time(9)), (bruno, hoje, time(7)), (bruno, hoje, time(7))]:
+            presenca = Presenca.objects.create(cliente=cliente, tipo='facial')
+            # auto_now_add ignora o valor passado no create
+            Presenca.objects.filter(pk=presenca.pk).update(data=dia, hora=hora)
+
+        apps = self._migrar(self.depois)
+        Presenca = apps.get_model('gym', 'Presenca')
+        restantes = sorted(Presenca.objects.values_list('cliente_id', 'data', 'hora'))
+        self.assertEqual(restantes, [(ana.pk, ontem, time(9)), (ana.pk, hoje, time(8)), (bruno.pk, hoje, time(7))])
+
+        # O reconhecimento grava com ignore_conflicts: a segunda do dia não entra
+        Presenca.objects.bulk_create([Presenca(cliente_id=ana.pk, tipo='facial')], ignore_conflicts=True)
+        Presenca.objects.bulk_create([Presenca(cliente_id=ana.pk, tipo='facial')], ignore_conflicts=True)
+        self.assertEqual(Presenca.objects.filter(cliente_id=ana.pk, data=date.today()).count(), 1)
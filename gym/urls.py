@@ -36,10 +36,18 @@ urlpatterns = [
 
 
     path('clientes/<int:pk>/coletar-imagens/', views.coletar_imagens_cliente, name='coletar_imagens_cliente'),
+    path('clientes/<int:pk>/captura-web/', views.captura_web_cliente, name='captura_web_cliente'),
+    path('clientes/<int:pk>/captura-web/lote/', views.captura_web_lote, name='captura_web_lote'),
+    path('clientes/<int:pk>/captura-web/encerrar/', views.captura_web_encerrar, name='captura_web_encerrar'),
     path('reconhecimento/', views.reconhecimento_once_view, name='reconhecimento_one'),
     path('reconhecimento/treinar/', views.treinar_modelo, name='treinar_modelo'),
     path('reconhecimento/deletar/<int:pk>/', views.deletar_reconhecimento, name='deletar_reconhecimento'),
     path('cliente/deletar-completo/<int:pk>/', views.deletar_cliente_completo, name='deletar_cliente_completo'),
+
+    path('tarefas/status/', views.tarefas_status, name='tarefas_status'),
+    path('tarefas/<int:pk>/status/', views.tarefa_status, name='tarefa_status'),
+    path('tarefas/<int:pk>/arquivo/', views.tarefa_arquivo, name='tarefa_arquivo'),
+    path('exportar/<str:formato>/', views.exportar_csv, name='exportar_csv'),
  
     path('', views.login_view, name='login'),
     path('login/', views.login_view, name='login'),
@@ -4,7 +4,6 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponse
 from datetime import date, timedelta, datetime
-import csv
 import subprocess
 import sys
 import os
@@ -13,17 +12,24 @@ from .models import ClientePlano
 from .models import Servico, DiaSemana, PlanoServico
 from .models import Cliente, Plano, Pagamento, ClientePlano, Servico, Presenca
 from .forms import ClienteForm, PlanoForm, PagamentoForm, ClientePlanoFormSet, ServicoForm
-from .models import Servico
-from threading import Lock
+from .presencas import registrar_presenca_manual
+from .acesso import situacoes, rotulo_vencimento
+from .exportacao import (
+    filtrar_presencas, nome_arquivo_presencas, escrever_presencas,
+    listar_pagamentos, escrever_pagamentos,
+)
+from .tarefas import enfileirar, serializar, trabalhador, capture_lock, capture_processes, ATIVAS
+from .exportacao import EXPORTACOES
+from .models import Servico, Tarefa
 from django.db import models
 from django.db.models import Q
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.models import User
 import shutil
-
-# Lock para evitar múltiplas chamadas simultâneas
-capture_lock = Lock()
-capture_processes = {}  # rastreia processos em execução
+import json
+import hashlib
+from django.http import JsonResponse, FileResponse, Http404
+from django.utils import timezone
 
 # Home
 @login_required
@@ -99,35 +105,18 @@ def lista_clientes(request):
     clientes_list = clientes_list.order_by('-id')
     
     clientes_data = []
-    hoje = date.today()
-    
+    clientes_list = list(clientes_list)
+
+    # Situação de todos os clientes da página em uma consulta (e em cache)
+    situacoes.sincronizar()
+    situacoes_clientes = situacoes.obter_varios(c.pk for c in clientes_list)
+
     for cliente in clientes_list:
-        plano_ativo = ClientePlano.objects.filter(
-            cliente=cliente, 
-            ativo=True
-        ).first()
-        
-        if plano_ativo:
-            dias_restantes = (plano_ativo.data_fim - hoje).days
-            
-            if dias_restantes < 0:
-                status_vencimento = f'Vencido há {abs(dias_restantes)} dias'
-                status_class = 'text-danger'
-            elif dias_restantes == 0:
-                status_vencimento = 'Vence hoje'
-                status_class = 'text-warning'
-            elif dias_restantes <= 7:
-                status_vencimento = f'Vence em {dias_restantes} dias'
-                status_class = 'text-warning'
-            else:
-                status_vencimento = plano_ativo.data_fim.strftime('%d/%m/%Y')
-                status_class = 'text-success'
-            
-            plano_nome = plano_ativo.plano.nome
-        else:
-            status_vencimento = 'Sem plano'
-            status_class = 'text-secondary'
-            plano_nome = '-'
+        situacao = situacoes_clientes.get(cliente.pk)
+        if situacao is None:
+            continue    # removido entre as duas consultas
+        status_vencimento, status_class = rotulo_vencimento(situacao)
+        plano_nome = situacao['plano'] or '-'
         
         clientes_data.append({
             'pk': cliente.pk,
@@ -369,45 +358,12 @@ def pagamento_list(request):
 # Exportar pagamentos para CSV
 @login_required
 def pagamento_csv(request):
-    pagamentos = Pagamento.objects.select_related('cliente', 'plano', 'plano__tipo', 'usuario').all()
+    pagamentos = listar_pagamentos()
     
     response = HttpResponse(content_type='text/csv; charset=utf-8-sig')
     response['Content-Disposition'] = 'attachment; filename="pagamentos.csv"'
     
-    writer = csv.writer(response, delimiter=';') 
-    
-    # Cabeçalho
-    writer.writerow([
-        'ID',
-        'Cliente',
-        'Identidade',
-        'Plano',
-        'Tipo de Plano',
-        'Método',
-        'Valor do Plano',
-        'Juros',
-        'Descontos',
-        'Total Pago',
-        'Data/Hora',
-        'Registrado por'
-    ])
-    
-    # dados formatados
-    for p in pagamentos:
-        writer.writerow([
-            p.id,
-            p.cliente.nome,
-            p.cliente.identidade,
-            p.plano.nome,
-            p.plano.tipo.get_nome_display(),
-            p.get_metodo_display(),
-            f'R$ {p.plano.preco:.2f}'.replace('.', ','),
-            f'R$ {(p.juros or 0):.2f}'.replace('.', ','),
-            f'R$ {(p.descontos or 0):.2f}'.replace('.', ','),
-            f'R$ {p.total:.2f}'.replace('.', ','),
-            p.data.strftime('%d/%m/%Y %H:%M:%S'),
-            p.usuario.username if p.usuario else 'Sistema'
-        ])
+    escrever_pagamentos(response, pagamentos)
     
     return response
 # Limpar todos os pagamentos
@@ -499,15 +455,24 @@ def servico_delete(request, pk):
 @login_required
 def coletar_imagens_cliente(request, pk):
     cliente = get_object_or_404(Cliente, pk=pk)
-    base = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'academia', 'reconhecimento'))
-    script = os.path.join(base, 'coleta.py')
-    python_exec = sys.executable
     
-    creationflags = subprocess.CREATE_NEW_CONSOLE if os.name == 'nt' else 0
+    # A câmera é uma só: recusa enquanto houver captura aberta
+    with capture_lock:
+        abertas = [cid for cid, proc in capture_processes.items() if proc.poll() is None]
+    if abertas:
+        messages.warning(request, f"⏳ Já existe uma captura aberta na câmera (cliente {abertas[0]}). Feche com ESC antes.")
+        return redirect('cliente_detail', pk=pk)
     
     try:
-        proc = subprocess.Popen([python_exec, script, '--id', str(pk), '--count', '30'], creationflags=creationflags)
-        messages.success(request, f"Coleta iniciada para {cliente.nome}. Feche ESC para terminar.")
+        tarefa, criada = enfileirar('captura', 'captura', {'cliente_id': pk, 'quantidade': 30}, request.user)
+        if criada:
+            messages.success(request, f"Coleta iniciada para {cliente.nome}. Feche ESC para terminar.")
+        else:
+            messages.warning(
+                request,
+                f"⏳ Já existe uma captura na fila ou em andamento "
+                f"(tarefa #{tarefa.pk}, cliente {tarefa.parametros.get('cliente_id')})."
+            )
     except Exception as exc:
         messages.error(request, f"Erro: {exc}")
     
@@ -515,28 +480,65 @@ def coletar_imagens_cliente(request, pk):
 
 
 
+@login_required
+def captura_web_cliente(request, pk):
+    """Página de cadastro facial pela câmera do navegador"""
+    from .captura_web import META_PADRAO
+    cliente = get_object_or_404(Cliente, pk=pk)
+    return render(request, 'clientes/captura_web.html', {'cliente': cliente, 'meta': META_PADRAO})
+
+
+@login_required
+def captura_web_lote(request, pk):
+    """Recebe um lote de frames (multipart 'frames' ou octet-stream com tamanho+JPEG)"""
+    from .captura_web import captura_web, separar_frames_binarios, FilaCheia, LoteDemorado, LoteInvalido, META_PADRAO
+    if request.method != 'POST':
+        return JsonResponse({'erro': 'Use POST'}, status=405)
+    cliente = get_object_or_404(Cliente, pk=pk)
+    
+    sessao = request.GET.get('sessao', '')
+    try:
+        meta = max(1, min(int(request.GET.get('meta', META_PADRAO)), 200))
+    except ValueError:
+        return JsonResponse({'erro': 'meta inválida'}, status=400)
+    
+    try:
+        if request.content_type == 'application/octet-stream':
+            frames = separar_frames_binarios(request.body)
+        else:
+            frames = [arquivo.read() for arquivo in request.FILES.getlist('frames')]
+        resultado = captura_web.processar(cliente.pk, sessao, frames, meta=meta)
+    except LoteInvalido as e:
+        return JsonResponse({'erro': str(e)}, status=400)
+    except FilaCheia:
+        return JsonResponse({'erro': 'Servidor ocupado, tente de novo'}, status=429)
+    except LoteDemorado:
+        return JsonResponse({'erro': 'Lote demorou demais, tente de novo'}, status=503)
+    
+    return JsonResponse(resultado)
+
+
+@login_required
+def captura_web_encerrar(request, pk):
+    """Fecha a sessão de captura (espera as fotos terminarem de gravar)"""
+    from .captura_web import captura_web
+    if request.method != 'POST':
+        return JsonResponse({'erro': 'Use POST'}, status=405)
+    cliente = get_object_or_404(Cliente, pk=pk)
+    salvas = captura_web.encerrar(cliente.pk)
+    return JsonResponse({'salvas': salvas})
+
+
 # treinamento de modelo
 @login_required
 def treinar_modelo(request):
-    """Executa o script de treinamento do modelo LBPH"""
+    """Enfileira o treinamento do modelo (roda em background, ver gym/tarefas.py)"""
     if request.method == 'POST':
+        # OpenCV/numpy só quando alguém treina, não em todo worker do Django
+        from academia.reconhecimento.manifesto import escanear_dataset, decidir_modo
+        from academia.reconhecimento.galeria import config_prototipos
+        from academia.reconhecimento.reconhecedores import BACKEND_PADRAO
         try:
-            # Caminho do script de treinamento
-            script_path = os.path.join(
-                settings.BASE_DIR,
-                'academia',
-                'reconhecimento',
-                'treina.py'
-            )
-            
-            # Caminho onde o trainer.yml deve ser salvo
-            trainer_path = os.path.join(
-                settings.BASE_DIR,
-                'academia',
-                'reconhecimento',
-                'trainer.yml'
-            )
-            
             # Verifica se há dataset
             dataset_path = os.path.join(settings.BASE_DIR, 'dataset')
             if not os.path.exists(dataset_path) or not os.listdir(dataset_path):
@@ -551,62 +553,34 @@ def treinar_modelo(request):
                 )
                 return redirect(request.META.get('HTTP_REFERER', 'home'))
             
-            print(f"\n[INFO] Executando treinamento...")
-            print(f"[INFO] Script: {script_path}")
-            print(f"[INFO] Trainer será salvo em: {trainer_path}")
-            
-            # Executa o script
-            processo = subprocess.Popen(
-                [sys.executable, script_path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            # Aguarda conclusão e captura output
-            stdout, stderr = processo.communicate()
-            
-            # Mostra output no console do Django
-            print("\n" + "="*60)
-            print("📋 OUTPUT DO TREINAMENTO:")
-            print("="*60)
-            print(stdout)
-            if stderr:
-                print("\n⚠️ ERROS:")
-                print(stderr)
-            print("="*60 + "\n")
+            # Nada mudou no dataset desde o modelo publicado: nem sobe o treino
+            backend = getattr(settings, 'RECONHECIMENTO_BACKEND', BACKEND_PADRAO)
+            prototipos = config_prototipos(getattr(settings, 'TREINO_PROTOTIPOS', None),
+                                           getattr(settings, 'TREINO_PROTOTIPOS_METODO', 'medoide'))
+            modo, motivo, _ = decidir_modo(escanear_dataset(dataset_path), backend, prototipos=prototipos,
+                                           fragmentos=getattr(settings, 'TREINO_FRAGMENTOS', 1))
+            if modo == 'nada':
+                messages.info(
+                    request,
+                    'ℹ️ Modelo já está atualizado!\n\n'
+                    'Nenhuma foto nova, removida ou alterada desde o último treino.'
+                )
+                return redirect(request.META.get('HTTP_REFERER', 'home'))
             
-            # Verifica se o arquivo trainer.yml foi criado
-            if os.path.exists(trainer_path):
-                # Conta quantos clientes foram treinados
-                total_clientes = len([d for d in os.listdir(dataset_path) 
-                                     if os.path.isdir(os.path.join(dataset_path, d))])
-                
+            tarefa, criada = enfileirar('treino', 'treino', {'backend': backend, 'modo': modo}, request.user)
+            if criada:
                 messages.success(
                     request,
-                    f'✅ Modelo treinado com sucesso!\n\n'
-                    f'📊 Estatísticas:\n'
-                    f'• {total_clientes} cliente(s) processado(s)\n'
-                    f'• Modelo salvo em: trainer.yml\n\n'
-                    f'🎯 Próximos passos:\n'
-                    f'1. Vá em Presenças\n'
-                    f'2. Clique em "Reconhecimento Facial"\n'
-                    f'3. Posicione o rosto na câmera'
+                    f'🚀 Treinamento iniciado em segundo plano ({modo}: {motivo}).\n\n'
+                    f'Acompanhe o progresso no painel de tarefas.'
                 )
             else:
-                messages.error(
-                    request,
-                    f'❌ Treinamento executou mas trainer.yml não foi criado!\n\n'
-                    f'📋 Output:\n{stdout}\n\n'
-                    f'⚠️ Erros:\n{stderr if stderr else "Nenhum"}\n\n'
-                    f'💡 Tente executar manualmente:\n'
-                    f'python academia/reconhecimento/treina.py'
-                )
+                messages.warning(request, f'⏳ Já existe um treinamento em andamento (tarefa #{tarefa.pk}).')
         
         except Exception as e:
             messages.error(
                 request,
-                f'❌ Erro ao executar treinamento:\n\n'
+                f'❌ Erro ao iniciar treinamento:\n\n'
                 f'{str(e)}\n\n'
                 f'💡 Tente manualmente no terminal:\n'
                 f'python academia/reconhecimento/treina.py'
@@ -616,6 +590,54 @@ def treinar_modelo(request):
     # Redireciona de volta
     return redirect(request.META.get('HTTP_REFERER', 'home'))
 
+
+# fila de tarefas
+@login_required
+def exportar_csv(request, formato):
+    """Enfileira a exportação CSV (presencas ou pagamentos) com os filtros da listagem"""
+    if formato not in EXPORTACOES:
+        raise Http404
+    if request.method == 'POST':
+        filtros = {campo: valor for campo, valor in request.POST.items()
+                   if campo in ('cliente', 'data_inicio', 'data_fim', 'tipo') and valor}
+        assinatura = hashlib.sha1(json.dumps(filtros, sort_keys=True).encode()).hexdigest()[:16]
+        tarefa, criada = enfileirar('exportacao', f'exportacao:{formato}:{assinatura}',
+                                    {'formato': formato, 'filtros': filtros}, request.user)
+        if criada:
+            messages.success(request, '📄 Exportação iniciada! O link para baixar aparece no painel de tarefas.')
+        else:
+            messages.info(request, f'⏳ Essa exportação já está em andamento (tarefa #{tarefa.pk}).')
+    return redirect(request.META.get('HTTP_REFERER', 'home'))
+
+
+@login_required
+def tarefas_status(request):
+    """JSON com as tarefas ativas e as que terminaram nos últimos minutos"""
+    if getattr(settings, 'TAREFAS_TRABALHADOR_LOCAL', True):
+        trabalhador.iniciar()  # retoma pendentes deixadas por um reinício
+    recentes = timezone.now() - timedelta(minutes=10)
+    tarefas = Tarefa.objects.filter(Q(status__in=ATIVAS) | Q(concluida_em__gte=recentes))[:10]
+    return JsonResponse({'tarefas': [serializar(tarefa) for tarefa in tarefas]})
+
+
+@login_required
+def tarefa_status(request, pk):
+    """JSON com etapa, progresso e tempos de uma tarefa"""
+    tarefa = get_object_or_404(Tarefa, pk=pk)
+    return JsonResponse(serializar(tarefa))
+
+
+@login_required
+def tarefa_arquivo(request, pk):
+    """Baixa o CSV de uma exportação concluída"""
+    tarefa = get_object_or_404(Tarefa, pk=pk, tipo='exportacao', status='concluida')
+    caminho = os.path.join(settings.MEDIA_ROOT, tarefa.resultado.get('arquivo', ''))
+    if not tarefa.resultado.get('arquivo') or not os.path.exists(caminho):
+        raise Http404
+    return FileResponse(open(caminho, 'rb'), as_attachment=True,
+                        filename=tarefa.resultado.get('nome', os.path.basename(caminho)),
+                        content_type='text/csv; charset=utf-8-sig')
+
 #presenca 
 @login_required
 def presenca_list(request):
@@ -693,13 +715,13 @@ def presenca_create(request):
         
         cliente = get_object_or_404(Cliente, pk=cliente_id)
         
-        Presenca.objects.create(
-            cliente=cliente,
-            usuario=request.user,
-            tipo=tipo
-        )
+        # Uma presença por cliente por dia (constraint no banco)
+        presenca, criada = registrar_presenca_manual(cliente, request.user, tipo)
         
-        messages.success(request, f'✅ Presença de {cliente.nome} registrada!')
+        if criada:
+            messages.success(request, f'✅ Presença de {cliente.nome} registrada!')
+        else:
+            messages.info(request, f'ℹ️ {cliente.nome} já tem presença registrada hoje ({presenca.hora.strftime("%H:%M")}).')
         return redirect('presenca_list')
     
     clientes = Cliente.objects.filter(status=True).order_by('nome')
@@ -708,73 +730,14 @@ def presenca_create(request):
 @login_required
 def presenca_csv_export(request):
     """Exporta presenças para CSV COM FILTROS"""
-    #  Captura os mesmos filtros da listagem
-    cliente_id = request.GET.get('cliente', '')
-    data_inicio = request.GET.get('data_inicio', '')
-    data_fim = request.GET.get('data_fim', '')
-    tipo = request.GET.get('tipo', '')
-    
-    #  Aplica os mesmos filtros
-    presencas = Presenca.objects.select_related('cliente', 'usuario').all()
-    
-    if cliente_id:
-        presencas = presencas.filter(cliente_id=cliente_id)
-    
-    if data_inicio:
-        try:
-            data_inicio_obj = datetime.strptime(data_inicio, '%Y-%m-%d').date()
-            presencas = presencas.filter(data__gte=data_inicio_obj)
-        except ValueError:
-            pass
-    
-    if data_fim:
-        try:
-            data_fim_obj = datetime.strptime(data_fim, '%Y-%m-%d').date()
-            presencas = presencas.filter(data__lte=data_fim_obj)
-        except ValueError:
-            pass
-    
-    if tipo:
-        presencas = presencas.filter(tipo=tipo)
-    
-    presencas = presencas.order_by('-data', '-hora')
-    
-    # Nome do arquivo com filtros
-    nome_arquivo = f'presencas_{date.today().strftime("%Y%m%d")}'
-    if cliente_id:
-        cliente = Cliente.objects.get(pk=cliente_id)
-        nome_arquivo += f'_{cliente.nome.replace(" ", "_")}'
-    if data_inicio or data_fim:
-        nome_arquivo += '_periodo'
-    nome_arquivo += '.csv'
+    #  Aplica os mesmos filtros da listagem
+    presencas = filtrar_presencas(request.GET)
+    nome_arquivo = nome_arquivo_presencas(request.GET)
     
     response = HttpResponse(content_type='text/csv; charset=utf-8-sig')
     response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
     
-    writer = csv.writer(response, delimiter=';')
-    
-    # Cabeçalho
-    writer.writerow([
-        'ID',
-        'Cliente',
-        'Identidade',
-        'Tipo',
-        'Data',
-        'Hora',
-        'Registrado por'
-    ])
-    
-    # Dados
-    for p in presencas:
-        writer.writerow([
-            p.id,
-            p.cliente.nome,
-            p.cliente.identidade,
-            'IA Facial' if p.tipo == 'facial' else 'Manual',
-            p.data.strftime('%d/%m/%Y'),
-            p.hora.strftime('%H:%M:%S'),
-            p.usuario.username if p.usuario else 'Sistema'
-        ])
+    escrever_presencas(response, presencas)
     
     return response
 
@@ -806,11 +769,17 @@ def reconhecimento_once_view(request):
         messages.error(request, f'❌ Script não encontrado: {reconhece_path}')
         return redirect('presenca_list')
     
+    cameras = [str(c) for c in getattr(settings, 'CAMERAS_RECONHECIMENTO', [0])]
+    if len(cameras) > 1:
+        # Várias entradas: um processo só, com modelo e cooldown compartilhados
+        comando = [sys.executable, os.path.join(base, 'multicamera.py'), '--cameras', *cameras]
+    else:
+        comando = [sys.executable, reconhece_path, '--fonte', cameras[0]]
+    
     try:
-        python_exec = sys.executable
         creationflags = subprocess.CREATE_NEW_CONSOLE if os.name == 'nt' else 0
-        subprocess.Popen([python_exec, reconhece_path], creationflags=creationflags)
-        messages.success(request, '🎥 Câmera aberta! Pressione Q para fechar.')
+        subprocess.Popen(comando, creationflags=creationflags)
+        messages.success(request, f'🎥 {len(cameras)} câmera(s) aberta(s)! Pressione Q para fechar.')
     except Exception as e:
         messages.error(request, f'❌ Erro ao abrir câmera: {str(e)}')
     
@@ -899,6 +868,7 @@ def deletar_reconhecimento(request, pk):
     cliente = get_object_or_404(Cliente, pk=pk)
     
     if request.method == 'POST':
+        from academia.reconhecimento.indice import remover_cliente_do_indice, INDICE_PATH
         try:
             # Caminho da pasta do dataset
             dataset_dir = os.path.join('dataset', str(cliente.id))
@@ -910,14 +880,24 @@ def deletar_reconhecimento(request, pk):
             else:
                 mensagem_dataset = '⚠️ Dataset não encontrado'
             
-            # Avisa que precisa retreinar
-            messages.warning(
-                request, 
-                f'🗑️ Reconhecimento facial de {cliente.nome} deletado!\n\n'
-                f'{mensagem_dataset}\n\n'
-                f'⚠️ IMPORTANTE: Execute o treinamento novamente para atualizar o modelo:\n'
-                f'python academia/reconhecimento/treina.py'
-            )
+            # Com índice IVF: lápide no índice, sem retreinar
+            if INDICE_PATH.exists():
+                remover_cliente_do_indice(cliente.id)
+                messages.success(
+                    request,
+                    f'🗑️ Reconhecimento facial de {cliente.nome} deletado!\n\n'
+                    f'{mensagem_dataset}\n\n'
+                    f'✅ Cliente removido do índice de reconhecimento (sem retreinar)'
+                )
+            else:
+                # Avisa que precisa retreinar
+                messages.warning(
+                    request, 
+                    f'🗑️ Reconhecimento facial de {cliente.nome} deletado!\n\n'
+                    f'{mensagem_dataset}\n\n'
+                    f'⚠️ IMPORTANTE: Execute o treinamento novamente para atualizar o modelo:\n'
+                    f'python academia/reconhecimento/treina.py'
+                )
             
             return redirect('cliente_detail', pk=pk)
             
@@ -937,6 +917,7 @@ def deletar_cliente_completo(request, pk):
     cliente = get_object_or_404(Cliente, pk=pk)
     
     if request.method == 'POST':
+        from academia.reconhecimento.indice import remover_cliente_do_indice, INDICE_PATH
         try:
             nome_cliente = cliente.nome
             
@@ -944,6 +925,8 @@ def deletar_cliente_completo(request, pk):
             dataset_dir = os.path.join('dataset', str(cliente.id))
             if os.path.exists(dataset_dir):
                 shutil.rmtree(dataset_dir)
+            if INDICE_PATH.exists():
+                remover_cliente_do_indice(cliente.id)
             
             #  Deleta foto de perfil
             if cliente.imagem: